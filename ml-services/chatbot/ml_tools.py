@@ -1,43 +1,35 @@
 """
 ML model API clients and LangChain tools for Jalsakhi Chatbot.
-Calls Crop Water (8001), Soil Moisture (8002), and Village Water Allocation (8003) APIs.
+Calls Crop Water (8001), Soil Moisture (8002), and Village Water Allocation (8003) APIs
+(Crop Water and Soil Moisture are called in process when the unified API hosts them too; see ml_common.transport).
 """
 import json
 import os
+import sys
+from pathlib import Path
 from typing import Any
 
 import httpx
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
 
+# Shared Crop Water vocabulary and the service transport live in ml-services/models/ml_common
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent / "models")
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.transport import ServiceError, post_json  # noqa: E402
+from ml_common.vocabulary import CATEGORY_KEYS, load_vocabulary  # noqa: E402
+
 TIMEOUT = 10.0
 
-# Exact region names from Crop Water API config.json - map LLM variations to these
-CROP_REGION_MAP = {
-    "central plateau & hills region": "Central Plateau & Hills Region",
-    "central plateaus and hills region": "Central Plateau & Hills Region",
-    "central plateau and hills region": "Central Plateau & Hills Region",
-    "east coast plains & hills region": "East Coast Plains & Hills Region",
-    "eastern himalayan region": "Eastern Himalayan Region",
-    "eastern plateau & hills region": "Eastern Plateau & Hills Region",
-    "gujarat plains & hills region": "Gujarat Plains & Hills Region",
-    "island region": "Island Region",
-    "lower gangetic plain region": "Lower Gangetic Plain Region",
-    "middle gangetic plain region": "Middle Gangetic Plain Region",
-    "southern plateau & hills region": "Southern Plateau & Hills Region",
-    "trans-gangetic plain region": "Trans-Gangetic Plain Region",
-    "upper gangetic plain region": "Upper Gangetic Plain Region",
-    "west coast plains & ghats region": "West Coast Plains & Ghats Region",
-    "western dry region": "Western Dry Region",
-    "western himalayan region": "Western Himalayan Region",
-    "western plateau & hills region": "Western Plateau & Hills Region",
-}
-
-
-def _normalize_region(region: str) -> str:
-    """Map LLM region variations to exact Crop Water API values."""
-    key = region.strip().lower()
-    return CROP_REGION_MAP.get(key, region.strip())
+
+
+def _normalize_crop_water_value(key: str, value: str) -> str:
+    """Map LLM spellings (case, spacing, 'and' for '&', climate names) to exact Crop Water API values."""
+    canonical = load_vocabulary()[key].canonical(value)
+    # Unknown values go through as typed so the API's 422 lists the allowed values
+    return canonical if canonical is not None else value.strip()
 
 
 def _crop_water_url() -> str:
@@ -60,32 +52,26 @@ def predict_crop_water(
     weather_condition: str,
 ) -> str:
     """Call Crop Water API; returns JSON-like result or error message."""
-    region_normalized = _normalize_region(region)
+    values = dict(
+        crop_type=crop_type,
+        soil_type=soil_type,
+        region=region,
+        temperature=temperature,
+        weather_condition=weather_condition,
+    )
     try:
-        r = httpx.post(
+        data = post_json(
             f"{_crop_water_url()}/predict",
-            json={
-                "crop_type": crop_type.strip().upper(),
-                "soil_type": soil_type.strip().upper(),
-                "region": region_normalized,
-                "temperature": temperature.strip(),
-                "weather_condition": weather_condition.strip().upper(),
-            },
+            payload={key: _normalize_crop_water_value(key, values[key]) for key in CATEGORY_KEYS},
             timeout=TIMEOUT,
         )
-        r.raise_for_status()
-        data = r.json()
         return json.dumps({
             "water_requirement_mm_per_day": data.get("water_requirement"),
             "water_requirement_litre_per_acre": data.get("water_requirement_litre_per_acre"),
             "unit": data.get("unit", "mm/day"),
         })
-    except httpx.HTTPStatusError as e:
-        try:
-            detail = e.response.json().get("detail", str(e.response.text))
-        except Exception:
-            detail = e.response.text or str(e)
-        return json.dumps({"error": f"Crop Water API error ({e.response.status_code}): {detail}"})
+    except ServiceError as e:
+        return json.dumps({"error": f"Crop Water API error ({e.status_code}): {e.detail}"})
     except (httpx.ConnectError, httpx.TimeoutException) as e:
         return json.dumps({"error": f"Crop Water service unavailable: {e!s}"})
     except Exception as e:
@@ -120,24 +106,18 @@ def predict_soil_moisture_sensor(
     if avg_sm_lag2 is not None:
         payload["avg_sm_lag2"] = avg_sm_lag2
     try:
-        r = httpx.post(
+        data = post_json(
             f"{_soil_moisture_url()}/predict/sensor",
-            json=payload,
+            payload=payload,
             timeout=TIMEOUT,
         )
-        r.raise_for_status()
-        data = r.json()
         return json.dumps({
             "predictions": data.get("predictions", []),
             "days_ahead": data.get("days_ahead", [3, 4, 5, 6, 7]),
             "unit": "soil moisture %",
         })
-    except httpx.HTTPStatusError as e:
-        try:
-            detail = e.response.json().get("detail", str(e.response.text))
-        except Exception:
-            detail = e.response.text or str(e)
-        return json.dumps({"error": f"Soil Moisture API error ({e.response.status_code}): {detail}"})
+    except ServiceError as e:
+        return json.dumps({"error": f"Soil Moisture API error ({e.status_code}): {e.detail}"})
     except (httpx.ConnectError, httpx.TimeoutException) as e:
         return json.dumps({"error": f"Soil Moisture service unavailable: {e!s}"})
     except Exception as e:
@@ -161,9 +141,9 @@ def predict_soil_moisture_location(
     except (json.JSONDecodeError, ValueError) as e:
         return json.dumps({"error": f"Invalid sm_history: {e!s}"})
     try:
-        r = httpx.post(
+        data = post_json(
             f"{_soil_moisture_url()}/predict/location",
-            json={
+            payload={
                 "state": state.strip(),
                 "district": district.strip(),
                 "sm_history": hist,
@@ -171,19 +151,13 @@ def predict_soil_moisture_location(
             },
             timeout=TIMEOUT,
         )
-        r.raise_for_status()
-        data = r.json()
         return json.dumps({
             "predictions": data.get("predictions", []),
             "days_ahead": data.get("days_ahead", [3, 4, 5, 6, 7]),
             "unit": "soil moisture %",
         })
-    except httpx.HTTPStatusError as e:
-        try:
-            detail = e.response.json().get("detail", str(e.response.text))
-        except Exception:
-            detail = e.response.text or str(e)
-        return json.dumps({"error": f"Soil Moisture API error ({e.response.status_code}): {detail}"})
+    except ServiceError as e:
+        return json.dumps({"error": f"Soil Moisture API error ({e.status_code}): {e.detail}"})
     except (httpx.ConnectError, httpx.TimeoutException) as e:
         return json.dumps({"error": f"Soil Moisture service unavailable: {e!s}"})
     except Exception as e:
@@ -199,16 +173,14 @@ def optimize_village_water(total_available_water_liters: float, farms_json: str)
     if not isinstance(farms, list) or len(farms) == 0:
         return json.dumps({"error": "farms_json must be a non-empty JSON array of farm objects."})
     try:
-        r = httpx.post(
+        data = post_json(
             f"{_village_water_url()}/optimize",
-            json={
+            payload={
                 "total_available_water_liters": total_available_water_liters,
                 "farms": farms,
             },
             timeout=TIMEOUT,
         )
-        r.raise_for_status()
-        data = r.json()
         return json.dumps({
             "allocations": data.get("allocations", []),
             "per_farm_report": data.get("per_farm_report", []),
@@ -216,12 +188,8 @@ def optimize_village_water(total_available_water_liters: float, farms_json: str)
             "total_demand_liters": data.get("total_demand_liters"),
             "total_allocated_liters": data.get("total_allocated_liters"),
         })
-    except httpx.HTTPStatusError as e:
-        try:
-            detail = e.response.json().get("detail", str(e.response.text))
-        except Exception:
-            detail = e.response.text or str(e)
-        return json.dumps({"error": f"Village Water Allocation API error ({e.response.status_code}): {detail}"})
+    except ServiceError as e:
+        return json.dumps({"error": f"Village Water Allocation API error ({e.status_code}): {e.detail}"})
     except (httpx.ConnectError, httpx.TimeoutException) as e:
         return json.dumps({"error": f"Village Water Allocation service unavailable: {e!s}"})
     except Exception as e:
@@ -0,0 +1,87 @@
+"""
+Parity check for the pandas-free fast path in main.py (FastFeatureEncoder).
+Encodes every combination in config.json through the fitted ColumnTransformer and
+through the fast encoder (from vocabulary IDs), and requires bit-identical feature rows and predictions.
+Run: python check_fast_path.py [--all-rows]
+  --all-rows  also call predict_row() for every combination (slow: one forest call per row)
+CROP_WATER_ENGINE=flat python check_fast_path.py checks the FlatForest engine the same way.
+"""
+import argparse
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+import main
+
+
+def main_check(all_rows: bool) -> int:
+    main.USE_LOOKUP_TABLE = False
+    main.load_artifacts()
+    artifacts = main.registry.get()
+    encoder = artifacts.fast_encoder
+    if encoder is None:
+        print("FAIL: pipeline layout not supported by FastFeatureEncoder")
+        return 1
+    # Sequential tree accumulation so both paths sum tree outputs in the same order
+    artifacts.pipeline.named_steps["regressor"].n_jobs = 1
+
+    vocabulary = artifacts.vocabulary
+    zone_to_climate = vocabulary.zone_to_climate
+    ids = np.indices(vocabulary.shape).reshape(len(main.DOMAIN_KEYS), -1).T
+    crops, soils, regions, temps, weathers = (
+        np.array(vocabulary[k].values)[ids[:, j]] for j, k in enumerate(main.DOMAIN_KEYS)
+    )
+    combos = list(zip(crops, soils, regions, temps, weathers))
+    temp_mid = artifacts.temp_mid_by_id[ids[:, 3]]
+    frame = pd.DataFrame(
+        {
+            "CROP TYPE": crops,
+            "SOIL TYPE": soils,
+            "REGION": [zone_to_climate.get(r, r) for r in regions],
+            "WEATHER CONDITION": weathers,
+            "temp_mid": temp_mid,
+            "temp_mid_sq": temp_mid * temp_mid,
+        },
+        columns=main.FEATURE_COLS,
+    )
+    failures = 0
+
+    X_ref = artifacts.pipeline.named_steps["preprocessor"].transform(frame)
+    X_fast = encoder.encode_ids(ids, temp_mid)
+    if X_ref.dtype != X_fast.dtype or not np.array_equal(X_ref, X_fast):
+        print("FAIL: encode_ids differs from ColumnTransformer.transform")
+        failures += 1
+    for i in range(len(combos)):
+        row = encoder.encode_row(tuple(ids[i]), float(temp_mid[i]))
+        if not np.array_equal(row[0], X_ref[i]):
+            print(f"FAIL: encode_row differs for {combos[i]}")
+            failures += 1
+            break
+    print(f"Encoded {len(combos)} combinations; feature matrices identical: {failures == 0}")
+
+    y_ref = artifacts.pipeline.predict(frame)
+    y_fast = encoder.forest.predict(X_fast)
+    if not np.array_equal(y_ref, y_fast):
+        print(f"FAIL: batch predictions differ in {int((y_ref != y_fast).sum())} rows")
+        failures += 1
+
+    rows = range(len(combos)) if all_rows else random.Random(0).sample(range(len(combos)), 200)
+    for i in rows:
+        raw = encoder.predict_row(tuple(ids[i]), float(temp_mid[i]))
+        if raw != float(y_ref[i]):
+            print(f"FAIL: predict_row differs for {combos[i]}: {raw!r} != {float(y_ref[i])!r}")
+            failures += 1
+            break
+    print(f"Checked predict_row on {len(rows)} rows against the pipeline")
+
+    print("OK" if failures == 0 else f"{failures} check(s) failed")
+    return 0 if failures == 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all-rows", action="store_true", help="run predict_row for every combination")
+    args = parser.parse_args()
+    sys.exit(main_check(args.all_rows))
@@ -2,7 +2,8 @@
 Expand DATASET - Sheet1.csv from 4 climate regions to 15 India agro-climatic zones.
 Each zone is mapped to one of the 4 original regions (DESERT, SEMI ARID, SEMI HUMID, HUMID)
 so water requirements are inherited from the closest climate type.
-Output: DATASET_15_agro_zones.csv (used by train.py).
+Output: DATASET_15_agro_zones.csv (for reference; train.py aggregates the source
+directly through prepare_data.py, which gives the same training frame).
 """
 from pathlib import Path
 
@@ -1,19 +1,61 @@
 """
 FastAPI service for crop water requirement prediction.
 """
+import io
+import json
+import logging
+import os
+import sys
+import threading
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any
 
 import joblib
-from fastapi import FastAPI, HTTPException
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+
+# ml_common lives next to this folder; make it importable when run from Crop_Water_Model/
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent)
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.bundle import MANIFEST_NAME, ArtifactBundle  # noqa: E402
+from ml_common.forest_engine import make_predictor  # noqa: E402
+from ml_common.registry import (  # noqa: E402
+    ModelRegistry,
+    ModelVersion,
+    ADMIN_DENIED,
+    admin_token_ok,
+    content_version,
+    file_stamp,
+    reload_registries,
+    start_watcher_from_env,
+)
+from ml_common.vocabulary import CATEGORY_KEYS, Vocabulary  # noqa: E402
 
 MODEL_PATH = Path(__file__).resolve().parent / "model.joblib"
 CONFIG_PATH = Path(__file__).resolve().parent / "config.json"
-
-model_pipeline = None
-config = None
+# Versioned bundle of the same pipeline + config written by train.py; preferred over the two files
+BUNDLE_PATH = Path(__file__).resolve().parent / "bundle"
+BUNDLE_FAMILY = "crop_water"
+# Precomputed predictions for every config combination (rebuilt when model or config changes)
+TABLE_PATH = Path(__file__).resolve().parent / "prediction_table.npz"
+# Set CROP_WATER_LOOKUP_TABLE=0 to always run the pipeline per request
+USE_LOOKUP_TABLE = os.environ.get("CROP_WATER_LOOKUP_TABLE", "1") != "0"
+# Forest evaluator behind the fast path: "sklearn" (the fitted forest), "flat" or "compact" (ml_common.forest_engine)
+ENGINE = os.environ.get("CROP_WATER_ENGINE", "sklearn")
+# Seconds between checks of model.joblib / config.json for a new version (0 = only via /admin/reload)
+RELOAD_POLL_SECONDS = os.environ.get("MODEL_RELOAD_POLL_SECONDS")
+# If set, /admin/reload requires this value in the X-Admin-Token header
+ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+
+# Config keys spanning the input domain; also the axis order of the lookup table and of vocabulary IDs
+DOMAIN_KEYS = list(CATEGORY_KEYS)
+
+logger = logging.getLogger(__name__)
 
 
 def parse_temperature_midpoint(temp_str: str) -> float:
@@ -28,23 +70,98 @@ def _ensure_column_transformer_compat():
         _ct._RemainderColsList = type("_RemainderColsList", (list,), {})
 
 
-def load_artifacts():
-    global model_pipeline, config
-    import json
+class CropWaterArtifacts:
+    """One loaded version of model.joblib + config.json and everything derived from it."""
+
+    def __init__(self, pipeline, config: dict, engine: str):
+        self.pipeline = pipeline
+        self.config = config
+        # Accepted spellings -> integer IDs (position in config.json) for every categorical input
+        self.vocabulary = Vocabulary(config)
+        # temp_mid per temperature ID
+        self.temp_mid_by_id = np.array([parse_temperature_midpoint(t) for t in self.vocabulary["temperature"].values])
+        # Pandas-free encoder + forest extracted from the pipeline (None if the layout is unsupported)
+        self.fast_encoder = FastFeatureEncoder.from_pipeline(pipeline, self.vocabulary, engine)
+        # Final mm/day indexed by (crop_type, soil_type, region, temperature, weather_condition) IDs
+        self.prediction_table: np.ndarray | None = None
+
+
+def _read_bundle() -> tuple[str, object, dict] | None:
+    """(version, pipeline, config) from bundle/, or None if there is no bundle."""
+    if not (BUNDLE_PATH / MANIFEST_NAME).exists():
+        return None
+    bundle = ArtifactBundle.open(BUNDLE_PATH, family=BUNDLE_FAMILY)
+    if "sklearn" in bundle.library_mismatch(("sklearn",)):
+        _ensure_column_transformer_compat()
+    return bundle.version, bundle.load("pipeline"), bundle.load("config")
+
+
+def _load_crop_water() -> tuple[str, CropWaterArtifacts]:
+    bundled = _read_bundle()
+    if bundled is not None:
+        version, pipeline, config = bundled
+        return version, _build_artifacts(version, pipeline, config)
     if not MODEL_PATH.exists():
         raise FileNotFoundError(
             f"Model not found at {MODEL_PATH}. Run train.py first."
         )
     _ensure_column_transformer_compat()
-    model_pipeline = joblib.load(MODEL_PATH)
-    with open(CONFIG_PATH) as f:
-        config = json.load(f)
+    # Read each file once so the version hash matches exactly what was loaded
+    model_bytes = MODEL_PATH.read_bytes()
+    config_bytes = CONFIG_PATH.read_bytes()
+    version = content_version(model_bytes, config_bytes)
+    return version, _build_artifacts(version, joblib.load(io.BytesIO(model_bytes)), json.loads(config_bytes))
+
+
+def _build_artifacts(version: str, pipeline, config: dict) -> CropWaterArtifacts:
+    artifacts = CropWaterArtifacts(pipeline, config, ENGINE)
+    if artifacts.fast_encoder is None:
+        logger.warning("Pipeline layout not supported by the fast path; using pandas + ColumnTransformer")
+    if USE_LOOKUP_TABLE:
+        artifacts.prediction_table = load_prediction_table(artifacts, f"{version}:{ENGINE}")
+    return artifacts
+
+
+def _warm_up(artifacts: CropWaterArtifacts) -> None:
+    """One single-row prediction so the first request on a new version does not pay first-call costs."""
+    ids = np.zeros((1, len(DOMAIN_KEYS)), dtype=np.intp)
+    predict_ids(artifacts, ids)
+    if artifacts.fast_encoder is not None:
+        artifacts.fast_encoder.predict_row(tuple(ids[0]), float(artifacts.temp_mid_by_id[0]))
+
+
+registry = ModelRegistry(
+    "crop_water",
+    _load_crop_water,
+    warmup=_warm_up,
+    stamp=lambda: file_stamp((MODEL_PATH, CONFIG_PATH, BUNDLE_PATH / MANIFEST_NAME)),
+)
+
+
+def load_artifacts():
+    """Load the first version if none is active yet (later versions come from registry.reload())."""
+    registry.ensure_loaded()
+
+
+def current_version() -> ModelVersion:
+    """Active version for this request; 503 until the first load succeeded."""
+    active = registry.active
+    if active is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return active
+
+
+def current_artifacts() -> CropWaterArtifacts:
+    return current_version().artifacts
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     load_artifacts()
+    watcher = start_watcher_from_env([registry], RELOAD_POLL_SECONDS)
     yield
+    if watcher is not None:
+        watcher.stop()
     # shutdown if needed
 
 
@@ -132,70 +249,272 @@ def apply_physical_constraints(crop: str, predicted_mm: float, temp_mid: float)
     return round(predicted_mm, 3)
 
 
+def postprocess_predictions(crops: np.ndarray, raw_mm: np.ndarray, temp_mid: np.ndarray) -> np.ndarray:
+    """
+    Array version of the per-request post-processing in predict(): blend with
+    _crop_baseline_mm, then apply_physical_constraints. Same arithmetic, one pass.
+    """
+    crops = np.char.upper(np.asarray(crops, dtype=str))
+    raw_mm = np.asarray(raw_mm, dtype=float)
+    temp_mid = np.asarray(temp_mid, dtype=float)
+    unique_crops, inverse = np.unique(crops, return_inverse=True)
+    unique_temps, temp_inverse = np.unique(temp_mid, return_inverse=True)
+    known = np.array([c in CROP_PHYSICAL_LIMITS for c in unique_crops])[inverse]
+    min_mm = np.array([CROP_PHYSICAL_LIMITS.get(c, {}).get("min_mm", 0.0) for c in unique_crops])[inverse]
+    max_mm = np.array([CROP_PHYSICAL_LIMITS.get(c, {}).get("max_mm", 0.0) for c in unique_crops])[inverse]
+
+    # Baselines sit on exact 3-decimal ties, so use the scalar round() per (crop, temp) pair
+    baseline_by_pair = np.array([[_crop_baseline_mm(c, t) for t in unique_temps] for c in unique_crops])
+    baseline_mm = baseline_by_pair[inverse, temp_inverse]
+    blended_mm = 0.75 * raw_mm + 0.25 * baseline_mm
+
+    predicted_mm = np.where(blended_mm < 0, 0.0, blended_mm)
+    clamped_mm = np.minimum(max_mm, np.maximum(min_mm, predicted_mm))
+    clamped_mm = np.where(temp_mid < 15, clamped_mm * 0.8, np.where(temp_mid > 35, clamped_mm * 1.05, clamped_mm))
+    predicted_mm = np.where(known, clamped_mm, predicted_mm)
+    return np.round(predicted_mm, 3)
+
+
+class FastFeatureEncoder:
+    """
+    Reproduces the fitted ColumnTransformer (one-hot CATEGORICAL_COLS + passthrough
+    temp_mid, temp_mid_sq) with vocabulary-ID -> column arrays into a numpy buffer, then
+    calls the fitted forest directly. The forest sees the same float64 matrix as through
+    the pipeline, so predictions are bit-identical (see check_fast_path.py). With
+    CROP_WATER_ENGINE=flat the forest is replaced by an ml_common FlatForest, and with
+    CROP_WATER_ENGINE=compact by a float32 CompactForest (not bit-identical; drift is
+    reported by train.py).
+    """
+
+    # Positions in a DOMAIN_KEYS ID tuple of the one-hot inputs, in CATEGORICAL_COLS order
+    ID_POSITIONS = [DOMAIN_KEYS.index(k) for k in ("crop_type", "soil_type", "region", "weather_condition")]
+
+    def __init__(self, id_columns: list[np.ndarray], numeric_index: list[int], n_features: int, forest):
+        self.id_columns = id_columns  # per categorical input: vocabulary ID -> output column (-1: unseen in training)
+        self.numeric_index = numeric_index  # output columns of temp_mid, temp_mid_sq
+        self.n_features = n_features
+        self.forest = forest
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, pipeline, vocabulary: Vocabulary, engine: str = "sklearn") -> "FastFeatureEncoder | None":
+        try:
+            preprocessor = pipeline.named_steps["preprocessor"]
+            regressor = pipeline.named_steps["regressor"]
+            onehot = preprocessor.named_transformers_["cat"]
+            cat_columns = next(cols for name, _, cols in preprocessor.transformers_ if name == "cat")
+            cat_slice = preprocessor.output_indices_["cat"]
+            num_slice = preprocessor.output_indices_["num"]
+        except (AttributeError, KeyError, StopIteration):
+            return None
+        remainder = preprocessor.output_indices_.get("remainder", slice(0, 0))
+        if (
+            list(cat_columns) != FEATURE_COLS[:4]
+            or getattr(onehot, "drop", None) is not None
+            or getattr(onehot, "sparse_output", False)
+            or getattr(onehot, "_infrequent_enabled", False)
+            or remainder.stop > remainder.start
+            or num_slice.stop - num_slice.start != 2
+        ):
+            return None
+        # The region input is one-hot encoded by climate, not by zone (must match train.py)
+        id_values = [
+            vocabulary["crop_type"].values,
+            vocabulary["soil_type"].values,
+            [vocabulary.zone_to_climate.get(r, r) for r in vocabulary["region"].values],
+            vocabulary["weather_condition"].values,
+        ]
+        id_columns: list[np.ndarray] = []
+        offset = cat_slice.start
+        for categories, values in zip(onehot.categories_, id_values):
+            if not all(isinstance(c, str) for c in categories):
+                return None
+            column_of = {c: offset + i for i, c in enumerate(categories)}
+            id_columns.append(np.array([column_of.get(v, -1) for v in values], dtype=np.intp))
+            offset += len(categories)
+        if offset != cat_slice.stop:
+            return None
+        n_features = max(cat_slice.stop, num_slice.stop)
+        try:
+            forest = make_predictor(regressor, engine)
+        except TypeError as e:
+            logger.warning("Engine %r unavailable for %s (%s); using sklearn", engine, type(regressor).__name__, e)
+            forest = regressor
+        return cls(id_columns, [num_slice.start, num_slice.start + 1], n_features, forest)
+
+    def _buffer(self) -> np.ndarray:
+        # One preallocated row per worker thread (FastAPI runs sync endpoints in a thread pool)
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = self._local.row = np.zeros((1, self.n_features), dtype=float)
+        return buf
+
+    def encode_row(self, ids: tuple[int, ...], temp_mid: float) -> np.ndarray:
+        """Fill and return this thread's (1, n_features) buffer for one DOMAIN_KEYS ID tuple."""
+        row = self._buffer()
+        row.fill(0.0)
+        for columns, pos in zip(self.id_columns, self.ID_POSITIONS):
+            col = columns[ids[pos]]
+            if col >= 0:
+                row[0, col] = 1.0
+        row[0, self.numeric_index[0]] = temp_mid
+        row[0, self.numeric_index[1]] = temp_mid * temp_mid
+        return row
+
+    def encode_ids(self, ids: np.ndarray, temp_mid: np.ndarray) -> np.ndarray:
+        """Encode an (n, len(DOMAIN_KEYS)) ID matrix into an (n, n_features) matrix."""
+        n = len(ids)
+        X = np.zeros((n, self.n_features), dtype=float)
+        rows = np.arange(n)
+        for columns, pos in zip(self.id_columns, self.ID_POSITIONS):
+            cols = columns[ids[:, pos]]
+            hit = cols >= 0
+            X[rows[hit], cols[hit]] = 1.0
+        X[:, self.numeric_index[0]] = temp_mid
+        X[:, self.numeric_index[1]] = temp_mid * temp_mid
+        return X
+
+    def predict_row(self, ids: tuple[int, ...], temp_mid: float) -> float:
+        return float(self.forest.predict(self.encode_row(ids, temp_mid))[0])
+
+
+def predict_ids(artifacts: CropWaterArtifacts, ids: np.ndarray) -> np.ndarray:
+    """
+    Predict final mm/day for many rows at once: one forest call on an
+    (n, len(DOMAIN_KEYS)) matrix of vocabulary IDs, then postprocess_predictions.
+    """
+    vocabulary, fast_encoder = artifacts.vocabulary, artifacts.fast_encoder
+    ids = np.asarray(ids, dtype=np.intp).reshape(-1, len(DOMAIN_KEYS))
+    crops = np.array(vocabulary["crop_type"].values)[ids[:, 0]]
+    temp_mid = artifacts.temp_mid_by_id[ids[:, 3]]
+    if fast_encoder is not None:
+        X = fast_encoder.encode_ids(ids, temp_mid)
+        raw_mm = fast_encoder.forest.predict(X)
+        return postprocess_predictions(crops, raw_mm, temp_mid)
+    import pandas as pd
+    regions = np.array(vocabulary["region"].values)[ids[:, 2]]
+    zone_to_climate = vocabulary.zone_to_climate
+    rows = pd.DataFrame(
+        {
+            "CROP TYPE": crops,
+            "SOIL TYPE": np.array(vocabulary["soil_type"].values)[ids[:, 1]],
+            "REGION": [zone_to_climate.get(r, r) for r in regions],
+            "WEATHER CONDITION": np.array(vocabulary["weather_condition"].values)[ids[:, 4]],
+            "temp_mid": temp_mid,
+            "temp_mid_sq": temp_mid * temp_mid,
+        },
+        columns=FEATURE_COLS,
+    )
+    raw_mm = artifacts.pipeline.predict(rows)
+    return postprocess_predictions(crops, raw_mm, temp_mid)
+
+
+def build_prediction_table(artifacts: CropWaterArtifacts) -> np.ndarray:
+    """
+    Evaluate the whole config domain (crop x soil x region x temperature x weather)
+    in one forest call. Returns final mm/day with shape vocabulary.shape, indexed by IDs.
+    """
+    shape = artifacts.vocabulary.shape
+    ids = np.indices(shape).reshape(len(shape), -1).T
+    return predict_ids(artifacts, ids).reshape(shape)
+
+
+def load_prediction_table(artifacts: CropWaterArtifacts, fingerprint: str) -> np.ndarray:
+    """Load prediction_table.npz if it matches this model + config version, else rebuild and save it."""
+    config = artifacts.config
+    if TABLE_PATH.exists():
+        with np.load(TABLE_PATH, allow_pickle=False) as saved:
+            axes_match = all(saved[k].tolist() == list(config[k]) for k in DOMAIN_KEYS)
+            if str(saved["fingerprint"]) == fingerprint and axes_match:
+                return saved["water_requirement"]
+    values = build_prediction_table(artifacts)
+    try:
+        np.savez(
+            TABLE_PATH,
+            water_requirement=values,
+            fingerprint=np.array(fingerprint),
+            **{k: np.array(config[k]) for k in DOMAIN_KEYS},
+        )
+    except OSError as e:
+        logger.warning("Could not save prediction table to %s: %s", TABLE_PATH, e)
+    return values
+
+
 class PredictResponse(BaseModel):
     water_requirement: float  # mm/day
     unit: str = "mm/day"
     water_requirement_litre_per_acre: float  # L/acre/day
     unit_litre_per_acre: str = "L/acre/day"
-
-
-def validate_request(req: PredictRequest) -> None:
-    if config is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    if req.crop_type.upper() not in [c.upper() for c in config["crop_type"]]:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Invalid crop_type. Allowed: {config['crop_type']}",
-        )
-    if req.soil_type.upper() not in [s.upper() for s in config["soil_type"]]:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Invalid soil_type. Allowed: {config['soil_type']}",
-        )
-    if req.region.upper() not in [r.upper() for r in config["region"]]:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Invalid region. Allowed: {config['region']}",
-        )
-    if req.weather_condition.upper() not in [w.upper() for w in config["weather_condition"]]:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Invalid weather_condition. Allowed: {config['weather_condition']}",
-        )
-    if req.temperature not in config["temperature"]:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Invalid temperature. Allowed: {config['temperature']}",
-        )
+    # Version of the model that answered (callers caching answers key them by it)
+    model_version: str | None = None
+
+
+def _resolve_request(
+    artifacts: CropWaterArtifacts, req: PredictRequest
+) -> tuple[tuple[int, ...] | None, str | None]:
+    """
+    Map a request to its DOMAIN_KEYS vocabulary IDs. Returns (ids, None), or
+    (None, message) with the 422 message for a value outside config.json.
+    """
+    found: dict[str, int] = {}
+    for key in ("crop_type", "soil_type", "region", "weather_condition", "temperature"):
+        i = artifacts.vocabulary[key].id(getattr(req, key))
+        if i is None:
+            return None, f"Invalid {key}. Allowed: {artifacts.config[key]}"
+        found[key] = i
+    return tuple(found[k] for k in DOMAIN_KEYS), None
+
+
+def validate_request(artifacts: CropWaterArtifacts, req: PredictRequest) -> tuple[int, ...]:
+    """Vocabulary IDs of a valid request; raises 422 on invalid values."""
+    ids, error = _resolve_request(artifacts, req)
+    if error is not None:
+        raise HTTPException(status_code=422, detail=error)
+    return ids
 
 
 @app.post("/predict", response_model=PredictResponse)
 def predict(req: PredictRequest):
-    validate_request(req)
-    import pandas as pd
-    temp_mid = parse_temperature_midpoint(req.temperature)
-    # Map 15 agro-climatic zones -> 4 climates for model input (must match train.py)
-    zone_to_climate = config.get("zone_to_climate") or {}
-    region_climate = zone_to_climate.get(req.region.strip(), req.region.strip())
-    # Build one row with exact column order and dtypes expected by the pipeline
-    row = pd.DataFrame(
-        [{
-            "CROP TYPE": str(req.crop_type.strip()),
-            "SOIL TYPE": str(req.soil_type.strip()),
-            "REGION": str(region_climate),
-            "WEATHER CONDITION": str(req.weather_condition.strip()),
-            "temp_mid": float(temp_mid),
-            "temp_mid_sq": float(temp_mid * temp_mid),
-        }],
-        columns=FEATURE_COLS,
-    )
-    raw_mm = float(model_pipeline.predict(row)[0])
+    # The whole request uses this version, even if a reload swaps in a new one meanwhile
+    active = current_version()
+    artifacts = active.artifacts
+    ids = validate_request(artifacts, req)
+    if artifacts.prediction_table is not None:
+        # Any accepted spelling (case, spacing, aliases) resolves to the same table cell
+        predicted_mm = float(artifacts.prediction_table[ids])
+        return PredictResponse(
+            water_requirement=predicted_mm,
+            water_requirement_litre_per_acre=round(predicted_mm * LITRES_PER_MM_PER_ACRE, 2),
+            model_version=active.version,
+        )
+    vocabulary = artifacts.vocabulary
+    crop, soil, region, temperature, weather = (vocabulary[k].values[i] for k, i in zip(DOMAIN_KEYS, ids))
+    temp_mid = float(artifacts.temp_mid_by_id[ids[3]])
+    if artifacts.fast_encoder is not None:
+        raw_mm = artifacts.fast_encoder.predict_row(ids, temp_mid)
+    else:
+        import pandas as pd
+        # Map 15 agro-climatic zones -> 4 climates for model input (must match train.py)
+        zone_to_climate = vocabulary.zone_to_climate
+        # Build one row with exact column order and dtypes expected by the pipeline
+        row = pd.DataFrame(
+            [{
+                "CROP TYPE": crop,
+                "SOIL TYPE": soil,
+                "REGION": zone_to_climate.get(region, region),
+                "WEATHER CONDITION": weather,
+                "temp_mid": float(temp_mid),
+                "temp_mid_sq": float(temp_mid * temp_mid),
+            }],
+            columns=FEATURE_COLS,
+        )
+        raw_mm = float(artifacts.pipeline.predict(row)[0])
     # Blend with crop+temp baseline so different inputs produce different outputs
     # (avoids constant output when the saved model under-varies or is untrained)
-    baseline_mm = _crop_baseline_mm(req.crop_type, temp_mid)
+    baseline_mm = _crop_baseline_mm(crop, temp_mid)
     blended_mm = 0.75 * raw_mm + 0.25 * baseline_mm
     predicted_mm = apply_physical_constraints(
-        crop=req.crop_type,
+        crop=crop,
         predicted_mm=blended_mm,
         temp_mid=temp_mid,
     )
@@ -203,19 +522,96 @@ def predict(req: PredictRequest):
     return PredictResponse(
         water_requirement=predicted_mm,
         water_requirement_litre_per_acre=round(litres, 2),
+        model_version=active.version,
+    )
+
+
+class BatchPredictRequest(BaseModel):
+    rows: list[dict[str, Any]] = Field(
+        ..., min_length=1, description="PredictRequest objects; each row is validated on its own"
     )
 
 
+class BatchPredictItem(BaseModel):
+    index: int
+    water_requirement: float | None = None  # mm/day
+    water_requirement_litre_per_acre: float | None = None  # L/acre/day
+    error: str | None = None
+
+
+class BatchPredictResponse(BaseModel):
+    results: list[BatchPredictItem]
+    unit: str = "mm/day"
+    unit_litre_per_acre: str = "L/acre/day"
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+def predict_batch(body: BatchPredictRequest):
+    """
+    Predict many rows with one table gather (or one forest call). Results keep the input order;
+    invalid rows carry an error instead of failing the whole batch.
+    """
+    artifacts = current_artifacts()
+    results = [BatchPredictItem(index=i) for i in range(len(body.rows))]
+    valid_index: list[int] = []
+    valid_ids: list[tuple[int, ...]] = []
+    for i, raw in enumerate(body.rows):
+        try:
+            req = PredictRequest.model_validate(raw)
+        except ValidationError as e:
+            results[i].error = _format_validation_error(e)
+            continue
+        ids, error = _resolve_request(artifacts, req)
+        if error is not None:
+            results[i].error = error
+            continue
+        valid_index.append(i)
+        valid_ids.append(ids)
+
+    if valid_index:
+        ids = np.array(valid_ids, dtype=np.intp)
+        if artifacts.prediction_table is not None:
+            predicted_mm = artifacts.prediction_table[tuple(ids.T)]
+        else:
+            predicted_mm = predict_ids(artifacts, ids)
+        litres = np.round(predicted_mm * LITRES_PER_MM_PER_ACRE, 2)
+        for i, mm, l in zip(valid_index, predicted_mm.tolist(), litres.tolist()):
+            results[i].water_requirement = mm
+            results[i].water_requirement_litre_per_acre = l
+    return BatchPredictResponse(results=results)
+
+
 @app.get("/health")
 def health():
+    active = registry.active
+    artifacts = active.artifacts if active is not None else None
     return {
         "status": "ok",
-        "model_loaded": model_pipeline is not None,
+        "model_loaded": artifacts is not None,
+        "lookup_table": artifacts is not None and artifacts.prediction_table is not None,
+        "fast_path": artifacts is not None and artifacts.fast_encoder is not None,
+        "engine": ENGINE if artifacts is not None and artifacts.fast_encoder is not None else None,
+        "model": registry.status(),
     }
 
 
 @app.get("/config")
 def get_config():
-    if config is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    return config
+    return current_artifacts().config
+
+
+@app.post("/admin/reload")
+def admin_reload(request: Request, wait: bool = False, x_admin_token: str | None = Header(None)):
+    """
+    Load model.joblib + config.json again, warm up and swap in atomically; in-flight
+    requests finish on the old version. wait=false returns at once (poll /health).
+    """
+    if not admin_token_ok(x_admin_token, ADMIN_TOKEN, request.client.host if request.client else None):
+        raise HTTPException(status_code=403, detail=ADMIN_DENIED)
+    return {"models": reload_registries([registry], wait)}
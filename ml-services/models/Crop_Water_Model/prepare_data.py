@@ -0,0 +1,123 @@
+"""
+Build the aggregated crop-water training frame straight from DATASET - Sheet1.csv.
+
+train.py used to read DATASET_15_agro_zones.csv (every source row copied into each of the
+15 agro-climatic zones), map the zones back to the 4 climates and median-aggregate the
+copies away. Copying a group of rows k times does not change its median, so aggregating
+the source by climate gives the same frame without the 10.8k-row round trip. Only climates
+that some zone maps to are kept, as before.
+
+The result (categorical dtypes, one row per crop/soil/climate/temperature/weather key) is
+cached under .cache/training_frame in the columnar format of ml_common.columnar_cache,
+keyed by the source file's hash and the preparation parameters, so repeated training runs
+skip the CSV parse and the aggregation.
+
+  python prepare_data.py             # build (or reuse) the cache and print a summary
+  python prepare_data.py --rebuild   # ignore an existing cache
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# ml_common lives next to this folder; make it importable when run from Crop_Water_Model/
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent)
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.columnar_cache import cached_frame  # noqa: E402
+
+# Paths
+SOURCE_PATH = Path(__file__).resolve().parent / "DATASET - Sheet1.csv"
+CACHE_DIR = Path(__file__).resolve().parent / ".cache" / "training_frame"
+
+CATEGORICAL_COLS = ["CROP TYPE", "SOIL TYPE", "REGION", "WEATHER CONDITION"]
+NUMERIC_FEATURES = ["temp_mid", "temp_mid_sq"]
+TARGET_COL = "WATER REQUIREMENT"
+
+# Cap target at agronomic max (mm/day) to reduce outlier impact
+TARGET_CAP_MM = 20.0
+
+# 15 agro-climatic zones -> 4 climates for training (fewer, clearer region signal)
+ZONE_TO_CLIMATE = {
+    "Western Himalayan Region": "SEMI HUMID",
+    "Eastern Himalayan Region": "HUMID",
+    "Lower Gangetic Plain Region": "HUMID",
+    "Middle Gangetic Plain Region": "HUMID",
+    "Upper Gangetic Plain Region": "SEMI ARID",
+    "Trans-Gangetic Plain Region": "SEMI ARID",
+    "Eastern Plateau & Hills Region": "SEMI HUMID",
+    "Central Plateau & Hills Region": "SEMI ARID",
+    "Western Plateau & Hills Region": "SEMI ARID",
+    "Southern Plateau & Hills Region": "SEMI HUMID",
+    "East Coast Plains & Hills Region": "HUMID",
+    "West Coast Plains & Ghats Region": "HUMID",
+    "Gujarat Plains & Hills Region": "SEMI ARID",
+    "Western Dry Region": "DESERT",
+    "Island Region": "HUMID",
+}
+
+KEY_COLS = CATEGORICAL_COLS + ["TEMPERATURE"]
+
+
+def parse_temperature_midpoint(temp_str: str) -> float:
+    """Parse '10-20' -> 15, '20-30' -> 25, etc."""
+    low, high = temp_str.strip().split("-")
+    return (int(low) + int(high)) / 2.0
+
+
+def build_training_frame(source_path: Path = SOURCE_PATH) -> pd.DataFrame:
+    """
+    One row per (crop, soil, climate, temperature, weather) with the median capped target,
+    plus temp_mid / temp_mid_sq. Key columns are categoricals with sorted categories.
+    """
+    df = pd.read_csv(source_path, usecols=KEY_COLS + [TARGET_COL], dtype={c: "category" for c in KEY_COLS})
+    df = df.dropna(subset=[TARGET_COL])
+
+    # Cap target to agronomic max to reduce outlier impact
+    df[TARGET_COL] = df[TARGET_COL].clip(upper=TARGET_CAP_MM)
+
+    # Climates no zone maps to would have been dropped by the zone round trip
+    df = df[df["REGION"].isin(set(ZONE_TO_CLIMATE.values()))]
+
+    # Aggregate duplicates: one row per key, median target (groupby sorts by key)
+    df = df.groupby(KEY_COLS, observed=True, as_index=False)[TARGET_COL].median()
+    for col in KEY_COLS:
+        cat = df[col].cat.remove_unused_categories()
+        df[col] = cat.cat.reorder_categories(sorted(cat.cat.categories))
+
+    temp_mid_by_category = df["TEMPERATURE"].cat.categories.map(parse_temperature_midpoint)
+    df["temp_mid"] = temp_mid_by_category.to_numpy(dtype=float)[df["TEMPERATURE"].cat.codes.to_numpy()]
+    df["temp_mid_sq"] = df["temp_mid"] ** 2
+    return df[KEY_COLS + NUMERIC_FEATURES + [TARGET_COL]]
+
+
+def load_training_frame(source_path: Path = SOURCE_PATH, cache_dir: Path | None = CACHE_DIR,
+                        rebuild: bool = False) -> pd.DataFrame:
+    """Training frame from the columnar cache when it matches the source, else built and cached. cache_dir=None disables caching."""
+    if cache_dir is None:
+        return build_training_frame(source_path)
+    params = {"target_cap_mm": TARGET_CAP_MM, "zone_to_climate": ZONE_TO_CLIMATE, "schema": 1}
+    return cached_frame(cache_dir, [source_path], lambda: build_training_frame(source_path), params, rebuild=rebuild)
+
+
+def agro_zones(df: pd.DataFrame) -> list[str]:
+    """Sorted agro-climatic zones whose climate is present in the training frame (the API's region list)."""
+    climates = set(df["REGION"].unique())
+    return sorted(zone for zone, climate in ZONE_TO_CLIMATE.items() if climate in climates)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="ignore an existing cache")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    df = load_training_frame(rebuild=args.rebuild)
+    print(f"Training frame: {len(df)} rows, {len(agro_zones(df))} zones "
+          f"({time.perf_counter() - start:.3f} s), cache {CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
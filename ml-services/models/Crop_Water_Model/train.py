@@ -1,9 +1,20 @@
 """
 Train crop water requirement model and save pipeline + config for the API.
-Implements: target cap, 15-zone -> 4-climate mapping, median aggregation,
+Implements: target cap, 15-zone -> 4-climate mapping, median aggregation (prepare_data.py, cached),
 stratified split, RF tuning, CV and crop-level evaluation.
+
+  python train.py          # original search: 16 random candidates, 5 folds, one core
+  python train.py --fast   # successive halving over the whole grid, all cores, cached preprocessor
+  python train.py --bundle-existing  # no training: bundle model.joblib + config.json as they are
+Besides model.joblib and config.json, the pipeline and config are written as one versioned
+bundle (bundle/, see ml_common/bundle.py) that main.py loads in preference to the loose files.
+Every run prints wall-clock time and peak memory (including search workers) per phase.
 """
+import argparse
 import json
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
 import joblib
@@ -11,7 +22,9 @@ import numpy as np
 import pandas as pd
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
 from sklearn.model_selection import (
+    HalvingRandomSearchCV,
     RandomizedSearchCV,
     StratifiedKFold,
     cross_val_score,
@@ -20,36 +33,29 @@ from sklearn.model_selection import (
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder
 
+# ml_common lives next to this folder; make it importable when run from Crop_Water_Model/
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent)
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.bundle import write_bundle  # noqa: E402
+from ml_common.forest_engine import CompactForest, compaction_drift  # noqa: E402
+from ml_common.profiling import PhaseProfiler  # noqa: E402
+from prepare_data import (  # noqa: E402
+    CACHE_DIR,
+    CATEGORICAL_COLS,
+    NUMERIC_FEATURES,
+    TARGET_COL,
+    ZONE_TO_CLIMATE,
+    agro_zones,
+    load_training_frame,
+)
+
 # Paths
-DATA_PATH = Path(__file__).resolve().parent / "DATASET_15_agro_zones.csv"
 MODEL_PATH = Path(__file__).resolve().parent / "model.joblib"
 CONFIG_PATH = Path(__file__).resolve().parent / "config.json"
-
-CATEGORICAL_COLS = ["CROP TYPE", "SOIL TYPE", "REGION", "WEATHER CONDITION"]
-NUMERIC_FEATURES = ["temp_mid", "temp_mid_sq"]
-TARGET_COL = "WATER REQUIREMENT"
-
-# Cap target at agronomic max (mm/day) to reduce outlier impact
-TARGET_CAP_MM = 20.0
-
-# 15 agro-climatic zones -> 4 climates for training (fewer, clearer region signal)
-ZONE_TO_CLIMATE = {
-    "Western Himalayan Region": "SEMI HUMID",
-    "Eastern Himalayan Region": "HUMID",
-    "Lower Gangetic Plain Region": "HUMID",
-    "Middle Gangetic Plain Region": "HUMID",
-    "Upper Gangetic Plain Region": "SEMI ARID",
-    "Trans-Gangetic Plain Region": "SEMI ARID",
-    "Eastern Plateau & Hills Region": "SEMI HUMID",
-    "Central Plateau & Hills Region": "SEMI ARID",
-    "Western Plateau & Hills Region": "SEMI ARID",
-    "Southern Plateau & Hills Region": "SEMI HUMID",
-    "East Coast Plains & Hills Region": "HUMID",
-    "West Coast Plains & Ghats Region": "HUMID",
-    "Gujarat Plains & Hills Region": "SEMI ARID",
-    "Western Dry Region": "DESERT",
-    "Island Region": "HUMID",
-}
+BUNDLE_PATH = Path(__file__).resolve().parent / "bundle"
+BUNDLE_FAMILY = "crop_water"
 
 # Crop-wise physical minimum (mm/day). Applied only at inference.
 CROP_MIN_MM = {
@@ -59,35 +65,14 @@ CROP_MIN_MM = {
 }
 
 
-def parse_temperature_midpoint(temp_str: str) -> float:
-    """Parse '10-20' -> 15, '20-30' -> 25, etc."""
-    low, high = temp_str.strip().split("-")
-    return (int(low) + int(high)) / 2.0
-
-
-def load_and_prepare_data() -> tuple[pd.DataFrame, pd.Series, pd.DataFrame, list]:
-    df = pd.read_csv(DATA_PATH)
-    df = df.dropna(subset=[TARGET_COL])
-
-    # Cap target to agronomic max to reduce outlier impact
-    df[TARGET_COL] = df[TARGET_COL].clip(upper=TARGET_CAP_MM)
-
-    # Save 15 zone names for API config before mapping to climate
-    region_list_15_zones = sorted(df["REGION"].dropna().unique().tolist())
-
-    # Map 15 zones -> 4 climates for training
-    df = df.copy()
-    df["REGION"] = df["REGION"].map(ZONE_TO_CLIMATE)
-    df = df.dropna(subset=["REGION"])
+def load_and_prepare_data(use_cache: bool = True, rebuild_cache: bool = False) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame, list]:
+    # Capped, climate-level, median-aggregated frame built from the 4-region source (see prepare_data.py)
+    df = load_training_frame(cache_dir=CACHE_DIR if use_cache else None, rebuild=rebuild_cache)
 
-    # Aggregate duplicates: one row per (crop, soil, region, temp, weather), median target
-    key = CATEGORICAL_COLS + ["TEMPERATURE"]
-    df = df.groupby(key, as_index=False)[TARGET_COL].median()
+    # 15 zone names for API config
+    region_list_15_zones = agro_zones(df)
 
-    df["TEMPERATURE"] = df["TEMPERATURE"].astype(str)
-    X = df[CATEGORICAL_COLS + ["TEMPERATURE"]].copy()
-    X["temp_mid"] = X["TEMPERATURE"].map(parse_temperature_midpoint)
-    X["temp_mid_sq"] = X["temp_mid"] ** 2
+    X = df[CATEGORICAL_COLS + ["TEMPERATURE"] + NUMERIC_FEATURES]
     X_feat = X[CATEGORICAL_COLS + NUMERIC_FEATURES]
     y = df[TARGET_COL]
     return X_feat, y, X, region_list_15_zones
@@ -145,16 +130,117 @@ def print_crop_level_r2(pipe: Pipeline, X_val: pd.DataFrame, y_val: pd.Series) -
     print("---\n")
 
 
-def main():
-    X, y, X_with_temp, region_list_15_zones = load_and_prepare_data()
+PARAM_DIST = {
+    "regressor__n_estimators": [200, 300, 400],
+    "regressor__max_depth": [6, 8, 10, 12],
+    "regressor__min_samples_leaf": [3, 5, 8, 12],
+}
 
-    print_target_diagnostics(X_with_temp, y)
 
-    # Stratified split by crop type
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=X["CROP TYPE"]
+def build_search(base_pipe: Pipeline, cv: list, search: str, n_jobs: int):
+    """
+    random:  RandomizedSearchCV, 16 candidates, each on all 5 folds (the original search).
+    halving: HalvingRandomSearchCV over every max_depth x min_samples_leaf pair, with the
+             number of trees as the budget: all pairs start with few trees, and each round
+             keeps the best third and gives it 3x more trees, up to the largest n_estimators.
+             Tree count (not rows) drives the fit cost on this small aggregated dataset.
+    """
+    if search == "halving":
+        grid = {k: v for k, v in PARAM_DIST.items() if k != "regressor__n_estimators"}
+        return HalvingRandomSearchCV(
+            base_pipe,
+            param_distributions=grid,
+            n_candidates=int(np.prod([len(v) for v in grid.values()])),
+            factor=3,
+            resource="regressor__n_estimators",
+            max_resources=max(PARAM_DIST["regressor__n_estimators"]),
+            # Smallest round sized so the last round uses max_resources trees
+            min_resources="exhaust",
+            cv=cv,
+            scoring="r2",
+            random_state=42,
+            n_jobs=n_jobs,
+        )
+    return RandomizedSearchCV(
+        base_pipe,
+        param_distributions=PARAM_DIST,
+        n_iter=16,
+        cv=cv,
+        scoring="r2",
+        random_state=42,
+        n_jobs=n_jobs,
     )
 
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--search", choices=["random", "halving"], default="random", help="hyperparameter search")
+    parser.add_argument("--n-jobs", type=int, default=1, help="parallel candidate/fold fits (-1 = all cores)")
+    parser.add_argument(
+        "--cache-preprocessor",
+        action="store_true",
+        help="cache the fitted ColumnTransformer per fold so candidates reuse it (Pipeline memory)",
+    )
+    parser.add_argument("--no-data-cache", action="store_true", help="build the training frame from the CSV, no cache")
+    parser.add_argument("--rebuild-data-cache", action="store_true", help="rebuild the cached training frame")
+    parser.add_argument("--fast", action="store_true", help="same as --search halving --n-jobs -1 --cache-preprocessor")
+    parser.add_argument("--bundle-existing", action="store_true", help="bundle model.joblib + config.json and exit")
+    args = parser.parse_args(argv)
+    if args.fast:
+        args.search, args.n_jobs, args.cache_preprocessor = "halving", -1, True
+    return args
+
+
+def split_train_val(X: pd.DataFrame, y: pd.Series) -> list:
+    """Stratified split by crop type (X_train, X_val, y_train, y_val)."""
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=X["CROP TYPE"])
+
+
+def print_compaction_drift(pipe: Pipeline, X: pd.DataFrame, y: pd.Series | None = None, label: str = "") -> dict:
+    """
+    Drift of the float32 CompactForest (CROP_WATER_ENGINE=compact) from pipe's forest on X; with y,
+    also the MAE of both, so only pass y for rows pipe was not fitted on.
+    """
+    regressor = pipe.named_steps["regressor"]
+    report = compaction_drift(
+        regressor, CompactForest.from_sklearn(regressor), pipe.named_steps["preprocessor"].transform(X), y
+    )
+    mae = f", held-out MAE {report['mae_compact']:.6f} vs {report['mae_original']:.6f}" if y is not None else ""
+    print(f"Compact forest ({label}): {report['compact_bytes'] / 1e6:.1f} MB, "
+          f"max |diff| {report['max_abs_diff']:.2e} mm/day{mae}")
+    return report
+
+
+def write_model_bundle(model: Pipeline, config: dict, metadata: dict) -> str:
+    return write_bundle(BUNDLE_PATH, BUNDLE_FAMILY, objects={"pipeline": model}, documents={"config": config},
+                        metadata=metadata)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    if args.bundle_existing:
+        model = joblib.load(MODEL_PATH)
+        X, y, _, _ = load_and_prepare_data()
+        _, X_val, _, _ = split_train_val(X, y)
+        # The saved model was refit on all rows, validation included: prediction drift only, no MAE
+        version = write_model_bundle(
+            model, json.loads(CONFIG_PATH.read_text()),
+            {"compact_drift": print_compaction_drift(model, X_val, label="saved model")},
+        )
+        print(f"Bundle {version} saved to {BUNDLE_PATH}")
+        return
+    profiler = PhaseProfiler()
+    print(f"Search: {args.search}, n_jobs={args.n_jobs}, cached preprocessor: {args.cache_preprocessor}")
+
+    with profiler.phase("load data"):
+        X, y, X_with_temp, region_list_15_zones = load_and_prepare_data(
+            use_cache=not args.no_data_cache, rebuild_cache=args.rebuild_data_cache
+        )
+
+    print_target_diagnostics(X_with_temp, y)
+
+    X_train, X_val, y_train, y_val = split_train_val(X, y)
+
     preprocessor = ColumnTransformer(
         [
             (
@@ -167,58 +253,67 @@ def main():
         remainder="drop",
     )
 
+    cache_dir = tempfile.mkdtemp(prefix="crop_water_pipe_cache_") if args.cache_preprocessor else None
     base_pipe = Pipeline(
         [
             ("preprocessor", preprocessor),
-            ("regressor", RandomForestRegressor(random_state=42, n_jobs=-1)),
-        ]
+            # With a parallel search, parallelism is across candidates/folds; one core per forest avoids oversubscription
+            ("regressor", RandomForestRegressor(random_state=42, n_jobs=-1 if args.n_jobs == 1 else 1)),
+        ],
+        memory=cache_dir,
     )
 
-    param_dist = {
-        "regressor__n_estimators": [200, 300, 400],
-        "regressor__max_depth": [6, 8, 10, 12],
-        "regressor__min_samples_leaf": [3, 5, 8, 12],
-    }
-
     skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-    search = RandomizedSearchCV(
-        base_pipe,
-        param_distributions=param_dist,
-        n_iter=16,
-        cv=skf.split(X_train, X_train["CROP TYPE"]),
-        scoring="r2",
-        random_state=42,
-        n_jobs=1,
-    )
-    search.fit(X_train, y_train)
-
-    print(f"Best CV R² (mean): {search.best_score_:.4f}")
-    print(f"Best params: {search.best_params_}")
-
-    # 5-fold CV on full train+val for stability report
-    cv_scores = cross_val_score(
-        search.best_estimator_,
-        X,
-        y,
-        cv=skf.split(X, X["CROP TYPE"]),
-        scoring="r2",
-        n_jobs=1,
-    )
-    print(f"5-fold CV R²: {cv_scores.mean():.4f} ± {cv_scores.std():.4f}")
-
+    # Materialized so every search round (and cross_val_score) can iterate the same folds again
+    train_folds = list(skf.split(X_train, X_train["CROP TYPE"]))
+    search = build_search(base_pipe, train_folds, args.search, args.n_jobs)
+    try:
+        with profiler.phase(f"search ({args.search})"):
+            search.fit(X_train, y_train)
+
+        print(f"Best CV R² (mean): {search.best_score_:.4f}")
+        print(f"Best params: {search.best_params_}")
+        if args.search == "halving":
+            print(f"Halving rounds: {search.n_iterations_}, candidates per round: {search.n_candidates_}, "
+                  f"trees per round: {search.n_resources_}")
+
+        # 5-fold CV on full train+val for stability report
+        with profiler.phase("cross-validation"):
+            cv_scores = cross_val_score(
+                search.best_estimator_,
+                X,
+                y,
+                cv=skf.split(X, X["CROP TYPE"]),
+                scoring="r2",
+                n_jobs=args.n_jobs,
+            )
+        print(f"5-fold CV R²: {cv_scores.mean():.4f} ± {cv_scores.std():.4f}")
+    finally:
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # Saved pipeline: no cache dir, and the forest predicts on all cores like before
     model = search.best_estimator_
-    val_score = model.score(X_val, y_val)
+    model.set_params(memory=None, regressor__n_jobs=-1)
+    with profiler.phase("validation"):
+        val_score = model.score(X_val, y_val)
     print(f"Validation R²: {val_score:.4f}")
+    # Compact forest accuracy while the model has not seen the validation rows (the refit below does)
+    held_out_drift = print_compaction_drift(model, X_val, y_val, "before refit, validation rows")
 
     # Refit on full data for production
-    model.fit(X, y)
+    with profiler.phase("refit"):
+        model.fit(X, y)
     train_score = model.score(X, y)
     print(f"Train R² (full data): {train_score:.4f}")
 
     print_top_feature_importances(model, top_k=10)
     print_crop_level_r2(model, X_val, y_val)
+    # The production model saw X_val in the refit: only check that the compact forest still matches it
+    compact_drift = {**print_compaction_drift(model, X_val, label="refit model"), "held_out": held_out_drift}
 
-    joblib.dump(model, MODEL_PATH)
+    with profiler.phase("save"):
+        joblib.dump(model, MODEL_PATH)
     print(f"Model saved to {MODEL_PATH}")
 
     config = get_allowed_categories(X_with_temp, region_list_15_zones)
@@ -228,6 +323,19 @@ def main():
     with open(CONFIG_PATH, "w") as f:
         json.dump(config, f, indent=2)
     print(f"Config saved to {CONFIG_PATH}")
+    with profiler.phase("bundle"):
+        version = write_model_bundle(
+            model,
+            config,
+            {
+                "search": args.search,
+                "val_r2": round(val_score, 4),
+                "cv_r2": round(cv_scores.mean(), 4),
+                "compact_drift": compact_drift,
+            },
+        )
+    print(f"Bundle {version} saved to {BUNDLE_PATH}")
+    profiler.print_summary()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+"""
+Shared inference utilities for the model services (Crop_Water_Model, soil_moisture_model, ...).
+Each service adds ml-services/models to sys.path so this package imports the same way
+when run standalone or mounted under unified_api.
+"""
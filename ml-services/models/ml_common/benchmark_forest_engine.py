@@ -0,0 +1,82 @@
+"""
+Latency benchmark: sklearn predict() vs FlatForest and the float32 CompactForest on single
+rows and small batches.
+By default fits synthetic forests shaped like the served models:
+  crop_water     RandomForestRegressor, 300 trees, max_depth 12, 28 features
+  soil_moisture  MultiOutputRegressor of 5 RandomForestRegressor, 100 trees, max_depth 12, 10 features
+Pass --model to benchmark saved artifacts instead.
+
+Run from ml-services/models:
+  python -m ml_common.benchmark_forest_engine [--model soil_moisture_model/model_sensor.joblib ...]
+"""
+import argparse
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.multioutput import MultiOutputRegressor
+
+from ml_common.forest_engine import CompactForest, FlatForest
+
+BATCH_SIZES = (1, 10, 100, 1000)
+
+
+def _time_ms(fn, X: np.ndarray, min_seconds: float = 0.5) -> list[float]:
+    fn(X)  # warm up
+    samples = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds or len(samples) < 5:
+        t0 = time.perf_counter()
+        fn(X)
+        samples.append((time.perf_counter() - t0) * 1e3)
+    return samples
+
+
+def benchmark(name: str, model, rng: np.random.Generator) -> None:
+    model = model.steps[-1][1] if hasattr(model, "steps") else model
+    ff = FlatForest.from_sklearn(model)
+    compact = CompactForest.from_flat(ff)
+    print(f"\n{name}: {ff.n_trees} trees, {ff.n_nodes} nodes, depth {ff.max_depth}, {ff.n_outputs} output(s), "
+          f"flat {ff.nbytes / 1e6:.1f} MB, compact {compact.nbytes / 1e6:.1f} MB")
+    print(f"  {'rows':>6} {'sklearn p50 ms':>15} {'flat p50 ms':>12} {'flat p95 ms':>12} {'speedup':>8} "
+          f"{'compact p50 ms':>15}")
+    for n in BATCH_SIZES:
+        X = rng.normal(size=(n, ff.n_features))
+        sk = _time_ms(model.predict, X)
+        fl = _time_ms(ff.predict, X)
+        co = _time_ms(compact.predict, X)
+        sk50, fl50 = np.percentile(sk, 50), np.percentile(fl, 50)
+        print(f"  {n:>6} {sk50:>15.3f} {fl50:>12.3f} {np.percentile(fl, 95):>12.3f} {sk50 / fl50:>7.1f}x "
+              f"{np.percentile(co, 50):>15.3f}")
+
+
+def synthetic_models(rng: np.random.Generator) -> dict:
+    X_crop = np.hstack([rng.integers(0, 2, size=(3000, 26)), rng.uniform(10, 50, size=(3000, 2))])
+    y_crop = X_crop[:, :26] @ rng.uniform(0, 2, 26) + 0.05 * X_crop[:, 26] + rng.normal(size=3000)
+    X_soil = rng.normal(size=(3000, 10))
+    Y_soil = X_soil[:, :5] * 3 + rng.normal(size=(3000, 5))
+    return {
+        "crop_water (synthetic)": RandomForestRegressor(
+            n_estimators=300, max_depth=12, min_samples_leaf=3, random_state=42
+        ).fit(X_crop, y_crop),
+        "soil_moisture (synthetic)": MultiOutputRegressor(
+            RandomForestRegressor(n_estimators=100, max_depth=12, random_state=42)
+        ).fit(X_soil, Y_soil),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", action="append", default=[], help="joblib artifact to benchmark (repeatable)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    models = {Path(p).name: joblib.load(p) for p in args.model} if args.model else synthetic_models(rng)
+    for name, model in models.items():
+        benchmark(name, model, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Versioned artifact bundle: all files of one model family in one directory with a manifest.
+
+    bundle/
+      manifest.json        format, family, version, library versions, sha256 + size per member
+      model.joblib         objects (joblib, uncompressed)
+      forest.feature.npy   arrays (np.save), memory-mapped on load
+      config.json          JSON documents
+
+    write_bundle(path, "crop_water", objects={"pipeline": pipe}, documents={"config": config})
+    bundle = ArtifactBundle.open(path, family="crop_water")
+    bundle.version            # content hash of the member checksums
+    bundle.load("pipeline")   # loaded on first use, checksum verified, then kept
+
+Every write goes to a new version directory next to the bundle path (.<name>.XXXXXXXX/),
+and the bundle path is a symlink to the current one, switched with os.replace. A reader
+never sees a half-written bundle, and one that resolved the link keeps reading its own
+version: an open ArtifactBundle holds a shared flock on its version's .lock, and a write
+deletes only the old versions nobody holds (members still loaded lazily never find their
+files gone). The manifest (through the link) is what the artifact watcher stamps. Members
+are loaded lazily and single-flight: concurrent first calls for the same member wait for one
+load. Without fcntl (Windows) there are no locks: a write deletes the old versions except
+the one it replaced, and where symlinks cannot be created the new version directory is
+renamed to the bundle path itself. Arrays (and numpy arrays inside uncompressed joblib members, where the object
+allows it) are memory-mapped read-only, so pre-forked workers share their pages.
+
+The manifest records the scikit-learn / numpy / joblib versions the bundle was written
+with; library_mismatch() tells a loader when the running versions differ (pickles of
+sklearn objects are only guaranteed to load on the version that wrote them).
+"""
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+BUNDLE_FORMAT = 1
+_KIND_SUFFIX = {"joblib": ".joblib", "npy": ".npy", "json": ".json"}
+# In every version directory: held shared by readers (and by the writer until the switch)
+LOCK_NAME = ".lock"
+
+
+class BundleError(ValueError):
+    """Missing / foreign manifest or a member whose checksum does not match."""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def library_versions() -> dict[str, str]:
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "joblib": joblib.__version__}
+    try:
+        import sklearn
+        versions["sklearn"] = sklearn.__version__
+    except ImportError:
+        pass
+    return versions
+
+
+def _hold_version(version_dir: Path):
+    """
+    Open version_dir's lock file with a shared flock; the lock lasts as long as the file object.
+    None without fcntl (an open handle there would only keep the directory from being deleted).
+    """
+    if fcntl is None:
+        return None
+    lock_file = open(version_dir / LOCK_NAME, "rb")
+    fcntl.flock(lock_file, fcntl.LOCK_SH)
+    return lock_file
+
+
+def _remove_unused_versions(directory: Path, keep: Path, previous: Path | None) -> None:
+    """
+    Delete version directories of directory other than keep that no reader (or writer) holds.
+    Without fcntl the holders are unknown, so previous (the version keep replaced) stays too.
+    """
+    for path in directory.parent.glob(f".{directory.name}.*"):
+        if path == keep or path.is_symlink() or not path.is_dir():
+            continue
+        if fcntl is None:
+            if path != previous:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        try:
+            with open(path / LOCK_NAME, "rb") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                shutil.rmtree(path)
+        except BlockingIOError:
+            continue
+        except FileNotFoundError:
+            # A pre-versioning bundle moved aside (readers of it hold nothing)
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def write_bundle(
+    directory: Path,
+    family: str,
+    objects: dict[str, Any] | None = None,
+    arrays: dict[str, np.ndarray] | None = None,
+    documents: dict[str, Any] | None = None,
+    metadata: dict[str, Any] | None = None,
+) -> str:
+    """Write a bundle (replacing any previous one at directory); returns its version."""
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{directory.name}.", dir=directory.parent))
+    (tmp_dir / LOCK_NAME).touch()
+    # Held until the switch, so a concurrent write does not take this directory for an old version
+    writer_lock = _hold_version(tmp_dir)
+    try:
+        members: dict[str, dict[str, Any]] = {}
+        for kind, entries in (("joblib", objects), ("npy", arrays), ("json", documents)):
+            for name, value in (entries or {}).items():
+                if name in members:
+                    raise ValueError(f"Duplicate bundle member {name!r}")
+                path = tmp_dir / f"{name}{_KIND_SUFFIX[kind]}"
+                if kind == "joblib":
+                    joblib.dump(value, path)
+                elif kind == "npy":
+                    np.save(path, np.ascontiguousarray(value), allow_pickle=False)
+                else:
+                    path.write_text(json.dumps(value, indent=2))
+                members[name] = {"file": path.name, "kind": kind, "sha256": _sha256(path), "size": path.stat().st_size}
+        version = hashlib.sha256(
+            json.dumps({name: m["sha256"] for name, m in members.items()}, sort_keys=True).encode()
+        ).hexdigest()[:12]
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "family": family,
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "libraries": library_versions(),
+            "members": members,
+            "metadata": metadata or {},
+        }
+        (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+        previous = Path(os.path.realpath(directory)) if directory.is_symlink() else None
+        if directory.is_dir() and not directory.is_symlink():
+            # A bundle written before versioned directories (or without symlinks): move it aside
+            os.replace(directory, tempfile.mkdtemp(prefix=f".{directory.name}.", dir=directory.parent))
+        link = directory.with_name(f".{directory.name}.link.{os.getpid()}")
+        link.unlink(missing_ok=True)
+        try:
+            os.symlink(tmp_dir.name, link, target_is_directory=True)
+        except OSError:
+            # No symlinks (Windows without Developer Mode): the version directory becomes the bundle path
+            if writer_lock is not None:
+                writer_lock.close()
+            if directory.is_symlink():
+                directory.unlink()
+            os.replace(tmp_dir, directory)
+        else:
+            os.replace(link, directory)
+    except BaseException:
+        if writer_lock is not None:
+            writer_lock.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if writer_lock is not None:
+        writer_lock.close()
+    _remove_unused_versions(directory, keep=tmp_dir, previous=previous)
+    return version
+
+
+class ArtifactBundle:
+    """Read side of a bundle; see module docstring."""
+
+    def __init__(self, directory: Path, manifest: dict[str, Any], verify: bool = True, lock_file: Any = None):
+        # The version directory the bundle path pointed to when opened, held by lock_file
+        self.directory = Path(directory)
+        self.manifest = manifest
+        self._lock_file = lock_file
+        self.verify = verify
+        self._loaded: dict[str, Any] = {}
+        self._member_locks = {name: threading.Lock() for name in manifest["members"]}
+
+    @classmethod
+    def open(cls, directory: Path, family: str | None = None, verify: bool = True) -> "ArtifactBundle":
+        """
+        Resolve the bundle path to its current version, hold it and read the manifest
+        (FileNotFoundError if there is none); members are loaded on demand.
+        """
+        directory = Path(directory)
+        while True:
+            version_dir = Path(os.path.realpath(directory))
+            lock_file = None
+            try:
+                # A real directory is a bundle written before versioned directories: nothing to hold
+                if directory.is_symlink():
+                    lock_file = _hold_version(version_dir)
+                manifest_text = (version_dir / MANIFEST_NAME).read_text()
+                break
+            except FileNotFoundError:
+                if lock_file is not None:
+                    lock_file.close()
+                # Replaced and deleted between resolving the link and locking it: resolve again
+                if Path(os.path.realpath(directory)) == version_dir:
+                    raise
+        try:
+            manifest = json.loads(manifest_text)
+        except json.JSONDecodeError as e:
+            raise BundleError(f"Unreadable manifest in {directory}: {e}") from e
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise BundleError(f"{directory}: bundle format {manifest.get('format')!r}, expected {BUNDLE_FORMAT}")
+        if family is not None and manifest.get("family") != family:
+            raise BundleError(f"{directory} holds {manifest.get('family')!r}, expected {family!r}")
+        bundle = cls(version_dir, manifest, verify, lock_file)
+        mismatch = bundle.library_mismatch()
+        if mismatch:
+            logger.warning("Bundle %s was written with %s", directory, mismatch)
+        return bundle
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    @property
+    def family(self) -> str:
+        return self.manifest["family"]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.manifest["members"]
+
+    def library_mismatch(self, names: tuple[str, ...] = ("sklearn", "numpy")) -> dict[str, str]:
+        """{library: "written X, running Y"} for libraries whose major.minor version differs."""
+        written = self.manifest.get("libraries", {})
+        running = library_versions()
+        out = {}
+        for name in names:
+            w, r = written.get(name), running.get(name)
+            if w and r and w.split(".")[:2] != r.split(".")[:2]:
+                out[name] = f"written {w}, running {r}"
+        return out
+
+    def load(self, name: str) -> Any:
+        """The member, loaded once (KeyError for an unknown name, BundleError on a checksum mismatch)."""
+        if name in self._loaded:
+            return self._loaded[name]
+        with self._member_locks[name]:
+            if name not in self._loaded:
+                self._loaded[name] = self._read(name)
+        return self._loaded[name]
+
+    def _read(self, name: str) -> Any:
+        member = self.manifest["members"][name]
+        path = self.directory / member["file"]
+        if self.verify and _sha256(path) != member["sha256"]:
+            raise BundleError(f"Checksum mismatch for {path}")
+        if member["kind"] == "npy":
+            return np.load(path, mmap_mode="r", allow_pickle=False)
+        if member["kind"] == "joblib":
+            return joblib.load(path, mmap_mode="r")
+        return json.loads(path.read_text())
+
+    def load_prefix(self, prefix: str) -> dict[str, Any]:
+        """Members named "<prefix>.<key>" as {key: value} (e.g. the arrays of a FlatForest)."""
+        return {
+            name[len(prefix) + 1:]: self.load(name) for name in self.manifest["members"] if name.startswith(prefix + ".")
+        }
@@ -0,0 +1,100 @@
+"""
+Parity check: FlatForest vs sklearn predict() on the model shapes used by the services.
+Fits small synthetic forests (single-output RF, native multi-output RF, MultiOutputRegressor
+of RFs) and optionally checks saved artifacts, on random rows plus rows placed exactly on
+split thresholds. Predictions must be bit-identical.
+
+The float32 CompactForest is checked for the same split decisions: its predictions must
+equal those of the FlatForest with float32-rounded leaf values (up to summation order);
+its drift from sklearn is printed.
+
+Run from ml-services/models:
+  python -m ml_common.check_forest_engine
+  python -m ml_common.check_forest_engine --model soil_moisture_model/model_sensor.joblib \\
+      --model Crop_Water_Model/model.joblib
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.multioutput import MultiOutputRegressor
+
+from ml_common.forest_engine import CompactForest, FlatForest
+
+
+def _forest_of(model):
+    """Unwrap a Pipeline to its final estimator."""
+    return model.steps[-1][1] if hasattr(model, "steps") else model
+
+
+def _check_rows(ff: FlatForest, rng: np.random.Generator, n_rows: int) -> np.ndarray:
+    """Random rows plus rows that sit exactly on split thresholds (exercises the <= boundary)."""
+    X = rng.normal(size=(n_rows, ff.n_features))
+    splits = ff.left != np.arange(ff.n_nodes)
+    feat, thr = ff.feature[splits], ff.threshold[splits]
+    pick = rng.integers(0, len(feat), size=n_rows)
+    X_edge = rng.normal(size=(n_rows, ff.n_features))
+    X_edge[np.arange(n_rows), feat[pick]] = thr[pick].astype(np.float32)
+    return np.vstack([X, X_edge])
+
+
+def check(name: str, model, rng: np.random.Generator, n_rows: int = 500) -> bool:
+    model = _forest_of(model)
+    # Sequential accumulation in sklearn so both sides sum trees in the same order
+    for est in [model, *getattr(model, "estimators_", [])]:
+        if hasattr(est, "n_jobs"):
+            est.n_jobs = 1
+    ff = FlatForest.from_sklearn(model)
+    X = _check_rows(ff, rng, n_rows)
+    expected = model.predict(X)
+    got = ff.predict(X)
+    single = np.array([ff.predict(X[i:i + 1])[0] for i in range(20)])
+    ok = expected.shape == got.shape and np.array_equal(expected, got) and np.array_equal(expected[:20], single)
+    diff = float(np.max(np.abs(expected - got))) if expected.shape == got.shape else float("nan")
+    print(f"{'OK  ' if ok else 'FAIL'} {name}: trees={ff.n_trees} nodes={ff.n_nodes} "
+          f"outputs={ff.n_outputs} rows={len(X)} max|diff|={diff:.3g}")
+    return ok and check_compact(name, ff, X, expected)
+
+
+def check_compact(name: str, ff: FlatForest, X: np.ndarray, expected: np.ndarray) -> bool:
+    compact = CompactForest.from_flat(ff)
+    rounded = FlatForest(ff.feature, ff.threshold, ff.left, ff.right, ff.value.astype(np.float32).astype(np.float64),
+                         ff.roots, ff.group_starts, ff.max_depth, ff.n_features, ff.missing_go_to_left)
+    got = compact.predict(X)
+    ok = got.shape == expected.shape and np.allclose(rounded.predict(X), got, rtol=1e-12, atol=1e-12)
+    drift = float(np.max(np.abs(expected - got))) if got.shape == expected.shape else float("nan")
+    print(f"{'OK  ' if ok else 'FAIL'} {name} [compact]: nodes={compact.n_nodes} "
+          f"bytes={ff.nbytes / 1e6:.1f}MB->{compact.nbytes / 1e6:.1f}MB max|diff| vs sklearn={drift:.3g}")
+    return ok
+
+
+def synthetic_models(rng: np.random.Generator) -> dict:
+    X = rng.normal(size=(800, 10))
+    Y = X[:, :5] * 3 + rng.normal(size=(800, 5))
+    return {
+        "RandomForestRegressor (1 output)": RandomForestRegressor(60, max_depth=12, random_state=0).fit(X, Y[:, 0]),
+        "RandomForestRegressor (5 outputs)": RandomForestRegressor(60, max_depth=12, random_state=0).fit(X, Y),
+        "MultiOutputRegressor(RF) x5": MultiOutputRegressor(
+            RandomForestRegressor(40, max_depth=12, random_state=0)
+        ).fit(X, Y),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", action="append", default=[], help="joblib artifact to check (repeatable)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = [check(name, model, rng) for name, model in synthetic_models(rng).items()]
+    for path in args.model:
+        results.append(check(Path(path).name, joblib.load(path), rng))
+    print("All parity checks passed" if all(results) else "Parity check FAILED")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
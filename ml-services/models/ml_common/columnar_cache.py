@@ -0,0 +1,125 @@
+"""
+Columnar on-disk cache for prepared DataFrames, keyed by a hash of the source file(s).
+
+A cached frame is a directory with one .npy file per column plus manifest.json (key,
+row count, column names and dtypes). Categorical columns are stored as integer codes
+with their categories in the manifest. Loading reads the arrays back without any CSV
+parsing; numeric columns can be memory-mapped (mmap_mode="r").
+
+    df = cached_frame(cache_dir, [csv_path], lambda: expensive_prepare(csv_path), params)
+
+A directory whose manifest key differs (source edited, parameters changed) is a miss
+and gets replaced on the next save.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+# Bump when the on-disk layout changes so old caches are ignored
+FORMAT_VERSION = 1
+
+
+def source_key(paths: Iterable[Path], params: Any = None) -> str:
+    """sha256 over the size and bytes of each source file and the JSON of params (whatever else shapes the frame)."""
+    digest = hashlib.sha256(f"columnar-cache-v{FORMAT_VERSION}".encode())
+    for path in paths:
+        digest.update(str(Path(path).stat().st_size).encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _column_file(i: int) -> str:
+    # Column names may contain spaces / slashes; files are named by position
+    return f"col_{i:03d}.npy"
+
+
+def save_frame(df: pd.DataFrame, cache_dir: Path, key: str) -> None:
+    """Write df under cache_dir, replacing any previous cache. Written to a temp dir and renamed into place."""
+    cache_dir = Path(cache_dir)
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{cache_dir.name}.", dir=cache_dir.parent))
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            entry: dict[str, Any] = {"name": name, "file": _column_file(i)}
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                values = series.cat.codes.to_numpy()
+                entry["dtype"] = "category"
+                entry["categories"] = series.cat.categories.tolist()
+                entry["ordered"] = bool(series.cat.ordered)
+            else:
+                values = series.to_numpy()
+                if values.dtype == object:
+                    raise TypeError(f"Column {name!r}: object columns are not cached, convert to category first")
+                entry["dtype"] = values.dtype.str
+            np.save(tmp_dir / entry["file"], values, allow_pickle=False)
+            columns.append(entry)
+        manifest = {"format": FORMAT_VERSION, "key": key, "rows": len(df), "columns": columns}
+        (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+        if cache_dir.exists():
+            shutil.rmtree(cache_dir)
+        os.replace(tmp_dir, cache_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def load_frame(cache_dir: Path, key: str, mmap_mode: str | None = None) -> pd.DataFrame | None:
+    """The cached frame if cache_dir holds one for key, else None (missing, stale or unreadable)."""
+    cache_dir = Path(cache_dir)
+    try:
+        manifest = json.loads((cache_dir / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("format") != FORMAT_VERSION or manifest.get("key") != key:
+        return None
+    try:
+        data = {}
+        for entry in manifest["columns"]:
+            values = np.load(cache_dir / entry["file"], mmap_mode=mmap_mode, allow_pickle=False)
+            if len(values) != manifest["rows"]:
+                return None
+            if entry["dtype"] == "category":
+                dtype = pd.CategoricalDtype(entry["categories"], ordered=entry["ordered"])
+                data[entry["name"]] = pd.Categorical.from_codes(np.asarray(values), dtype=dtype)
+            else:
+                data[entry["name"]] = values
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Ignoring unreadable columnar cache %s: %s", cache_dir, e)
+        return None
+    return pd.DataFrame(data, columns=[entry["name"] for entry in manifest["columns"]], copy=False)
+
+
+def cached_frame(
+    cache_dir: Path,
+    sources: Iterable[Path],
+    build: Callable[[], pd.DataFrame],
+    params: Any = None,
+    rebuild: bool = False,
+    mmap_mode: str | None = None,
+) -> pd.DataFrame:
+    """load_frame for the current sources, else build() and save_frame. Object columns of the built frame become categoricals."""
+    key = source_key(sources, params)
+    df = None if rebuild else load_frame(cache_dir, key, mmap_mode=mmap_mode)
+    if df is None:
+        df = build()
+        object_cols = [c for c in df.columns if df[c].dtype == object]
+        if object_cols:
+            df = df.astype({c: "category" for c in object_cols})
+        save_frame(df, cache_dir, key)
+    return df
@@ -0,0 +1,426 @@
+"""
+Array-backed evaluator for fitted sklearn tree ensembles.
+
+FlatForest copies every tree of a RandomForestRegressor (or a MultiOutputRegressor of
+forests) into contiguous node arrays and walks all trees at once with numpy indexing.
+There is no per-tree Python call, no input validation and no thread pool, which is what
+dominates sklearn's latency on one-row and small-batch requests.
+
+The numpy walk does random gathers over all nodes, so it only wins on small inputs
+(see benchmark_forest_engine.py); make_predictor(model, "flat") therefore keeps the
+sklearn model for batches above FLAT_MAX_ROWS. Select it per model with the engine env
+vars read by Crop_Water_Model/main.py and soil_moisture_model/predict.py (value "flat";
+default "sklearn").
+
+to_arrays() / from_arrays() round-trip the node arrays through plain numpy arrays, which
+ml_common.bundle stores as memory-mapped .npy members: a service on the flat engine then
+starts without exporting (or even unpickling) the sklearn forest.
+
+CompactForest (engine "compact") is the serving form for memory-bound workers: float32
+thresholds and leaf values, uint8 / uint16 feature indices, one child array (siblings are
+adjacent, right = left + 1) and no nodes below splits whose leaves all predict the same
+float32 value. Thresholds are rounded down to float32, so every split decision matches
+sklearn (which compares float32 inputs); only the float32 leaf values change predictions,
+by about 1e-7 relative. compaction_drift() reports that difference on held-out data. It
+serves every batch size on its own, so the sklearn forest is not kept in memory.
+"""
+from typing import Any, Callable
+
+import numpy as np
+
+ENGINES = ("sklearn", "flat", "compact")
+# Above this many rows sklearn's per-tree C loop is faster than the all-trees numpy walk
+FLAT_MAX_ROWS = 64
+# CompactForest walks large batches in slices of this many rows to bound its temporaries
+COMPACT_CHUNK_ROWS = 256
+
+
+class FlatForest:
+    """
+    Node arrays for all trees, indexed globally:
+      feature, threshold, left, right  (n_nodes,)
+      value                            (n_nodes, n_tree_outputs)
+      roots                            (n_trees,)  root node of each tree
+      group_starts                     (n_groups,) first tree of each output group
+    Leaves point to themselves, so every row can take exactly max_depth steps.
+    Output columns are group-major: MultiOutputRegressor gives one group per target,
+    a native multi-output forest gives one group with n_tree_outputs columns.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        group_starts: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        missing_go_to_left: np.ndarray | None = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.group_starts = group_starts
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.missing_go_to_left = missing_go_to_left
+        self.group_ends = np.append(group_starts[1:], len(roots))
+        self.group_sizes = (self.group_ends - group_starts).astype(float)
+        self.n_outputs = len(group_starts) * value.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "FlatForest":
+        """Export a fitted RandomForestRegressor / ExtraTreesRegressor or a MultiOutputRegressor of them."""
+        if hasattr(model, "estimators_") and all(hasattr(e, "estimators_") for e in model.estimators_):
+            groups = [list(forest.estimators_) for forest in model.estimators_]  # MultiOutputRegressor
+        elif hasattr(model, "estimators_") and all(hasattr(e, "tree_") for e in model.estimators_):
+            groups = [list(model.estimators_)]
+        else:
+            raise TypeError(f"Unsupported model for FlatForest: {type(model).__name__}")
+
+        trees = [est.tree_ for group in groups for est in group]
+        n_tree_outputs = {t.n_outputs for t in trees}
+        if len(n_tree_outputs) != 1:
+            raise TypeError("All trees must have the same number of outputs")
+        sizes = np.array([t.node_count for t in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        feature, threshold, left, right, value, missing = [], [], [], [], [], []
+        has_missing = all(hasattr(t, "missing_go_to_left") for t in trees)
+        for t, offset in zip(trees, offsets):
+            is_leaf = t.children_left == -1
+            own = np.arange(t.node_count) + offset
+            left.append(np.where(is_leaf, own, t.children_left + offset))
+            right.append(np.where(is_leaf, own, t.children_right + offset))
+            feature.append(np.where(is_leaf, 0, t.feature))
+            threshold.append(np.where(is_leaf, 0.0, t.threshold))
+            value.append(t.value[:, :, 0])
+            if has_missing:
+                missing.append(np.asarray(t.missing_go_to_left, dtype=bool))
+
+        index_dtype = np.int32 if sizes.sum() < np.iinfo(np.int32).max else np.int64
+        group_starts = np.concatenate([[0], np.cumsum([len(g) for g in groups])[:-1]])
+        return cls(
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            left=np.concatenate(left).astype(index_dtype),
+            right=np.concatenate(right).astype(index_dtype),
+            value=np.ascontiguousarray(np.concatenate(value), dtype=np.float64),
+            roots=offsets.astype(index_dtype),
+            group_starts=group_starts.astype(np.intp),
+            max_depth=max(t.max_depth for t in trees),
+            n_features=trees[0].n_features,
+            missing_go_to_left=np.concatenate(missing) if has_missing and any(m.any() for m in missing) else None,
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "group_starts": self.group_starts,
+            "shape": np.array([self.max_depth, self.n_features], dtype=np.int64),
+        }
+        if self.missing_go_to_left is not None:
+            arrays["missing_go_to_left"] = self.missing_go_to_left
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "FlatForest":
+        """Inverse of to_arrays(); the arrays are used as given (memory-mapped arrays stay mapped)."""
+        max_depth, n_features = (int(v) for v in arrays["shape"])
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            value=arrays["value"],
+            roots=np.asarray(arrays["roots"]),
+            group_starts=np.asarray(arrays["group_starts"]),
+            max_depth=max_depth,
+            n_features=n_features,
+            missing_go_to_left=arrays.get("missing_go_to_left"),
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.to_arrays().values())
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index per (row, tree), shape (n_rows, n_trees)."""
+        # sklearn evaluates trees on float32 input against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if self.missing_go_to_left is not None:
+                go_left |= np.isnan(x) & self.missing_go_to_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Same shape as the sklearn model: (n,) for one output, else (n, n_outputs)."""
+        leaves = self.value[self.apply(X)]  # (n_rows, n_trees, n_tree_outputs)
+        # Running sum in tree order, like sklearn's sequential accumulation, so results match bit for bit
+        sums = np.stack(
+            [np.cumsum(leaves[:, start:end], axis=1)[:, -1] for start, end in zip(self.group_starts, self.group_ends)],
+            axis=1,
+        )
+        out = (sums / self.group_sizes[None, :, None]).reshape(leaves.shape[0], self.n_outputs)
+        return out[:, 0] if self.n_outputs == 1 else out
+
+
+def _index_dtype(n: int) -> type:
+    return np.int32 if n < np.iinfo(np.int32).max else np.int64
+
+
+class CompactForest:
+    """
+    Compact node arrays (see module docstring), indexed globally in breadth-first order:
+      feature    (n_nodes,)  uint8 / uint16 (0 at leaves)
+      threshold  (n_nodes,)  float32, +inf at leaves
+      child      (n_nodes,)  left child; the right child is child + 1; a leaf points to itself
+      value      (n_nodes, n_tree_outputs) float32 (only read at leaves)
+      roots, group_starts as in FlatForest
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        child: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        group_starts: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        missing_go_to_left: np.ndarray | None = None,
+        chunk_rows: int = COMPACT_CHUNK_ROWS,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.child = child
+        self.value = value
+        self.roots = roots
+        self.group_starts = group_starts
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.missing_go_to_left = missing_go_to_left
+        self.chunk_rows = chunk_rows
+        self.group_ends = np.append(group_starts[1:], len(roots))
+        self.group_sizes = (self.group_ends - group_starts).astype(float)
+        self.n_outputs = len(group_starts) * value.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "CompactForest":
+        return cls.from_flat(FlatForest.from_sklearn(model))
+
+    @classmethod
+    def from_flat(cls, flat: FlatForest) -> "CompactForest":
+        value32 = flat.value.astype(np.float32)
+        is_leaf = flat.left == np.arange(flat.n_nodes)
+        # Collapse splits whose two children are leaves with equal float32 values, bottom-up
+        left, right = flat.left.astype(np.int64), flat.right.astype(np.int64)
+        while True:
+            both = ~is_leaf & is_leaf[left] & is_leaf[right]
+            both[both] = (value32[left[both]] == value32[right[both]]).all(axis=1)
+            if not both.any():
+                break
+            value32[both] = value32[left[both]]
+            is_leaf |= both
+
+        # Breadth-first renumbering over all trees at once; the two children of a split get adjacent ids
+        n_trees = flat.n_trees
+        new_id = np.full(flat.n_nodes, -1, dtype=np.int64)
+        new_id[flat.roots] = np.arange(n_trees)
+        order = [flat.roots.astype(np.int64)]
+        frontier, next_id = order[0], n_trees
+        while len(frontier):
+            splits = frontier[~is_leaf[frontier]]
+            children = np.stack([left[splits], right[splits]], axis=1).ravel()
+            new_id[children] = next_id + np.arange(len(children))
+            next_id += len(children)
+            order.append(children)
+            frontier = children
+        old = np.concatenate(order)  # old id of each new id
+        n_nodes = len(old)
+
+        leaf = is_leaf[old]
+        child = np.where(leaf, np.arange(n_nodes), new_id[left[old]])
+        threshold = flat.threshold[old]
+        threshold32 = threshold.astype(np.float32)
+        # Largest float32 <= the float64 threshold: x <= t64 and x <= t32 agree for every float32 x
+        over = threshold32.astype(np.float64) > threshold
+        threshold32[over] = np.nextafter(threshold32[over], np.float32(-np.inf))
+        threshold32[leaf] = np.inf
+        feature_dtype = np.uint8 if flat.n_features <= 256 else np.uint16 if flat.n_features <= 65536 else np.intp
+        missing = None
+        if flat.missing_go_to_left is not None:
+            missing = flat.missing_go_to_left[old] | leaf
+        return cls(
+            feature=np.where(leaf, 0, flat.feature[old]).astype(feature_dtype),
+            threshold=threshold32,
+            child=child.astype(_index_dtype(n_nodes)),
+            value=np.ascontiguousarray(value32[old]),
+            roots=np.arange(n_trees, dtype=_index_dtype(n_nodes)),
+            group_starts=np.asarray(flat.group_starts, dtype=np.intp),
+            max_depth=len(order) - 2,
+            n_features=flat.n_features,
+            missing_go_to_left=missing,
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "child": self.child,
+            "value": self.value,
+            "roots": self.roots,
+            "group_starts": self.group_starts,
+            "shape": np.array([self.max_depth, self.n_features], dtype=np.int64),
+        }
+        if self.missing_go_to_left is not None:
+            arrays["missing_go_to_left"] = self.missing_go_to_left
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "CompactForest":
+        """Inverse of to_arrays(); the arrays are used as given (memory-mapped arrays stay mapped)."""
+        max_depth, n_features = (int(v) for v in arrays["shape"])
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            child=arrays["child"],
+            value=arrays["value"],
+            roots=np.asarray(arrays["roots"]),
+            group_starts=np.asarray(arrays["group_starts"]),
+            max_depth=max_depth,
+            n_features=n_features,
+            missing_go_to_left=arrays.get("missing_go_to_left"),
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.to_arrays().values())
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index per (row, tree), shape (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+        has_nan = bool(np.isnan(X).any())
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            # NaN > t is False, so without missing values a leaf (t = +inf) always stays put
+            go_right = x > self.threshold[node]
+            if has_nan:
+                is_nan = np.isnan(x)
+                if self.missing_go_to_left is not None:
+                    go_left_if_nan = self.missing_go_to_left[node]
+                else:
+                    go_left_if_nan = self.child[node] == node  # sklearn sends NaN right; leaves stay
+                go_right |= is_nan & ~go_left_if_nan
+            node = self.child[node] + go_right
+        return node
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Same shape as the sklearn model: (n,) for one output, else (n, n_outputs)."""
+        X = np.asarray(X)
+        if len(X) > self.chunk_rows:
+            return np.concatenate([self.predict(X[i:i + self.chunk_rows]) for i in range(0, len(X), self.chunk_rows)])
+        leaves = self.value[self.apply(X)]  # (n_rows, n_trees, n_tree_outputs) float32
+        sums = np.stack(
+            [leaves[:, start:end].sum(axis=1, dtype=np.float64) for start, end in zip(self.group_starts, self.group_ends)],
+            axis=1,
+        )
+        out = (sums / self.group_sizes[None, :, None]).reshape(leaves.shape[0], self.n_outputs)
+        return out[:, 0] if self.n_outputs == 1 else out
+
+
+def compaction_drift(reference: Any, compact: CompactForest, X: np.ndarray, y_true: np.ndarray | None = None) -> dict:
+    """
+    How far compact's predictions on X are from reference.predict(X) (the original forest):
+    max / mean absolute difference and, with y_true, the MAE of both against it.
+    """
+    expected = np.asarray(reference.predict(X), dtype=np.float64)
+    got = compact.predict(X)
+    diff = np.abs(expected - got)
+    report = {
+        "rows": int(len(X)),
+        "max_abs_diff": float(diff.max()) if diff.size else 0.0,
+        "mean_abs_diff": float(diff.mean()) if diff.size else 0.0,
+        "compact_bytes": int(compact.nbytes),
+        "compact_nodes": int(compact.n_nodes),
+    }
+    if y_true is not None:
+        y_true = np.asarray(y_true, dtype=np.float64).reshape(expected.shape)
+        report["mae_original"] = float(np.abs(expected - y_true).mean())
+        report["mae_compact"] = float(np.abs(got - y_true).mean())
+    return report
+
+
+class HybridPredictor:
+    """
+    FlatForest for single rows and small batches, the sklearn model for large batches.
+    model may be given as load_model(), called on the first large batch.
+    """
+
+    def __init__(self, flat: FlatForest, model: Any = None, max_flat_rows: int = FLAT_MAX_ROWS,
+                 load_model: Callable[[], Any] | None = None):
+        self.flat = flat
+        self._model = model
+        self._load_model = load_model
+        self.max_flat_rows = max_flat_rows
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        if len(X) <= self.max_flat_rows:
+            return self.flat.predict(X)
+        return self.model.predict(X)
+
+
+def make_predictor(model: Any, engine: str) -> Any:
+    """Return an object with .predict(X) for the requested engine ("sklearn" returns the model itself)."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine {engine!r}. Allowed: {list(ENGINES)}")
+    if engine == "flat":
+        return HybridPredictor(FlatForest.from_sklearn(model), model)
+    if engine == "compact":
+        return CompactForest.from_sklearn(model)
+    return model
@@ -0,0 +1,92 @@
+"""
+Per-process memory report from /proc/<pid>/smaps_rollup (Linux).
+
+Shared = pages also mapped by another process (e.g. model arrays inherited copy-on-write
+from a pre-fork master); Private = pages only this process maps. PSS splits shared pages
+evenly across their sharers, so the PSS column sums to the real footprint of the group.
+
+Run from ml-services/models:
+  python -m ml_common.memory_report --children <master pid>   # master + all its workers
+  python -m ml_common.memory_report <pid> [<pid> ...]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# smaps_rollup fields reported, all in kB
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def read_smaps_rollup(pid: int | str = "self") -> dict[str, int]:
+    """kB per FIELDS entry, plus 'Shared' and 'Private' totals."""
+    values: dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB" and parts[0].rstrip(":") in FIELDS:
+                values[parts[0].rstrip(":")] = int(parts[1])
+    values["Shared"] = values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)
+    values["Private"] = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values
+
+
+def descendant_pids(pid: int) -> list[int]:
+    """All descendants of pid (children, grandchildren, ...), from /proc/<pid>/task/*/children."""
+    found: list[int] = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            tasks = list(Path(f"/proc/{parent}/task").iterdir())
+        except FileNotFoundError:
+            continue
+        for task in tasks:
+            children = [int(c) for c in (task / "children").read_text().split()]
+            found.extend(children)
+            pending.extend(children)
+    return sorted(found)
+
+
+def report(pids: list[int]) -> list[dict]:
+    rows = []
+    for pid in pids:
+        try:
+            rows.append({"pid": pid, **read_smaps_rollup(pid)})
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return rows
+
+
+def format_report(rows: list[dict]) -> str:
+    columns = ("pid", "Rss", "Pss", "Shared", "Private", "Private_Dirty")
+    lines = ["  ".join(f"{c:>13}" for c in columns)]
+    for row in rows:
+        lines.append("  ".join(f"{row['pid']:>13}" if c == "pid" else f"{row[c] / 1024:>10.1f} MB" for c in columns))
+    lines.append(
+        f"{'total':>13}  {sum(r['Rss'] for r in rows) / 1024:>10.1f} MB  {sum(r['Pss'] for r in rows) / 1024:>10.1f} MB"
+        "  (RSS counts shared pages once per process; PSS is the real footprint)"
+    )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pids", nargs="*", type=int, help="process IDs to report")
+    parser.add_argument("--children", type=int, metavar="PID", help="report PID and all its descendants")
+    args = parser.parse_args()
+
+    pids = list(args.pids)
+    if args.children is not None:
+        pids += [args.children, *descendant_pids(args.children)]
+    if not pids:
+        parser.error("give at least one pid or --children PID")
+    rows = report(pids)
+    if not rows:
+        print("No readable /proc/<pid>/smaps_rollup for the given pids", file=sys.stderr)
+        return 1
+    print(format_report(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
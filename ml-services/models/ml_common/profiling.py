@@ -0,0 +1,112 @@
+"""
+Wall-clock time and peak memory per training phase.
+
+Peak memory is sampled RSS of this process plus all its descendants (joblib / loky
+workers of a parallel search), so parallel and serial runs compare fairly. Sampling
+uses /proc on Linux; elsewhere only the main process peak (getrusage) is reported, and on
+platforms without the resource module (Windows) peak memory is reported as unavailable.
+
+    profiler = PhaseProfiler()
+    with profiler.phase("search"):
+        search.fit(X, y)
+    profiler.print_summary()
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ml_common.memory_report import descendant_pids
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        return int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * _PAGE_KB
+    except (FileNotFoundError, ProcessLookupError, IndexError, ValueError):
+        return 0
+
+
+class _PeakSampler:
+    """Background thread tracking the peak RSS (kB) of this process and of its whole process tree."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.peak_self_kb = 0
+        self.peak_tree_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="peak-rss-sampler", daemon=True)
+
+    def _sample(self) -> None:
+        pid = os.getpid()
+        own = _rss_kb(pid)
+        tree = own + sum(_rss_kb(child) for child in descendant_pids(pid))
+        self.peak_self_kb = max(self.peak_self_kb, own)
+        self.peak_tree_kb = max(self.peak_tree_kb, tree)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval_seconds)
+
+    def __enter__(self) -> "_PeakSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class PhaseProfiler:
+    def __init__(self, sample_interval_seconds: float = 0.05, stream=None):
+        self.sample_interval_seconds = sample_interval_seconds
+        self.stream = stream if stream is not None else sys.stdout
+        self.phases: list[dict] = []
+        self._proc = Path("/proc/self/statm").exists()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        if self._proc:
+            with _PeakSampler(self.sample_interval_seconds) as sampler:
+                yield
+            peak_self_mb, peak_tree_mb = sampler.peak_self_kb / 1024, sampler.peak_tree_kb / 1024
+        else:
+            yield
+            peak_self_mb = peak_tree_mb = None
+            if resource is not None:
+                # ru_maxrss is the lifetime peak (kB on Linux, bytes on macOS)
+                maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                peak_self_mb = maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        record = {
+            "phase": name,
+            "seconds": time.perf_counter() - start,
+            "peak_rss_mb": peak_self_mb,
+            "peak_rss_with_workers_mb": peak_tree_mb,
+        }
+        self.phases.append(record)
+        print(f"[phase] {self._format(record)}", file=self.stream, flush=True)
+
+    @staticmethod
+    def _format(record: dict) -> str:
+        workers = record["peak_rss_with_workers_mb"]
+        tree = f", with workers {workers:.0f} MB" if workers is not None else ""
+        peak = f"{record['peak_rss_mb']:.0f} MB" if record["peak_rss_mb"] is not None else "unavailable"
+        return f"{record['phase']}: {record['seconds']:.2f} s, peak RSS {peak}{tree}"
+
+    def print_summary(self) -> None:
+        print("\n--- Phase timings ---", file=self.stream)
+        for record in self.phases:
+            print(f"  {self._format(record)}", file=self.stream)
+        print(f"  total: {sum(r['seconds'] for r in self.phases):.2f} s", file=self.stream)
+        print("---\n", file=self.stream, flush=True)
@@ -0,0 +1,262 @@
+"""
+Versioned model registry with atomic hot swap, shared by the Crop Water and Soil Moisture services.
+
+A ModelRegistry owns the active version of one model. A reload loads the artifact files
+into a new object, warms it up and only then replaces `registry.active` in one assignment.
+Request code reads `registry.get()` once and uses that object to the end, so in-flight
+requests finish on the version they started with while new requests see the new one.
+If loading or warm-up fails the active version stays and the error is kept for /health.
+
+ArtifactWatcher optionally polls the files (mtime + size) and reloads a registry once its
+files have changed and then stayed unchanged for one poll interval, so a model that is
+still being written by train.py is not picked up half-way.
+"""
+import hashlib
+import hmac
+import ipaddress
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+def content_version(*blobs: bytes) -> str:
+    """Short content hash used as the version string of a set of artifact files."""
+    digest = hashlib.sha256()
+    for blob in blobs:
+        digest.update(hashlib.sha256(blob).digest())
+    return digest.hexdigest()[:12]
+
+
+def file_stamp(paths: Iterable[Path]) -> tuple:
+    """Cheap change detector: (mtime_ns, size) per path, None for a missing file."""
+    stamp = []
+    for path in paths:
+        try:
+            st = path.stat()
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class ModelVersion:
+    def __init__(self, version: str, artifacts: Any):
+        self.version = version
+        self.artifacts = artifacts
+        self.loaded_at = datetime.now(timezone.utc)
+
+
+class ModelRegistry:
+    """
+    load()   -> (version, artifacts): read the files into a new artifacts object.
+    warmup() -> None: optional, run on the new artifacts before they are swapped in.
+    stamp()  -> hashable: optional, cheap on-disk state for ArtifactWatcher.
+    on_swap(version) -> None: optional, run after a new version became active (drop caches).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load: Callable[[], tuple[str, Any]],
+        warmup: Callable[[Any], None] | None = None,
+        stamp: Callable[[], Any] | None = None,
+        on_swap: Callable[["ModelVersion"], None] | None = None,
+    ):
+        self.name = name
+        self._load = load
+        self._warmup = warmup
+        self._stamp = stamp
+        self._on_swap = on_swap
+        self.active: ModelVersion | None = None
+        self.reloading = False
+        self.last_error: str | None = None
+        self.loaded_stamp: Any = None
+        # One load at a time; readers never take it
+        self._lock = threading.Lock()
+        # Loads started so far, and the number of the last one that succeeded: a reload() call
+        # shares the result of a load that started after the call arrived, never an older one
+        self._generation = 0
+        self._loaded_generation = 0
+
+    def get(self) -> Any:
+        """Artifacts of the active version, loading them on first use (FileNotFoundError if missing)."""
+        return self.get_version().artifacts
+
+    def get_version(self) -> ModelVersion:
+        """Like get(), with the version string (artifacts and version always belong together)."""
+        active = self.active
+        if active is None:
+            active = self.ensure_loaded()
+        return active
+
+    def ensure_loaded(self) -> ModelVersion:
+        with self._lock:
+            if self.active is None:
+                self._swap_in()
+            return self.active
+
+    def reload(self) -> ModelVersion:
+        """
+        Load the current files, warm up and swap in. Raises on failure; the active version is kept.
+        Single-flight: a call that had to wait for a load which started after the call arrived
+        returns that load's result. A load already running on arrival may have read the files
+        before they were replaced, so the call waits for it and then loads once more.
+        """
+        arrived = self._generation
+        with self._lock:
+            if self._loaded_generation <= arrived:
+                self._swap_in()
+            return self.active
+
+    def reload_in_background(self) -> bool:
+        """Start reload() on a daemon thread. False if a load is already running."""
+        if self._lock.locked():
+            return False
+
+        def run() -> None:
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Background reload of %s failed", self.name)
+
+        threading.Thread(target=run, name=f"reload-{self.name}", daemon=True).start()
+        return True
+
+    def _swap_in(self) -> None:
+        # Counted before anything is read, so a reload() arriving from here on waits for a newer load
+        self._generation += 1
+        generation = self._generation
+        stamp = self._stamp() if self._stamp is not None else None
+        self.reloading = True
+        try:
+            version, artifacts = self._load()
+            if self.active is not None and version == self.active.version:
+                logger.info("%s unchanged (version %s)", self.name, version)
+            else:
+                if self._warmup is not None:
+                    self._warmup(artifacts)
+                previous = self.active.version if self.active is not None else None
+                self.active = ModelVersion(version, artifacts)
+                logger.info("%s version %s active (was %s)", self.name, version, previous)
+                if self._on_swap is not None:
+                    self._on_swap(self.active)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.reloading = False
+        self.last_error = None
+        self.loaded_stamp = stamp
+        self._loaded_generation = generation
+
+    def changed_on_disk(self) -> bool:
+        return self._stamp is not None and self._stamp() != self.loaded_stamp
+
+    def status(self) -> dict[str, Any]:
+        active = self.active
+        return {
+            "loaded": active is not None,
+            "version": active.version if active is not None else None,
+            "loaded_at": active.loaded_at.isoformat() if active is not None else None,
+            "reloading": self.reloading,
+            "last_error": self.last_error,
+        }
+
+
+class ArtifactWatcher:
+    """Daemon thread that reloads registries whose files changed (see module docstring)."""
+
+    def __init__(self, registries: Iterable[ModelRegistry], interval_seconds: float):
+        self.registries = [r for r in registries if r._stamp is not None]
+        self.interval_seconds = interval_seconds
+        self._pending: dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "ArtifactWatcher":
+        self._thread = threading.Thread(target=self._run, name="artifact-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def poll(self) -> None:
+        for registry in self.registries:
+            if registry.active is None or not registry.changed_on_disk():
+                self._pending.pop(registry.name, None)
+                continue
+            stamp = registry._stamp()
+            if self._pending.get(registry.name) != stamp:
+                # Changed since the last poll: wait until the files settle
+                self._pending[registry.name] = stamp
+                continue
+            self._pending.pop(registry.name, None)
+            try:
+                registry.reload()
+            except Exception:
+                logger.exception("Reload of %s after file change failed", registry.name)
+                # Do not retry the same broken files every interval
+                registry.loaded_stamp = stamp
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.poll()
+
+
+def start_watcher_from_env(registries: Iterable[ModelRegistry], env_value: str | None) -> ArtifactWatcher | None:
+    """Start an ArtifactWatcher if env_value (MODEL_RELOAD_POLL_SECONDS) is a positive number."""
+    try:
+        interval = float(env_value or 0)
+    except ValueError:
+        logger.warning("Ignoring invalid MODEL_RELOAD_POLL_SECONDS=%r", env_value)
+        return None
+    if interval <= 0:
+        return None
+    return ArtifactWatcher(registries, interval).start()
+
+
+# 403 detail of the admin endpoints
+ADMIN_DENIED = "Invalid admin token (without MODEL_ADMIN_TOKEN only clients on this host may call /admin)"
+
+
+def _is_loopback(host: str | None) -> bool:
+    try:
+        return host is not None and ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def admin_token_ok(token: str | None, expected: str | None, client_host: str | None = None) -> bool:
+    """
+    With a token configured (MODEL_ADMIN_TOKEN), admin endpoints need a matching X-Admin-Token.
+    Without one they are closed to everyone but loopback clients (client_host 127.0.0.1 / ::1),
+    so a service reachable from the network cannot be made to reload by anyone.
+    """
+    if not expected:
+        return _is_loopback(client_host)
+    return token is not None and hmac.compare_digest(token, expected)
+
+
+def reload_registries(registries: Iterable[ModelRegistry], wait: bool) -> dict[str, Any]:
+    """
+    Admin reload: with wait, reload each registry now and report its status (or error);
+    otherwise start background reloads and return at once. Poll /health for the result.
+    """
+    out: dict[str, Any] = {}
+    for registry in registries:
+        if not wait:
+            out[registry.name] = {"started": registry.reload_in_background(), **registry.status()}
+            continue
+        try:
+            registry.reload()
+        except Exception as e:
+            logger.exception("Reload of %s failed", registry.name)
+            out[registry.name] = {**registry.status(), "last_error": f"{type(e).__name__}: {e}"}
+            continue
+        out[registry.name] = registry.status()
+    return out
@@ -0,0 +1,77 @@
+"""
+Calls from one service to another's JSON endpoint: over HTTP, or, when the target endpoint
+is served by this same process (the unified API mounts every service), by calling its
+handler directly, with no JSON encoding, socket or loopback request through the server.
+
+    register_local("http://127.0.0.1:8000/crop-water/predict", handler)   # unified_api does this
+    data = post_json(url, payload, timeout=10)              # sync callers (chatbot tools)
+    data = await apost_json(client, url, payload, 10)       # async callers on a pooled client
+
+A handler takes the payload (the dict that would have been sent as JSON) and returns the
+response as a dict, raising ServiceError(status_code, detail) where the endpoint would have
+answered non-2xx. The HTTP path raises the same ServiceError, so callers handle errors once.
+Handlers are looked up by the exact URL the caller posts to: a standalone deployment
+registers nothing, and a URL pointing elsewhere (another host, an overridden env var)
+still goes over HTTP.
+"""
+import asyncio
+from typing import Any, Callable
+
+import httpx
+
+LocalHandler = Callable[[dict[str, Any]], dict[str, Any]]
+
+_local_handlers: dict[str, LocalHandler] = {}
+
+
+class ServiceError(Exception):
+    """A non-2xx answer: status_code and the endpoint's "detail" (a message or a list of errors)."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def register_local(url: str, handler: LocalHandler) -> None:
+    _local_handlers[url.rstrip("/")] = handler
+
+
+def clear_local() -> None:
+    _local_handlers.clear()
+
+
+def local_handler(url: str) -> LocalHandler | None:
+    return _local_handlers.get(url.rstrip("/"))
+
+
+def _checked_json(r: httpx.Response) -> dict[str, Any]:
+    if not r.is_success:
+        try:
+            detail = r.json().get("detail", r.text)
+        except Exception:
+            detail = r.text or str(r.status_code)
+        raise ServiceError(r.status_code, detail)
+    return r.json()
+
+
+def post_json(url: str, payload: dict[str, Any], timeout: float) -> dict[str, Any]:
+    """POST payload to url (in process when a handler is registered for it); the response body."""
+    handler = local_handler(url)
+    if handler is not None:
+        return handler(payload)
+    return _checked_json(httpx.post(url, json=payload, timeout=timeout))
+
+
+async def apost_json(
+    client: httpx.AsyncClient, url: str, payload: dict[str, Any], timeout: float | None = None
+) -> dict[str, Any]:
+    """
+    Async post_json on the given client; an in-process handler runs on a worker thread, so
+    the event loop keeps serving while it works. asyncio.TimeoutError if the call (in process
+    or over HTTP) misses timeout; a handler that timed out finishes on its thread unobserved.
+    """
+    handler = local_handler(url)
+    if handler is not None:
+        return await asyncio.wait_for(asyncio.to_thread(handler, payload), timeout=timeout)
+    return _checked_json(await asyncio.wait_for(client.post(url, json=payload), timeout=timeout))
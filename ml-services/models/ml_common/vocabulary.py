@@ -0,0 +1,97 @@
+"""
+Interned vocabulary for the categorical crop-water inputs, shared by the Crop Water API,
+the village allocation service and the chatbot tools.
+
+Built once from Crop_Water_Model/config.json. Each category maps every accepted
+spelling (canonical value, any casing / spacing, known aliases) to a small integer ID:
+the value's position in config.json. The IDs index the lookup table and the encoder
+columns in Crop_Water_Model/main.py directly.
+"""
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+CROP_WATER_CONFIG_PATH = Path(__file__).resolve().parent.parent / "Crop_Water_Model" / "config.json"
+
+# Config keys of the categorical inputs, in request / lookup-table order
+CATEGORY_KEYS = ("crop_type", "soil_type", "region", "temperature", "weather_condition")
+
+# Extra spellings accepted per category (matched after normalization) -> canonical value
+ALIASES: dict[str, dict[str, str]] = {
+    "region": {
+        # LLM variations seen by the chatbot
+        "central plateaus & hills region": "Central Plateau & Hills Region",
+        # 4 climate names used by the village UI -> representative agro-climatic zone
+        "desert": "Western Dry Region",
+        "semi arid": "Central Plateau & Hills Region",
+        "semi humid": "Western Himalayan Region",
+        "humid": "Eastern Himalayan Region",
+    },
+}
+
+
+def normalize_spelling(value: str) -> str:
+    """Case-, whitespace- and 'and'/'&'-insensitive key: ' Central plateau and  Hills ' -> 'central plateau & hills'."""
+    key = " ".join(value.split()).casefold()
+    key = re.sub(r"\s*-\s*", "-", key)
+    return key.replace(" and ", " & ")
+
+
+class Category:
+    """One categorical input: canonical values in config order, ID = position."""
+
+    def __init__(self, name: str, values: list[str], aliases: dict[str, str] | None = None):
+        self.name = name
+        self.values: tuple[str, ...] = tuple(values)
+        self._ids: dict[str, int] = {}
+        for i, value in enumerate(self.values):
+            self._ids[value] = i
+            self._ids.setdefault(normalize_spelling(value), i)
+        for alias, target in (aliases or {}).items():
+            self._ids.setdefault(normalize_spelling(alias), self._ids[normalize_spelling(target)])
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def id(self, value: str) -> int | None:
+        """ID of any accepted spelling, or None."""
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids.get(normalize_spelling(value))
+        return i
+
+    def canonical(self, value: str) -> str | None:
+        i = self.id(value)
+        return None if i is None else self.values[i]
+
+    def ids(self, values: list[str]) -> np.ndarray:
+        """IDs for many values (-1 where unknown); each distinct spelling is resolved once."""
+        unique, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        resolved = np.array([-1 if (i := self.id(v)) is None else i for v in unique.tolist()], dtype=np.intp)
+        return resolved[inverse]
+
+
+class Vocabulary:
+    """Category per config key, plus the zone -> climate map the model was trained on."""
+
+    def __init__(self, config: dict, aliases: dict[str, dict[str, str]] | None = None):
+        aliases = ALIASES if aliases is None else aliases
+        self.categories = {k: Category(k, config[k], aliases.get(k)) for k in CATEGORY_KEYS}
+        self.zone_to_climate: dict[str, str] = config.get("zone_to_climate") or {}
+
+    def __getitem__(self, key: str) -> Category:
+        return self.categories[key]
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return tuple(len(self.categories[k]) for k in CATEGORY_KEYS)
+
+
+@lru_cache(maxsize=None)
+def load_vocabulary(path: Path = CROP_WATER_CONFIG_PATH) -> Vocabulary:
+    """Vocabulary for a config.json, read once per process."""
+    with open(path) as f:
+        return Vocabulary(json.load(f))
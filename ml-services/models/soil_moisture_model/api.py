@@ -2,17 +2,25 @@
 FastAPI service for soil moisture predictions (sensor and location models).
 Integrates with Node backend / React Native via JSON and CORS.
 """
+import json
 import logging
+import os
+import threading
+from datetime import date
 from pathlib import Path
 from typing import Any
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import HTMLResponse, Response
+from pydantic import BaseModel, Field, ValidationError
 
 from features import FORECAST_DAYS, get_sensor_feature_names, SENSOR_LAGS, NRSC_LAGS
+from history import get_store
 import predict
+import sensor_stream
+from ml_common.registry import ADMIN_DENIED, admin_token_ok, reload_registries, start_watcher_from_env
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,6 +53,9 @@ class SensorPredictRequest(BaseModel):
     avg_pres: float = Field(..., description="Average pressure (Pa)")
     avg_sm_lag1: float | None = Field(None, description="Soil moisture lag 1 day (optional)")
     avg_sm_lag2: float | None = Field(None, description="Soil moisture lag 2 days (optional)")
+    station_id: str | None = Field(
+        None, description="Sensor station; missing lags are read from its stored daily avg_sm (POST /history/sensor)"
+    )
 
     def to_features_dict(self) -> dict[str, float]:
         out = {
@@ -58,12 +69,15 @@ class SensorPredictRequest(BaseModel):
             "avg_pres": self.avg_pres,
         }
         expected_lags = get_sensor_feature_names(use_lags=True, n_lags=SENSOR_LAGS)
+        stored = None
+        if self.station_id and any(getattr(self, k, None) is None for k in expected_lags if k.startswith("avg_sm_lag")):
+            stored = predict.sensor_lags_from_history(self.station_id)
         for k in expected_lags:
             if k.startswith("avg_sm_lag"):
-                # Use provided value or 0 if missing (API may send only sensor cols)
+                # Use provided value, else the station's stored history, else 0 (API may send only sensor cols)
                 val = getattr(self, k, None)
                 if val is None:
-                    val = 0.0
+                    val = stored[k] if stored else 0.0
                 out[k] = val
         return out
 
@@ -71,11 +85,12 @@ class SensorPredictRequest(BaseModel):
 class LocationPredictRequest(BaseModel):
     state: str = Field(..., description="State name (e.g. Rajasthan)")
     district: str = Field(..., description="District name (e.g. Udaipur)")
-    sm_history: list[float] = Field(
-        ...,
+    sm_history: list[float] | None = Field(
+        None,
         min_length=NRSC_LAGS,
         max_length=NRSC_LAGS,
-        description="Last 7 observed soil moisture values, most recent last",
+        description="Last 7 observed soil moisture values, most recent last; "
+        "omit to use the stored history of the location (POST /history/location)",
     )
     month: int = Field(1, ge=1, le=12, description="Month (1-12)")
 
@@ -92,8 +107,94 @@ def _predict_response_from_dict(d: dict[str, float]) -> PredictResponse:
     )
 
 
+class SensorBatchRequest(BaseModel):
+    rows: list[dict[str, Any]] = Field(
+        ..., min_length=1, description="SensorPredictRequest objects; each row is validated on its own"
+    )
+
+
+class LocationBatchRequest(BaseModel):
+    rows: list[dict[str, Any]] = Field(
+        ..., min_length=1, description="LocationPredictRequest objects; each row is validated on its own"
+    )
+
+
+class BatchPredictItem(BaseModel):
+    index: int
+    predictions: list[float] | None = Field(None, description="Predicted soil moisture (%) for days 3,4,5,6,7")
+    error: str | None = None
+
+
+class BatchPredictResponse(BaseModel):
+    results: list[BatchPredictItem]
+    days_ahead: list[int] = Field(default=list(FORECAST_DAYS), description="Forecast horizons in days")
+
+
+class LocationHistoryRow(BaseModel):
+    state: str
+    district: str
+    sm: float = Field(..., description="Observed soil moisture level of the day")
+
+
+class SensorHistoryRow(BaseModel):
+    station_id: str = Field(..., min_length=1)
+    avg_sm: float = Field(..., description="Daily average soil moisture of the station")
+
+
+class LocationHistoryIngest(BaseModel):
+    date: date
+    rows: list[dict[str, Any]] = Field(
+        ..., min_length=1, description="LocationHistoryRow objects, typically every district of the day"
+    )
+
+
+class SensorHistoryIngest(BaseModel):
+    date: date
+    rows: list[dict[str, Any]] = Field(..., min_length=1, description="SensorHistoryRow objects")
+
+
+class HistoryIngestItem(BaseModel):
+    index: int
+    key: str | None = Field(None, description="Stored series: 'State|District' as the model knows it, or station_id")
+    error: str | None = None
+
+
+class HistoryIngestResponse(BaseModel):
+    date: date
+    stored: int
+    results: list[HistoryIngestItem]
+
+
+class HistoryResponse(BaseModel):
+    key: str
+    values: list[float] = Field(..., description="Daily values, most recent last")
+    last_date: date
+
+
+class ForecastAllRow(BaseModel):
+    state: str
+    district: str
+    sm_history: list[float] = Field(..., min_length=NRSC_LAGS, max_length=NRSC_LAGS)
+
+
+class ForecastAllRequest(BaseModel):
+    month: int | None = Field(None, ge=1, le=12, description="Month (1-12); default: the current month")
+    rows: list[dict[str, Any]] = Field(
+        default_factory=list,
+        description="ForecastAllRow objects replacing (or adding to) stored histories; each row is validated on its own",
+    )
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
 # ---- Startup: preload models ----
 
+REGISTRIES = {"sensor": predict.sensor_registry, "location": predict.location_registry}
+
 @app.on_event("startup")
 def startup() -> None:
     loaded = []
@@ -109,6 +210,7 @@ def startup() -> None:
         logger.warning("Location model not loaded: %s", e)
     if not loaded:
         logger.warning("No models loaded. Run train.py first.")
+    start_watcher_from_env(REGISTRIES.values(), os.environ.get("MODEL_RELOAD_POLL_SECONDS"))
 
 
 # ---- Static UI ----
@@ -158,12 +260,35 @@ def serve_ui() -> HTMLResponse:
 @app.get("/health")
 def health() -> dict[str, Any]:
     """Liveness check for Node backend."""
-    loaded = []
-    if predict._model_sensor is not None:
-        loaded.append("sensor")
-    if predict._model_location is not None:
-        loaded.append("location")
-    return {"status": "ok", "models": loaded}
+    loaded = [name for name, registry in REGISTRIES.items() if registry.active is not None]
+    versions = {name: registry.status() for name, registry in REGISTRIES.items()}
+    return {
+        "status": "ok",
+        "models": loaded,
+        "versions": versions,
+        "forecast_cache": predict.location_forecast_cache.stats(),
+        "forecast_all_cache": predict.forecast_all_cache.stats(),
+    }
+
+
+@app.post("/admin/reload")
+def admin_reload(
+    request: Request,
+    model: str = "all",
+    wait: bool = False,
+    x_admin_token: str | None = Header(None),
+) -> dict[str, Any]:
+    """
+    Load model files again (model=sensor|location|all), warm up and swap in atomically;
+    in-flight requests finish on the old version. wait=false returns at once (poll /health).
+    """
+    client_host = request.client.host if request.client else None
+    if not admin_token_ok(x_admin_token, os.environ.get("MODEL_ADMIN_TOKEN"), client_host):
+        raise HTTPException(status_code=403, detail=ADMIN_DENIED)
+    if model != "all" and model not in REGISTRIES:
+        raise HTTPException(status_code=422, detail=f"Unknown model {model!r}. Allowed: sensor, location, all")
+    selected = list(REGISTRIES.values()) if model == "all" else [REGISTRIES[model]]
+    return {"models": reload_registries(selected, wait)}
 
 
 @app.post("/predict/sensor", response_model=PredictResponse)
@@ -203,6 +328,278 @@ def predict_location_endpoint(body: LocationPredictRequest) -> PredictResponse:
         raise HTTPException(status_code=500, detail="Prediction failed")
 
 
+@app.post("/predict/sensor/batch", response_model=BatchPredictResponse)
+def predict_sensor_batch_endpoint(body: SensorBatchRequest) -> BatchPredictResponse:
+    """
+    Predict days 3-7 for many sensor rows with one scaler transform and one model call.
+    Results keep the input order; invalid rows carry an error instead of failing the batch.
+    """
+    results = [BatchPredictItem(index=i) for i in range(len(body.rows))]
+    valid_index: list[int] = []
+    valid_rows: list[dict[str, float]] = []
+    for i, raw in enumerate(body.rows):
+        try:
+            req = SensorPredictRequest.model_validate(raw)
+        except ValidationError as e:
+            results[i].error = _format_validation_error(e)
+            continue
+        valid_index.append(i)
+        valid_rows.append(req.to_features_dict())
+    if valid_rows:
+        try:
+            predictions = predict.predict_sensor_batch(valid_rows)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception:
+            logger.exception("Sensor batch prediction failed")
+            raise HTTPException(status_code=500, detail="Prediction failed")
+        for i, row in zip(valid_index, predictions.tolist()):
+            results[i].predictions = row
+    return BatchPredictResponse(results=results)
+
+
+@app.post("/predict/location/batch", response_model=BatchPredictResponse)
+def predict_location_batch_endpoint(body: LocationBatchRequest) -> BatchPredictResponse:
+    """
+    Predict days 3-7 for many location rows with one scaler transform and one model call.
+    Results keep the input order; invalid rows (bad fields, unknown state/district) carry an error.
+    """
+    results = [BatchPredictItem(index=i) for i in range(len(body.rows))]
+    valid: list[tuple[int, LocationPredictRequest]] = []
+    for i, raw in enumerate(body.rows):
+        try:
+            valid.append((i, LocationPredictRequest.model_validate(raw)))
+        except ValidationError as e:
+            results[i].error = _format_validation_error(e)
+    if valid:
+        try:
+            predictions, errors = predict.predict_location_batch(
+                states=[req.state for _, req in valid],
+                districts=[req.district for _, req in valid],
+                sm_histories=[req.sm_history for _, req in valid],
+                months=[req.month for _, req in valid],
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception:
+            logger.exception("Location batch prediction failed")
+            raise HTTPException(status_code=500, detail="Prediction failed")
+        for (i, _), row, error in zip(valid, predictions.tolist(), errors):
+            if error is not None:
+                results[i].error = error
+            else:
+                results[i].predictions = row
+    return BatchPredictResponse(results=results)
+
+
+def _ingest_response(day: date, n_rows: int, invalid: dict[int, str],
+                     valid_index: list[int], stored: list[tuple[str | None, str | None]]) -> HistoryIngestResponse:
+    results = [HistoryIngestItem(index=i, error=invalid.get(i)) for i in range(n_rows)]
+    for i, (key, error) in zip(valid_index, stored):
+        results[i].key = key
+        results[i].error = error
+    return HistoryIngestResponse(date=day, stored=sum(r.error is None for r in results), results=results)
+
+
+@app.post("/history/location", response_model=HistoryIngestResponse)
+def ingest_location_history_endpoint(body: LocationHistoryIngest) -> HistoryIngestResponse:
+    """
+    Store one day of soil moisture for many districts (one call per day for the whole country).
+    Later /predict/location requests without sm_history use the last 7 stored days.
+    """
+    invalid: dict[int, str] = {}
+    valid_index: list[int] = []
+    rows: list[tuple[str, str, float]] = []
+    for i, raw in enumerate(body.rows):
+        try:
+            row = LocationHistoryRow.model_validate(raw)
+        except ValidationError as e:
+            invalid[i] = _format_validation_error(e)
+            continue
+        valid_index.append(i)
+        rows.append((row.state, row.district, row.sm))
+    try:
+        stored = predict.ingest_location_history(body.date, rows) if rows else []
+    except Exception:
+        logger.exception("Location history ingestion failed")
+        raise HTTPException(status_code=500, detail="Ingestion failed")
+    return _ingest_response(body.date, len(body.rows), invalid, valid_index, stored)
+
+
+@app.post("/history/sensor", response_model=HistoryIngestResponse)
+def ingest_sensor_history_endpoint(body: SensorHistoryIngest) -> HistoryIngestResponse:
+    """Store one day of avg_sm for many sensor stations (fills avg_sm_lag1 / avg_sm_lag2 of /predict/sensor)."""
+    invalid: dict[int, str] = {}
+    valid_index: list[int] = []
+    rows: list[tuple[str, float]] = []
+    for i, raw in enumerate(body.rows):
+        try:
+            row = SensorHistoryRow.model_validate(raw)
+        except ValidationError as e:
+            invalid[i] = _format_validation_error(e)
+            continue
+        valid_index.append(i)
+        rows.append((row.station_id, row.avg_sm))
+    try:
+        stored = predict.ingest_sensor_history(body.date, rows) if rows else []
+    except Exception:
+        logger.exception("Sensor history ingestion failed")
+        raise HTTPException(status_code=500, detail="Ingestion failed")
+    return _ingest_response(body.date, len(body.rows), invalid, valid_index, stored)
+
+
+def _history_response(kind: str, key: str, days: int) -> HistoryResponse:
+    try:
+        found = get_store(kind).recent(key, days, today=predict.local_today())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"No complete history of the last {days} days for {key!r}")
+    values, last_date = found
+    return HistoryResponse(key=key, values=values, last_date=last_date)
+
+
+@app.get("/history/location", response_model=HistoryResponse)
+def get_location_history(state: str, district: str, days: int = NRSC_LAGS) -> HistoryResponse:
+    """The stored days a location prediction without sm_history would use."""
+    try:
+        key = predict.location_history_name(predict.location_registry.get(), state, district)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return _history_response("location", key, days)
+
+
+@app.get("/history/sensor", response_model=HistoryResponse)
+def get_sensor_history(station_id: str, days: int = SENSOR_LAGS) -> HistoryResponse:
+    return _history_response("sensor", station_id.strip(), days)
+
+
+def _forecast_all_response(
+    payload: dict[str, Any], if_none_match: str | None, errors: dict[int, str] | None = None
+) -> Response:
+    etag = f'"{payload["model_version"]}-{payload["date"]}-{payload["history_digest"]}"'
+    if errors is None and if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    if errors is not None:
+        payload = {**payload, "errors": [{"index": i, "error": e} for i, e in sorted(errors.items())]}
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@app.get("/forecast/all")
+def forecast_all_endpoint(
+    month: int | None = Query(None, ge=1, le=12, description="Month (1-12); default: the current month"),
+    if_none_match: str | None = Header(None),
+) -> Response:
+    """
+    Days 3-7 for every location the model was trained on, from the stored histories, in one
+    model call. Columnar JSON: "state", "district", "history_end" and "predictions"
+    ({"day_3": [...], ...}) are parallel lists; locations without 7 stored days are under
+    "missing". Cached per day, model version and histories; sends an ETag (304 on If-None-Match).
+    """
+    try:
+        payload, _ = predict.forecast_all(month=month)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception:
+        logger.exception("Forecast sweep failed")
+        raise HTTPException(status_code=500, detail="Prediction failed")
+    return _forecast_all_response(payload, if_none_match)
+
+
+@app.post("/forecast/all")
+def forecast_all_with_histories_endpoint(body: ForecastAllRequest) -> Response:
+    """As GET /forecast/all, with supplied histories taking the place of stored ones; invalid rows are under "errors"."""
+    errors: dict[int, str] = {}
+    valid_index: list[int] = []
+    supplied: list[tuple[str, str, list[float]]] = []
+    for i, raw in enumerate(body.rows):
+        try:
+            row = ForecastAllRow.model_validate(raw)
+        except ValidationError as e:
+            errors[i] = _format_validation_error(e)
+            continue
+        valid_index.append(i)
+        supplied.append((row.state, row.district, row.sm_history))
+    try:
+        payload, row_errors = predict.forecast_all(month=body.month, supplied=supplied)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception:
+        logger.exception("Forecast sweep failed")
+        raise HTTPException(status_code=500, detail="Prediction failed")
+    for i, error in zip(valid_index, row_errors):
+        if error is not None:
+            errors[i] = error
+    return _forecast_all_response(payload, None, errors)
+
+
+# Running daily aggregates of raw readings, shared by all ingestion streams of this process
+SENSOR_AGGREGATOR = sensor_stream.DailySensorAggregator()
+_aggregator_lock = threading.Lock()
+
+
+def _aggregate_lines(lines: list[bytes], forecast: bool, store_history: bool) -> tuple[list[dict[str, Any]], int]:
+    stations, ts, values, invalid = sensor_stream.parse_ndjson(lines)
+    with _aggregator_lock:
+        closed = SENSOR_AGGREGATOR.add(stations, ts, values)
+        # Under the lock so days of one station reach the history store in order
+        sensor_stream.publish_days(closed, forecast, store_history)
+    return closed, invalid
+
+
+def _ndjson_line(obj: dict[str, Any]) -> bytes:
+    return json.dumps(obj, default=str).encode() + b"\n"
+
+
+@app.post("/ingest/sensor/stream")
+async def ingest_sensor_stream(
+    request: Request,
+    forecast: bool = Query(False, description="Predict days 3-7 for every closed day"),
+    store_history: bool = Query(True, description="Store each closed day's avg_sm for /predict/sensor lags"),
+    close_before: date | None = Query(None, description="After the stream, also close open days before this date"),
+) -> Response:
+    """
+    Raw readings as NDJSON (one {"station_id", "ts", "pm1", ..., "sm"} object per line, see
+    sensor_stream.py), aggregated into daily averages per station while the body arrives, one
+    chunk of lines at a time. Answers with NDJSON: one row per station-day closed by the
+    stream (daily avg_* features, optionally predictions), then a {"summary": ...} line.
+    """
+    closed: list[dict[str, Any]] = []
+    buffer = b""
+    lines: list[bytes] = []
+    n_lines = invalid = 0
+
+    async def aggregate(pending: list[bytes]) -> None:
+        nonlocal n_lines, invalid
+        rows, n_invalid = await run_in_threadpool(_aggregate_lines, pending, forecast, store_history)
+        closed.extend(rows)
+        n_lines += len(pending)
+        invalid += n_invalid
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        lines.extend(complete)
+        if len(lines) >= sensor_stream.CHUNK_LINES:
+            await aggregate(lines)
+            lines = []
+    if buffer.strip():
+        lines.append(buffer)
+    await aggregate(lines)
+    if close_before is not None:
+        def close() -> list[dict[str, Any]]:
+            with _aggregator_lock:
+                rows = SENSOR_AGGREGATOR.close_days_before(close_before)
+                sensor_stream.publish_days(rows, forecast, store_history)
+            return rows
+        closed.extend(await run_in_threadpool(close))
+
+    summary = {"lines": n_lines, "invalid": invalid, "closed_days": len(closed), "aggregator": SENSOR_AGGREGATOR.stats()}
+    body = b"".join(_ndjson_line(row) for row in closed) + _ndjson_line({"summary": summary})
+    return Response(content=body, media_type="application/x-ndjson")
+
+
 class PredictFlexibleBody(BaseModel):
     """Optional sensor and/or location fields. At least one set must be provided."""
     # Sensor
@@ -216,6 +613,7 @@ class PredictFlexibleBody(BaseModel):
     avg_pres: float | None = None
     avg_sm_lag1: float | None = None
     avg_sm_lag2: float | None = None
+    station_id: str | None = None
     # Location
     state: str | None = None
     district: str | None = None
@@ -229,11 +627,26 @@ class PredictFlexibleBody(BaseModel):
         )
 
     def has_location(self) -> bool:
-        return (
-            self.state is not None
-            and self.district is not None
-            and self.sm_history is not None
-            and len(self.sm_history) == NRSC_LAGS
+        """state and district, with sm_history of length 7 or, without it, 7 stored days of the location."""
+        if self.state is None or self.district is None:
+            return False
+        if self.sm_history is None:
+            return predict.has_stored_sm_history(self.state, self.district)
+        return len(self.sm_history) == NRSC_LAGS
+
+    def sensor_request(self) -> SensorPredictRequest:
+        return SensorPredictRequest(
+            avg_pm1=float(self.avg_pm1),
+            avg_pm2=float(self.avg_pm2),
+            avg_pm3=float(self.avg_pm3),
+            avg_am=float(self.avg_am),
+            avg_lum=float(self.avg_lum),
+            avg_temp=float(self.avg_temp),
+            avg_humd=float(self.avg_humd),
+            avg_pres=float(self.avg_pres),
+            avg_sm_lag1=self.avg_sm_lag1,
+            avg_sm_lag2=self.avg_sm_lag2,
+            station_id=self.station_id,
         )
 
 
@@ -241,55 +654,35 @@ class PredictFlexibleBody(BaseModel):
 def predict_auto(body: PredictFlexibleBody) -> PredictResponse:
     """
     Predict using sensor and/or location input. If both are provided, returns ensemble (average).
-    Send JSON with sensor fields and/or state, district, sm_history.
+    Send JSON with sensor fields and/or state, district, sm_history. As on /predict/sensor and
+    /predict/location, missing lags come from the station_id's stored history and a missing
+    sm_history from the location's.
     """
     if body.has_sensor() and body.has_location():
         try:
-            features = {
-                "avg_pm1": float(body.avg_pm1),
-                "avg_pm2": float(body.avg_pm2),
-                "avg_pm3": float(body.avg_pm3),
-                "avg_am": float(body.avg_am),
-                "avg_lum": float(body.avg_lum),
-                "avg_temp": float(body.avg_temp),
-                "avg_humd": float(body.avg_humd),
-                "avg_pres": float(body.avg_pres),
-                "avg_sm_lag1": (body.avg_sm_lag1 if body.avg_sm_lag1 is not None else 0.0),
-                "avg_sm_lag2": (body.avg_sm_lag2 if body.avg_sm_lag2 is not None else 0.0),
-            }
             result = predict.predict_ensemble(
-                sensor_features=features,
+                sensor_features=body.sensor_request().to_features_dict(),
                 state=str(body.state),
                 district=str(body.district),
-                sm_history=list(body.sm_history) if body.sm_history else [],
+                sm_history=list(body.sm_history) if body.sm_history is not None else None,
+                month=body.month,
             )
             return _predict_response_from_dict(result)
         except (ValueError, Exception) as e:
             logger.exception("Ensemble prediction failed")
             raise HTTPException(status_code=422 if isinstance(e, ValueError) else 500, detail=str(e))
     if body.has_sensor():
-        req = SensorPredictRequest(
-            avg_pm1=float(body.avg_pm1),
-            avg_pm2=float(body.avg_pm2),
-            avg_pm3=float(body.avg_pm3),
-            avg_am=float(body.avg_am),
-            avg_lum=float(body.avg_lum),
-            avg_temp=float(body.avg_temp),
-            avg_humd=float(body.avg_humd),
-            avg_pres=float(body.avg_pres),
-            avg_sm_lag1=body.avg_sm_lag1,
-            avg_sm_lag2=body.avg_sm_lag2,
-        )
-        return predict_sensor_endpoint(req)
+        return predict_sensor_endpoint(body.sensor_request())
     if body.has_location():
         req = LocationPredictRequest(
             state=str(body.state),
             district=str(body.district),
-            sm_history=list(body.sm_history),
+            sm_history=list(body.sm_history) if body.sm_history is not None else None,
             month=body.month,
         )
         return predict_location_endpoint(req)
     raise HTTPException(
         status_code=422,
-        detail="Provide either sensor fields (avg_pm1, avg_pm2, ...) or location (state, district, sm_history of length 7).",
+        detail="Provide either sensor fields (avg_pm1, avg_pm2, ...) or location (state, district, and sm_history "
+        "of length 7 unless the last 7 days are stored).",
     )
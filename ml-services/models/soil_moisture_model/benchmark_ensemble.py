@@ -0,0 +1,63 @@
+"""
+Latency of predict.predict_ensemble with the two forests run one after the other
+(ENSEMBLE_THREADS=0, the previous behaviour) and concurrently on the ensemble executor.
+Needs the trained artifacts in this folder; the location forecast cache is disabled so
+every call runs both models.
+
+  python benchmark_ensemble.py
+  python benchmark_ensemble.py --repeats 200
+
+Exits non-zero if the two ways give different predictions.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import predict
+from features import NRSC_LAGS, SENSOR_FEATURE_COLS
+from ml_common.ttl_cache import TTLCache
+
+
+def _latencies_ms(repeats: int, sensor_features: dict, state: str, district: str) -> tuple[np.ndarray, list[dict]]:
+    rng = np.random.default_rng(0)
+    times, results = [], []
+    for _ in range(repeats):
+        history = np.round(rng.uniform(5, 30, size=NRSC_LAGS), 2).tolist()
+        start = time.perf_counter()
+        results.append(predict.predict_ensemble(sensor_features, state, district, history))
+        times.append((time.perf_counter() - start) * 1000)
+    return np.array(times), results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=max(predict.ENSEMBLE_THREADS, 1))
+    args = parser.parse_args(argv)
+
+    predict.location_forecast_cache = TTLCache(0, 0)
+    locations = predict.location_registry.get().locations
+    state, district = locations.states[0], locations.districts[0]
+    sensor_features = {col: 1.0 for col in SENSOR_FEATURE_COLS} | {"avg_sm_lag1": 20.0, "avg_sm_lag2": 21.0}
+    print(f"CPUs: {os.cpu_count()}, weights: {predict.ensemble_weights()}")
+
+    summary = {}
+    for label, threads in (("sequential", 0), (f"concurrent ({args.threads} threads)", args.threads)):
+        predict.ENSEMBLE_THREADS = threads
+        predict._ensemble_executor = None
+        predict.predict_ensemble(sensor_features, state, district, [20.0] * NRSC_LAGS)  # warm-up
+        times, results = _latencies_ms(args.repeats, sensor_features, state, district)
+        summary[label] = results
+        print(f"{label:<26} p50 {np.percentile(times, 50):7.2f} ms   p95 {np.percentile(times, 95):7.2f} ms")
+
+    first, second = summary.values()
+    same = first == second
+    print("identical predictions:", same)
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
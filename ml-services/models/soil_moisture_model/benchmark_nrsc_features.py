@@ -0,0 +1,123 @@
+"""
+Benchmark and parity check for features.build_nrsc_features_and_targets on synthetic
+all-India-sized NRSC data: the vectorized builder against the previous per-location
+Python loop (kept below as the reference implementation).
+
+  python benchmark_nrsc_features.py                      # 3M rows, ~700 districts
+  python benchmark_nrsc_features.py --rows 500000 --skip-reference
+
+Exits non-zero if X, Y, the encoders or the location list differ.
+"""
+import argparse
+import sys
+import time
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+
+from features import FORECAST_DAYS, MIN_ROWS_PER_LOCATION, NRSC_LAGS, build_nrsc_features_and_targets
+
+
+def build_nrsc_reference(
+    df: pd.DataFrame,
+    min_rows_per_location: int = MIN_ROWS_PER_LOCATION,
+    n_lags: int = NRSC_LAGS,
+) -> tuple[np.ndarray, np.ndarray, dict[str, Any]]:
+    """The original row-by-row builder."""
+    df = df.sort_values(["State", "District", "Date"]).reset_index(drop=True)
+
+    loc_counts = df.groupby(["State", "District"]).size()
+    valid_locs = loc_counts[loc_counts >= min_rows_per_location].index.tolist()
+    df = df[df.set_index(["State", "District"]).index.isin(valid_locs)].copy()
+
+    rows_X: list[list[Any]] = []
+    rows_Y: list[list[float]] = []
+    for (state, district), grp in df.groupby(["State", "District"]):
+        grp = grp.sort_values("Date").reset_index(drop=True)
+        vals = grp["Avg_smlvl_at15cm"].astype(float).values
+        months = grp["Month"].astype(int).values
+        n = len(vals)
+        if n < n_lags + max(FORECAST_DAYS):
+            continue
+        for i in range(n_lags, n - max(FORECAST_DAYS)):
+            lags = [vals[i - k] for k in range(1, n_lags + 1)]
+            targets = [vals[i + d] for d in FORECAST_DAYS]
+            rows_X.append([state, district, *lags, months[i]])
+            rows_Y.append(targets)
+
+    encoder_state = LabelEncoder()
+    encoder_district = LabelEncoder()
+    state_enc = encoder_state.fit_transform([r[0] for r in rows_X])
+    district_enc = encoder_district.fit_transform([r[1] for r in rows_X])
+    lag_matrix = np.array([r[2:2 + n_lags] for r in rows_X])
+    month_col = np.array([r[-1] for r in rows_X], dtype=float).reshape(-1, 1)
+    X_np = np.hstack([state_enc.reshape(-1, 1), district_enc.reshape(-1, 1), lag_matrix, month_col])
+    Y_np = np.array(rows_Y, dtype=float)
+    scaler_target = MinMaxScaler(feature_range=(0, 100))
+    aux = {
+        "encoder_state": encoder_state,
+        "encoder_district": encoder_district,
+        "locations": sorted({(r[0], r[1]) for r in rows_X}),
+    }
+    return X_np, scaler_target.fit_transform(Y_np), aux
+
+
+def synthetic_nrsc(n_rows: int, n_states: int, n_districts: int, seed: int = 0) -> pd.DataFrame:
+    """Daily series per district with uneven lengths (some below MIN_ROWS_PER_LOCATION), shuffled."""
+    rng = np.random.default_rng(seed)
+    weights = rng.gamma(2.0, size=n_districts)
+    lengths = np.maximum(1, (weights / weights.sum() * n_rows).astype(int))
+    lengths[rng.choice(n_districts, size=max(1, n_districts // 50), replace=False)] = rng.integers(1, 20)
+    location = np.repeat(np.arange(n_districts), lengths)
+    day = np.arange(len(location)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(day, unit="D")
+    state_of = rng.integers(0, n_states, size=n_districts)
+    df = pd.DataFrame({
+        "State": np.array([f"State {i:02d}" for i in range(n_states)], dtype=object)[state_of[location]],
+        "District": np.array([f"District {i:04d}" for i in range(n_districts)], dtype=object)[location],
+        "Date": dates,
+        "Month": dates.month,
+        "Avg_smlvl_at15cm": np.round(rng.uniform(2, 30, size=len(location)), 3),
+    })
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--states", type=int, default=36)
+    parser.add_argument("--districts", type=int, default=700)
+    parser.add_argument("--skip-reference", action="store_true", help="time only the vectorized builder")
+    args = parser.parse_args(argv)
+
+    df = synthetic_nrsc(args.rows, args.states, args.districts)
+    print(f"Synthetic NRSC: {len(df):,} rows, {df['District'].nunique()} districts")
+
+    (X, Y, aux), seconds = _timed(build_nrsc_features_and_targets, df)
+    print(f"vectorized: {seconds:.2f} s -> X {X.shape}, {X.nbytes / 1e6:.0f} MB")
+    if args.skip_reference:
+        return 0
+
+    (X_ref, Y_ref, aux_ref), ref_seconds = _timed(build_nrsc_reference, df)
+    print(f"reference:  {ref_seconds:.2f} s ({ref_seconds / seconds:.1f}x slower)")
+    same = (
+        np.array_equal(X, X_ref)
+        and np.array_equal(Y, Y_ref)
+        and list(aux["encoder_state"].classes_) == list(aux_ref["encoder_state"].classes_)
+        and list(aux["encoder_district"].classes_) == list(aux_ref["encoder_district"].classes_)
+        and aux["locations"] == aux_ref["locations"]
+    )
+    print("identical X / Y / encoders / locations:", same)
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
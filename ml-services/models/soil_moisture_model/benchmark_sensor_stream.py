@@ -0,0 +1,88 @@
+"""
+Throughput and parity check for sensor_stream.DailySensorAggregator on synthetic minute
+readings: closed days are compared with a pandas groupby mean over the same readings,
+and readings per second are reported for aggregation alone and for NDJSON parsing plus
+aggregation.
+
+  python benchmark_sensor_stream.py                      # 2000 stations x 3 days of minute readings
+  python benchmark_sensor_stream.py --stations 200 --days 2
+
+Exits non-zero if any closed day differs from the reference.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import sensor_stream
+from sensor_stream import CHUNK_LINES, DAILY_COLUMNS, RAW_FIELDS, DailySensorAggregator, parse_ndjson
+
+START = 1_760_000_000
+
+
+def synthetic_readings(n_stations: int, n_days: int, seed: int = 0) -> pd.DataFrame:
+    """One reading per station per minute in time order, with some missing values."""
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(n_days * 1440)
+    ts = np.repeat(START + 60 * minutes, n_stations) + rng.integers(0, 60, size=len(minutes) * n_stations)
+    station = np.tile(np.arange(n_stations), len(minutes))
+    values = np.round(rng.uniform(0, 100, size=(len(ts), len(RAW_FIELDS))), 2)
+    values[rng.random(values.shape) < 0.01] = np.nan  # sent as null
+    df = pd.DataFrame(values, columns=RAW_FIELDS)
+    df.insert(0, "ts", ts)
+    df.insert(0, "station_id", np.array([f"st-{i:05d}" for i in range(n_stations)], dtype=object)[station])
+    return df
+
+
+def reference_days(df: pd.DataFrame, aggregator: DailySensorAggregator) -> pd.DataFrame:
+    day = (df["ts"] + aggregator.day_offset_seconds) // 86400 + 719163
+    means = df[RAW_FIELDS].groupby([df["station_id"], day]).mean()
+    means.columns = DAILY_COLUMNS
+    return means
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df = synthetic_readings(args.stations, args.days)
+    stations = df["station_id"].tolist()
+    ts = df["ts"].to_numpy(dtype=float)
+    values = df[RAW_FIELDS].to_numpy()
+    print(f"{len(df):,} readings, {args.stations} stations, {args.days} days")
+
+    aggregator = DailySensorAggregator()
+    closed = []
+    start = time.perf_counter()
+    for i in range(0, len(df), CHUNK_LINES):
+        closed += aggregator.add(stations[i:i + CHUNK_LINES], ts[i:i + CHUNK_LINES], values[i:i + CHUNK_LINES])
+    seconds = time.perf_counter() - start
+    closed += aggregator.close_days_before(pd.Timestamp.max.date())
+    print(f"aggregate:       {len(df) / seconds:>12,.0f} readings/s")
+
+    got = pd.DataFrame(closed)
+    got["day"] = got["date"].map(lambda d: d.toordinal())
+    got = got.set_index(["station_id", "day"]).sort_index()[DAILY_COLUMNS].astype(float)
+    expected = reference_days(df, aggregator).sort_index()
+    same = got.index.equals(expected.index) and np.allclose(got.to_numpy(), expected.to_numpy(), rtol=1e-12, equal_nan=True)
+    print(f"closed days: {len(got)}, match groupby mean: {same}")
+
+    head = df.head(min(len(df), 500_000)).astype(object)
+    lines = [json.dumps(r).encode() for r in head.where(head.notna(), None).to_dict("records")]
+    aggregator = DailySensorAggregator()
+    start = time.perf_counter()
+    for i in range(0, len(lines), CHUNK_LINES):
+        aggregator.add(*parse_ndjson(lines[i:i + CHUNK_LINES])[:3])
+    seconds = time.perf_counter() - start
+    parser_name = "orjson" if sensor_stream._loads is not json.loads else "json module"
+    print(f"parse+aggregate: {len(lines) / seconds:>12,.0f} readings/s (NDJSON, {parser_name})")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,13 @@
 """
 Feature engineering for sensor-based (soil-moisture.csv) and location-based (NRSC) models.
+
+Both CSVs are parsed once and cached under .cache/ in the columnar format of
+ml_common.columnar_cache (State / District categorical, Date already parsed), keyed by
+the source file's hash and size; later loads memory-map the numeric columns.
+Set SOIL_MOISTURE_DATA_CACHE=0 to always parse the CSVs.
 """
+import os
+import sys
 from pathlib import Path
 from typing import Any
 
@@ -8,6 +15,13 @@ import numpy as np
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 
+# ml_common lives next to this folder; make it importable when run from soil_moisture_model/
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent)
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.columnar_cache import cached_frame  # noqa: E402
+
 # Default number of lag days and forecast horizons
 SENSOR_LAGS = 2
 FORECAST_DAYS = [3, 4, 5, 6, 7]
@@ -19,19 +33,33 @@ SENSOR_FEATURE_COLS = [
     "avg_temp", "avg_humd", "avg_pres"
 ]
 
+USE_DATA_CACHE = os.environ.get("SOIL_MOISTURE_DATA_CACHE", "1") != "0"
+
 
 def _base_dir() -> Path:
     return Path(__file__).resolve().parent
 
 
-def load_soil_moisture_csv(path: Path | None = None) -> pd.DataFrame:
-    """Load and order soil-moisture.csv by time (row order is already chronological)."""
-    path = path or _base_dir() / "soil-moisture.csv"
+def _cache_dir() -> Path:
+    return _base_dir() / ".cache"
+
+
+def _parse_soil_moisture_csv(path: Path) -> pd.DataFrame:
     df = pd.read_csv(path)
     df = df.dropna(how="all")
     return df.reset_index(drop=True)
 
 
+def load_soil_moisture_csv(path: Path | None = None, use_cache: bool | None = None) -> pd.DataFrame:
+    """Load and order soil-moisture.csv by time (row order is already chronological). Text columns are categorical when cached."""
+    path = path or _base_dir() / "soil-moisture.csv"
+    if not (USE_DATA_CACHE if use_cache is None else use_cache):
+        return _parse_soil_moisture_csv(path)
+    return cached_frame(
+        _cache_dir() / "soil_moisture", [path], lambda: _parse_soil_moisture_csv(path), {"parser": 1}, mmap_mode="r"
+    )
+
+
 def build_sensor_features_and_targets(
     df: pd.DataFrame | None = None,
     use_lags: bool = True,
@@ -91,14 +119,30 @@ def time_based_split(
     return train_end, val_end
 
 
-def load_nrsc_csv(path: Path | None = None) -> pd.DataFrame:
-    """Load NRSC CSV and parse Date."""
-    path = path or _base_dir() / "4554a3c8-74e3-4f93-8727-8fd92161e345_b015ac24ddd9ba5d3b11052466085f93.csv"
-    df = pd.read_csv(path)
+def _parse_nrsc_csv(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype={"State": "category", "District": "category"})
     df["Date"] = pd.to_datetime(df["Date"])
     return df
 
 
+def load_nrsc_csv(path: Path | None = None, use_cache: bool | None = None) -> pd.DataFrame:
+    """Load NRSC CSV and parse Date. State / District are categorical."""
+    path = path or _base_dir() / "4554a3c8-74e3-4f93-8727-8fd92161e345_b015ac24ddd9ba5d3b11052466085f93.csv"
+    if not (USE_DATA_CACHE if use_cache is None else use_cache):
+        return _parse_nrsc_csv(path)
+    return cached_frame(_cache_dir() / "nrsc", [path], lambda: _parse_nrsc_csv(path), {"parser": 1}, mmap_mode="r")
+
+
+def _sorted_codes(column: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """(sorted distinct names, int code per row) for an object or categorical column."""
+    cat = column.cat if isinstance(column.dtype, pd.CategoricalDtype) else pd.Categorical(column)
+    names = np.asarray(cat.categories, dtype=object)
+    order = np.argsort(names, kind="mergesort")
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[order] = np.arange(len(names))
+    return names[order], rank[np.asarray(cat.codes)]
+
+
 def build_nrsc_features_and_targets(
     df: pd.DataFrame | None = None,
     min_rows_per_location: int = MIN_ROWS_PER_LOCATION,
@@ -108,49 +152,57 @@ def build_nrsc_features_and_targets(
     Build location feature matrix (State, District encoded + lag1..lag7 + Month) and targets (day 3..7).
     Per (State, District) we use ordered Date; lag_k = value at t-k (previous k-th observation).
     Returns (X, Y, aux) with encoders and scaler_target.
+
+    Rows are sorted once so every location is a contiguous slice; the window anchors of all
+    slices are computed together and the lag / target columns are gathered with one fancy
+    index per offset (no Python loop over locations or days). Within a location, rows with
+    the same Date keep their file order.
     """
     if df is None:
         df = load_nrsc_csv()
-    df = df.sort_values(["State", "District", "Date"]).reset_index(drop=True)
-
-    # Filter locations with enough rows
-    loc_counts = df.groupby(["State", "District"]).size()
-    valid_locs = loc_counts[loc_counts >= min_rows_per_location].index.tolist()
-    df = df[df.set_index(["State", "District"]).index.isin(valid_locs)].copy()
-
-    rows_X: list[list[Any]] = []
-    rows_Y: list[list[float]] = []
-
-    for (state, district), grp in df.groupby(["State", "District"]):
-        grp = grp.sort_values("Date").reset_index(drop=True)
-        vals = grp["Avg_smlvl_at15cm"].astype(float).values
-        months = grp["Month"].astype(int).values
-        n = len(vals)
-        if n < n_lags + max(FORECAST_DAYS):
-            continue
-        for i in range(n_lags, n - max(FORECAST_DAYS)):
-            lags = [vals[i - k] for k in range(1, n_lags + 1)]
-            targets = [vals[i + d] for d in FORECAST_DAYS]
-            row = [state, district, *lags, months[i]]
-            rows_X.append(row)
-            rows_Y.append(targets)
-
-    if not rows_X:
+    df = df.dropna(subset=["State", "District"])
+
+    # Integer codes in name order, so a stable lexsort gives the (State, District, Date) order
+    state_names, state_codes = _sorted_codes(df["State"])
+    district_names, district_codes = _sorted_codes(df["District"])
+    order = np.lexsort((df["Date"].to_numpy(), district_codes, state_codes))
+    state_codes, district_codes = state_codes[order], district_codes[order]
+    vals = df["Avg_smlvl_at15cm"].to_numpy(dtype=float)[order]
+    months = df["Month"].to_numpy()[order]
+
+    # Contiguous slice per location: starts where State or District changes
+    n_total = len(order)
+    changed = np.ones(n_total, dtype=bool)
+    if n_total > 1:
+        changed[1:] = (state_codes[1:] != state_codes[:-1]) | (district_codes[1:] != district_codes[:-1])
+    starts = np.flatnonzero(changed)
+    sizes = np.diff(np.append(starts, n_total))
+
+    # Windows per location: anchor i in [n_lags, size - max horizon); short locations get none
+    horizon = max(FORECAST_DAYS)
+    n_windows = np.where(sizes >= min_rows_per_location, np.maximum(sizes - n_lags - horizon, 0), 0)
+    keep = n_windows > 0
+    if not keep.any():
         raise ValueError("No NRSC rows after building lags; try lowering min_rows_per_location or n_lags.")
+    starts, n_windows = starts[keep], n_windows[keep]
+
+    # Absolute row of each window's anchor (day t), location by location
+    first_window = np.cumsum(n_windows) - n_windows
+    anchors = np.repeat(starts + n_lags - first_window, n_windows) + np.arange(n_windows.sum())
+
+    lag_matrix = np.column_stack([vals[anchors - k] for k in range(1, n_lags + 1)])
+    Y_np = np.column_stack([vals[anchors + d] for d in FORECAST_DAYS])
+    month_col = months[anchors].astype(int).astype(float).reshape(-1, 1)
 
-    # Encode State and District
+    # Encode State and District (classes = names of locations that produced windows)
     encoder_state = LabelEncoder()
     encoder_district = LabelEncoder()
-    states = [r[0] for r in rows_X]
-    districts = [r[1] for r in rows_X]
-    state_enc = encoder_state.fit_transform(states)
-    district_enc = encoder_district.fit_transform(districts)
+    location_states, location_districts = state_names[state_codes[starts]], district_names[district_codes[starts]]
+    state_enc = np.repeat(encoder_state.fit_transform(location_states), n_windows)
+    district_enc = np.repeat(encoder_district.fit_transform(location_districts), n_windows)
 
     # Feature matrix: state_enc, district_enc, lag1..lag7, month -> (n_samples, 2 + n_lags + 1)
-    lag_matrix = np.array([r[2:2 + n_lags] for r in rows_X])
-    month_col = np.array([r[-1] for r in rows_X], dtype=float).reshape(-1, 1)
     X_np = np.hstack([state_enc.reshape(-1, 1), district_enc.reshape(-1, 1), lag_matrix, month_col])
-    Y_np = np.array(rows_Y, dtype=float)
 
     # Scale targets to 0-100 for consistency with sensor model (NRSC is ~0-25 typically)
     scaler_target = MinMaxScaler(feature_range=(0, 100))
@@ -160,6 +212,8 @@ def build_nrsc_features_and_targets(
         "scaler_target": scaler_target,
         "encoder_state": encoder_state,
         "encoder_district": encoder_district,
+        # Trained (state, district) pairs, for the serving-side LocationIndex
+        "locations": list(zip(location_states.tolist(), location_districts.tolist())),
         "n_lags": n_lags,
         "forecast_days": list(FORECAST_DAYS),
     }
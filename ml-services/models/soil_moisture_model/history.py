@@ -0,0 +1,210 @@
+"""
+Server-side daily soil-moisture history, so clients can ask for a forecast with only a location
+(or sensor station) instead of sending the last observed values themselves.
+
+A HistoryStore keeps one ring buffer of daily values per key: slot row `i`, column
+`day_ordinal % capacity_days`. The buffers and the last stored day per key live in
+memory-mapped .npy files (values.npy, last_day.npy), keys and their rows in keys.json,
+so the history survives restarts and pre-forked workers (unified_api/prefork.py) share
+it: writes to the mapped pages are seen by every process, and a worker that does not
+know a key re-reads keys.json. New keys are registered, and rows written, under an
+exclusive flock on keys.lock; reads take it shared, so no worker sees a half-written day.
+Without fcntl (Windows) only the in-process lock is taken.
+
+Two stores are used by the API:
+  location  key "State|District" (names as the location model knows them), NRSC sm level
+  sensor    key station_id, daily avg_sm (fills avg_sm_lag1 / avg_sm_lag2)
+
+Files go to SOIL_MOISTURE_HISTORY_DIR (default soil_moisture_model/.history/).
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no pre-forked workers there (unified_api/prefork.py), the threading lock suffices
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = Path(os.environ.get("SOIL_MOISTURE_HISTORY_DIR") or Path(__file__).resolve().parent / ".history")
+CAPACITY_DAYS = 32
+MAX_SERIES = 4096
+
+
+def _open_memmap(path: Path, shape: tuple[int, ...], dtype, fill) -> np.memmap:
+    if path.exists():
+        return np.lib.format.open_memmap(path, mode="r+")
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    array = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+    array[...] = fill
+    array.flush()
+    del array
+    try:
+        # Another process may have created it meanwhile; keep whichever came first
+        os.link(tmp, path)
+    except FileExistsError:
+        pass
+    finally:
+        tmp.unlink()
+    return np.lib.format.open_memmap(path, mode="r+")
+
+
+class HistoryStore:
+    """Daily values per key in fixed-size ring buffers backed by memory-mapped files (see module docstring)."""
+
+    def __init__(self, directory: Path, capacity_days: int = CAPACITY_DAYS, max_series: int = MAX_SERIES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # An existing store keeps the shape it was created with
+        self.values = _open_memmap(self.directory / "values.npy", (max_series, capacity_days), np.float64, np.nan)
+        self.last_day = _open_memmap(self.directory / "last_day.npy", (self.values.shape[0],), np.int64, -1)
+        self.max_series, self.capacity_days = self.values.shape
+        self._keys_path = self.directory / "keys.json"
+        self._lock_path = self.directory / "keys.lock"
+        self._rows: dict[str, int] = {}
+        self._keys_mtime_ns: int | None = None
+        self._lock = threading.Lock()
+        self._reload_keys()
+
+    def _reload_keys(self) -> None:
+        try:
+            mtime_ns = self._keys_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime_ns != self._keys_mtime_ns:
+            keys = json.loads(self._keys_path.read_text())
+            self._rows = {key: row for row, key in enumerate(keys)}
+            self._keys_mtime_ns = mtime_ns
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """The in-process lock, then the flock on keys.lock that other workers take for this store."""
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _row(self, key: str, create: bool = False) -> int | None:
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        with self._lock:
+            self._reload_keys()
+            row = self._rows.get(key)
+            if row is not None or not create:
+                return row
+            with open(self._lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._reload_keys()
+                row = self._rows.get(key)
+                if row is None:
+                    if len(self._rows) >= self.max_series:
+                        raise ValueError(f"History store {self.directory} is full ({self.max_series} series)")
+                    keys = sorted(self._rows, key=self._rows.get) + [key]
+                    tmp = self._keys_path.with_name(f".keys.{os.getpid()}.tmp")
+                    tmp.write_text(json.dumps(keys))
+                    os.replace(tmp, self._keys_path)
+                    self._reload_keys()
+                    row = self._rows[key]
+            return row
+
+    def append(self, key: str, day: date, value: float) -> None:
+        """Store the value of `day`. Days skipped since the last one become missing; a day older than the buffer raises ValueError."""
+        ordinal = day.toordinal()
+        row = self._row(key, create=True)
+        cap = self.capacity_days
+        with self._locked():
+            last = int(self.last_day[row])
+            if last >= 0 and ordinal <= last - cap:
+                raise ValueError(f"{day.isoformat()} is older than the {cap} days kept for {key!r}")
+            if ordinal > last:
+                start = ordinal - cap + 1 if last < 0 else max(last + 1, ordinal - cap + 1)
+                self.values[row, np.arange(start, ordinal) % cap] = np.nan
+                self.last_day[row] = ordinal
+            self.values[row, ordinal % cap] = value
+
+    def recent(self, key: str, n_days: int, today: date | None = None) -> tuple[list[float], date] | None:
+        """
+        The n_days values ending at the key's last stored day (most recent last) and that day, or
+        None if any is missing. With today, also None if the last stored day is older than the
+        n_days ending today (a station or location that stopped reporting).
+        """
+        if n_days > self.capacity_days:
+            raise ValueError(f"At most {self.capacity_days} days are kept")
+        row = self._row(key)
+        if row is None:
+            return None
+        with self._locked(exclusive=False):
+            last = int(self.last_day[row])
+            if last < 0 or (today is not None and last <= today.toordinal() - n_days):
+                return None
+            values = self.values[row, np.arange(last - n_days + 1, last + 1) % self.capacity_days]
+        if np.isnan(values).any():
+            return None
+        return values.tolist(), date.fromordinal(last)
+
+    def recent_many(self, keys: list[str], n_days: int, today: date | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        recent() for many keys in one gather: values (len(keys), n_days) with NaN where a day
+        (or the whole key, or with today a stale key) is missing, and the last stored day
+        ordinal per key (-1 if none).
+        """
+        if n_days > self.capacity_days:
+            raise ValueError(f"At most {self.capacity_days} days are kept")
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self._row(key)
+            if row is not None:
+                rows[i] = row
+        known = rows >= 0
+        values = np.full((len(keys), n_days), np.nan)
+        last = np.full(len(keys), -1, dtype=np.int64)
+        with self._locked(exclusive=False):
+            last[known] = self.last_day[rows[known]]
+            stored = known & (last >= 0)
+            if today is not None:
+                stored &= last > today.toordinal() - n_days
+            cols = (last[stored, None] + np.arange(1 - n_days, 1)) % self.capacity_days
+            values[stored] = self.values[rows[stored, None], cols]
+        return values, last
+
+    def flush(self) -> None:
+        self.values.flush()
+        self.last_day.flush()
+
+    def keys(self) -> list[str]:
+        """Keys with a row in the store, in row order."""
+        self._reload_keys()
+        return sorted(self._rows, key=self._rows.get)
+
+    def __len__(self) -> int:
+        self._reload_keys()
+        return len(self._rows)
+
+
+_stores: dict[str, HistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(kind: str) -> HistoryStore:
+    """Process-wide store for "location" or "sensor", opened on first use."""
+    store = _stores.get(kind)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(kind)
+            if store is None:
+                store = _stores[kind] = HistoryStore(HISTORY_DIR / kind)
+    return store
+
+
+def location_history_key(state: str, district: str) -> str:
+    return f"{state}|{district}"
@@ -0,0 +1,179 @@
+"""
+State / District name -> encoded index for the location model, built once per loaded model version.
+
+Replaces per-request LabelEncoder.transform calls with dict lookups. Names match exactly,
+case- / spacing- / punctuation-insensitively ("y s r" -> "Y.S.R.") or through a known
+alias (old or alternative names such as "Gurgaon" -> "Gurugram"). An unknown name raises
+UnknownLocationError, a ValueError carrying "did you mean" suggestions; for a district
+the suggestions come from the districts of the given state when the trained
+(state, district) pairs are known (locations.json written by train.py).
+
+encode_many() encodes whole columns: each distinct (state, district) pair is resolved
+once and the codes are gathered back with one vectorized take, so a million rows with
+a few hundred locations cost a few hundred lookups.
+
+State and district are still encoded independently, as the model was trained: a known
+district under a different known state is accepted, as with the LabelEncoders.
+"""
+import difflib
+import re
+import sys
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+# ml_common lives next to this folder; make it importable when run from soil_moisture_model/
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent)
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.vocabulary import normalize_spelling  # noqa: E402
+
+# Extra spellings (matched after normalization) -> trained name; entries whose target is not
+# in the encoder are ignored
+STATE_ALIASES = {
+    "orissa": "Odisha",
+    "uttaranchal": "Uttarakhand",
+    "pondicherry": "Puducherry",
+    "andaman & nicobar islands": "Andaman & Nicobar",
+    "nct of delhi": "Delhi",
+    "new delhi": "Delhi",
+    "j&k": "Jammu & Kashmir",
+}
+DISTRICT_ALIASES = {
+    "gurgaon": "Gurugram",
+    "mohali": "S.A.S Nagar",
+    "kadapa": "Y.S.R.",
+    "cuddapah": "Y.S.R.",
+    "kaimur": "Kaimur (Bhabua)",
+    "allahabad": "Prayagraj",
+    "faizabad": "Ayodhya",
+    "mewat": "Nuh",
+    "bangalore": "Bengaluru Urban",
+    "bengaluru": "Bengaluru Urban",
+    "mysore": "Mysuru",
+    "belgaum": "Belagavi",
+    "gulbarga": "Kalaburagi",
+    "mumbai": "Mumbai City",
+    "ahmedabad": "Ahmadabad",
+    "baroda": "Vadodara",
+    "trichy": "Tiruchirappalli",
+    "puducherry": "Pondicherry",
+    "hugli": "Hooghly",
+    "nasik": "Nashik",
+}
+
+MAX_SUGGESTIONS = 3
+
+
+def location_key(name: str) -> str:
+    """normalize_spelling plus '.', '(' and ')' dropped: ' Kaimur  (bhabua)' -> 'kaimur bhabua'."""
+    key = re.sub(r"[.()]", " ", normalize_spelling(str(name)))
+    return " ".join(key.split())
+
+
+class UnknownLocationError(ValueError):
+    def __init__(self, kind: str, name: str, suggestions: list[str], state: str | None = None):
+        self.kind = kind
+        self.name = name
+        self.suggestions = suggestions
+        where = f" in {state}" if state else ""
+        hint = f". Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        super().__init__(f"Unknown {kind} {name!r}{where}{hint}")
+
+
+def _name_index(names: list[str], aliases: dict[str, str]) -> dict[str, int]:
+    ids: dict[str, int] = {}
+    for i, name in enumerate(names):
+        ids[name] = i
+        ids.setdefault(location_key(name), i)
+    for alias, target in aliases.items():
+        if target in ids:
+            ids.setdefault(location_key(alias), ids[target])
+    return ids
+
+
+class LocationIndex:
+    def __init__(self, states: Iterable[str], districts: Iterable[str], pairs: Iterable[tuple[str, str]] | None = None):
+        # Encoder classes: position = encoded value
+        self.states = [str(s) for s in states]
+        self.districts = [str(d) for d in districts]
+        self._state_ids = _name_index(self.states, STATE_ALIASES)
+        self._district_ids = _name_index(self.districts, DISTRICT_ALIASES)
+        # Trained (state, district) pairs by exact and normalized names -> encoded pair
+        self.pairs: dict[tuple[str, str], tuple[int, int]] = {}
+        # Each trained pair once, encoded, in locations.json order
+        self.trained_pairs: list[tuple[int, int]] = []
+        self._districts_by_state: dict[int, list[str]] = {}
+        seen: set[tuple[int, int]] = set()
+        for state, district in pairs or ():
+            s, d = self._state_ids.get(state), self._district_ids.get(district)
+            if s is None or d is None:
+                continue
+            if (s, d) not in seen:
+                seen.add((s, d))
+                self.trained_pairs.append((s, d))
+            self.pairs[(state, district)] = (s, d)
+            self.pairs[(location_key(state), location_key(district))] = (s, d)
+            self._districts_by_state.setdefault(s, []).append(district)
+
+    @classmethod
+    def from_encoders(cls, encoder_state: Any, encoder_district: Any,
+                      pairs: Iterable[tuple[str, str]] | None = None) -> "LocationIndex":
+        return cls(encoder_state.classes_.tolist(), encoder_district.classes_.tolist(), pairs)
+
+    @staticmethod
+    def _suggest(name: str, candidates: list[str]) -> list[str]:
+        by_key = {location_key(c): c for c in candidates}
+        matches = difflib.get_close_matches(location_key(name), list(by_key), n=MAX_SUGGESTIONS, cutoff=0.6)
+        return [by_key[m] for m in matches]
+
+    def encode(self, state: str, district: str) -> tuple[int, int]:
+        """(state code, district code) as the LabelEncoders would give for the matched names."""
+        hit = self.pairs.get((state, district))
+        if hit is not None:
+            return hit
+        state_key, district_key = location_key(state), location_key(district)
+        hit = self.pairs.get((state_key, district_key))
+        if hit is not None:
+            return hit
+        s = self._state_ids.get(state_key)
+        if s is None:
+            raise UnknownLocationError("state", state, self._suggest(state, self.states))
+        d = self._district_ids.get(district_key)
+        if d is None:
+            candidates = self._districts_by_state.get(s) or self.districts
+            raise UnknownLocationError("district", district, self._suggest(district, candidates), state=self.states[s])
+        return s, d
+
+    def encode_many(
+        self, states: Iterable[str], districts: Iterable[str]
+    ) -> tuple[np.ndarray, np.ndarray, dict[int, UnknownLocationError]]:
+        """
+        Vectorized encode(): (state codes, district codes, {row: error}). Rows that fail
+        have code -1 in both arrays.
+        """
+        state_codes, state_names = pd.factorize(np.asarray(list(states), dtype=object))
+        district_codes, district_names = pd.factorize(np.asarray(list(districts), dtype=object))
+        n_districts = max(len(district_names), 1)
+        pair_codes = state_codes.astype(np.int64) * n_districts + district_codes
+        unique_pairs, inverse = np.unique(pair_codes, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        encoded = np.full((len(unique_pairs), 2), -1, dtype=np.int64)
+        failed: dict[int, UnknownLocationError] = {}
+        for j, pair in enumerate(unique_pairs.tolist()):
+            s, d = divmod(pair, n_districts)
+            try:
+                encoded[j] = self.encode(state_names[s], district_names[d])
+            except UnknownLocationError as e:
+                failed[j] = e
+
+        codes = encoded[inverse]
+        errors: dict[int, UnknownLocationError] = {}
+        if failed:
+            for row in np.flatnonzero(np.isin(inverse, list(failed))).tolist():
+                errors[row] = failed[int(inverse[row])]
+        return codes[:, 0], codes[:, 1], errors
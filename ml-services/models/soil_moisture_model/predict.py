@@ -1,6 +1,15 @@
 """
 Load trained models and predict soil moisture (%) for days 3, 4, 5, 6, 7.
 """
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any
 
@@ -14,53 +23,318 @@ from features import (
     SENSOR_LAGS,
     NRSC_LAGS,
 )
+from history import get_store, location_history_key
+from locations import LocationIndex
+from sensor_stream import DAY_OFFSET_MINUTES
 
-# Lazy-loaded singletons
-_model_sensor: Any = None
-_scaler_sensor_features: Any = None
-_scaler_sensor_target: Any = None
-_model_location: Any = None
-_scaler_location_features: Any = None
-_encoder_state: Any = None
-_encoder_district: Any = None
+# ml_common lives next to this folder; make it importable when run from soil_moisture_model/
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent)
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.bundle import MANIFEST_NAME, ArtifactBundle  # noqa: E402
+from ml_common.forest_engine import CompactForest, FlatForest, HybridPredictor, make_predictor  # noqa: E402
+from ml_common.registry import ModelRegistry, content_version, file_stamp  # noqa: E402
+from ml_common.ttl_cache import TTLCache  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Forest evaluator per model: "sklearn" (the fitted model), "flat" or "compact" (ml_common.forest_engine;
+# "compact" serves float32 node arrays and drops the sklearn forest from memory).
+# Either model layout from train.py loads as is: a MultiOutputRegressor (one forest per horizon)
+# or a native multi-output RandomForestRegressor; both predict shape (n, len(FORECAST_DAYS)).
+SENSOR_ENGINE = os.environ.get("SOIL_MOISTURE_SENSOR_ENGINE", "sklearn")
+LOCATION_ENGINE = os.environ.get("SOIL_MOISTURE_LOCATION_ENGINE", "sklearn")
+
+# Location forecasts are cached per (model version, encoded location, history, month): the app
+# polls the same districts with the same 7-day history many times a day. Size 0 disables it.
+FORECAST_CACHE_SIZE = int(os.environ.get("SOIL_MOISTURE_FORECAST_CACHE_SIZE", "4096"))
+FORECAST_CACHE_TTL_SECONDS = float(os.environ.get("SOIL_MOISTURE_FORECAST_CACHE_TTL", "900"))
+# History values in the cache key are rounded to this many decimals (absorbs float noise)
+FORECAST_CACHE_DECIMALS = 4
+
+# /forecast/all: one sweep over every trained location, cached per (model version, day, month,
+# histories); a few entries cover the stored-history sweep and a few months / supplied sets.
+FORECAST_ALL_CACHE_SIZE = int(os.environ.get("SOIL_MOISTURE_FORECAST_ALL_CACHE_SIZE", "16"))
+# Values in the sweep payload are rounded to this many decimals
+FORECAST_ALL_DECIMALS = 3
+
+# Ensemble (/predict with sensor and location inputs): the two forests run concurrently on this
+# many threads (sklearn releases the GIL while walking trees; 0 = run them one after the other).
+ENSEMBLE_THREADS = int(os.environ.get("SOIL_MOISTURE_ENSEMBLE_THREADS", "2"))
+# "equal": 0.5 / 0.5. "metrics": per-horizon inverse-MSE weights from the validation errors in
+# metrics_*.json (train.py); opt-in, since each model's target is scaled on its own dataset.
+ENSEMBLE_WEIGHTS = os.environ.get("SOIL_MOISTURE_ENSEMBLE_WEIGHTS", "equal")
 
 
 def _base_dir() -> Path:
     return Path(__file__).resolve().parent
 
 
-def _load_sensor_artifacts() -> None:
-    global _model_sensor, _scaler_sensor_features, _scaler_sensor_target
-    if _model_sensor is not None:
-        return
-    base = _base_dir()
-    path_model = base / "model_sensor.joblib"
-    path_sf = base / "scaler_sensor_features.joblib"
-    path_st = base / "scaler_sensor_target.joblib"
-    if not path_model.exists() or not path_sf.exists() or not path_st.exists():
-        raise FileNotFoundError(
-            "Sensor model artifacts not found. Run train.py first. "
-            f"Expected: {path_model}, {path_sf}, {path_st}"
+def _make_predictor(model: Any, engine: str) -> Any:
+    try:
+        return make_predictor(model, engine)
+    except TypeError as e:
+        logger.warning("Engine %r unavailable for %s (%s); using sklearn", engine, type(model).__name__, e)
+        return model
+
+
+SENSOR_FILES = ("model_sensor.joblib", "scaler_sensor_features.joblib", "scaler_sensor_target.joblib")
+LOCATION_FILES = (
+    "model_location.joblib",
+    "scaler_location_features.joblib",
+    "encoder_state.joblib",
+    "encoder_district.joblib",
+)
+# Trained (state, district) pairs; optional (older artifacts do not have it)
+LOCATIONS_FILE = "locations.json"
+# Held-out metrics per horizon written by train.py; optional, used for ensemble weights
+SENSOR_METRICS_FILE = "metrics_sensor.json"
+LOCATION_METRICS_FILE = "metrics_location.json"
+# One versioned bundle per model (ml_common.bundle) written by train.py: bundles/sensor, bundles/location.
+# Preferred over the separate files above, which are still loaded when there is no bundle.
+BUNDLE_DIR = "bundles"
+BUNDLE_FAMILY = "soil_moisture_{}"
+
+
+def _read_artifact_files(names: tuple[str, ...], missing_message: str) -> tuple[str, list[Any]]:
+    """joblib-load each file from its bytes; version is the content hash of exactly those bytes."""
+    paths = [_base_dir() / name for name in names]
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"{missing_message} Run train.py first. Expected: {', '.join(map(str, missing))}")
+    blobs = [p.read_bytes() for p in paths]
+    return content_version(*blobs), [joblib.load(io.BytesIO(b)) for b in blobs]
+
+
+def _bundle_path(kind: str) -> Path:
+    return _base_dir() / BUNDLE_DIR / kind
+
+
+def _open_bundle(kind: str) -> ArtifactBundle | None:
+    path = _bundle_path(kind)
+    if not (path / MANIFEST_NAME).exists():
+        return None
+    return ArtifactBundle.open(path, family=BUNDLE_FAMILY.format(kind))
+
+
+def _bundle_model_and_predictor(bundle: ArtifactBundle, engine: str) -> tuple[Any, Any]:
+    """
+    (model, predictor). On the flat engine with exported node arrays the forest pickle is not
+    read at all until a batch too large for the flat walk arrives (model is then None); on the
+    compact engine it is never read.
+    """
+    if engine == "compact" and "compact.shape" in bundle:
+        return None, CompactForest.from_arrays(bundle.load_prefix("compact"))
+    if engine == "flat" and "forest.shape" in bundle:
+        flat = FlatForest.from_arrays(bundle.load_prefix("forest"))
+        return None, HybridPredictor(flat, load_model=lambda: bundle.load("model"))
+    model = bundle.load("model")
+    return model, _make_predictor(model, engine)
+
+
+def _read_metrics(name: str) -> dict[str, Any] | None:
+    try:
+        return json.loads((_base_dir() / name).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class SensorArtifacts:
+    """One loaded version of the sensor model files."""
+
+    def __init__(self, model: Any, scaler_features: Any, scaler_target: Any, metrics: dict[str, Any] | None = None,
+                 predictor: Any = None):
+        self.scaler_features = scaler_features
+        self.scaler_target = scaler_target
+        self.metrics = metrics
+        # Object with .predict(X) used at inference (the model itself unless an engine is selected)
+        self.predictor = predictor if predictor is not None else _make_predictor(model, SENSOR_ENGINE)
+        # A CompactForest answers every batch size; keeping the sklearn forest would only cost memory
+        self.model = None if isinstance(self.predictor, CompactForest) else model
+
+
+class LocationArtifacts:
+    """One loaded version of the location model files."""
+
+    def __init__(self, model: Any, scaler_features: Any, encoder_state: Any, encoder_district: Any,
+                 pairs: list[tuple[str, str]] | None = None, metrics: dict[str, Any] | None = None,
+                 predictor: Any = None):
+        self.metrics = metrics
+        self.scaler_features = scaler_features
+        self.encoder_state = encoder_state
+        self.encoder_district = encoder_district
+        # Name -> encoded (state, district) lookups, replacing LabelEncoder.transform per request
+        self.locations = LocationIndex.from_encoders(encoder_state, encoder_district, pairs)
+        self.predictor = predictor if predictor is not None else _make_predictor(model, LOCATION_ENGINE)
+        self.model = None if isinstance(self.predictor, CompactForest) else model
+
+
+def _load_sensor() -> tuple[str, SensorArtifacts]:
+    bundle = _open_bundle("sensor")
+    if bundle is not None:
+        model, predictor = _bundle_model_and_predictor(bundle, SENSOR_ENGINE)
+        return bundle.version, SensorArtifacts(
+            model,
+            bundle.load("scaler_features"),
+            bundle.load("scaler_target"),
+            metrics=bundle.load("metrics") if "metrics" in bundle else None,
+            predictor=predictor,
         )
-    _model_sensor = joblib.load(path_model)
-    _scaler_sensor_features = joblib.load(path_sf)
-    _scaler_sensor_target = joblib.load(path_st)
+    version, loaded = _read_artifact_files(SENSOR_FILES, "Sensor model artifacts not found.")
+    return version, SensorArtifacts(*loaded, metrics=_read_metrics(SENSOR_METRICS_FILE))
+
+
+def _load_location() -> tuple[str, LocationArtifacts]:
+    bundle = _open_bundle("location")
+    if bundle is not None:
+        model, predictor = _bundle_model_and_predictor(bundle, LOCATION_ENGINE)
+        return bundle.version, LocationArtifacts(
+            model,
+            bundle.load("scaler_features"),
+            bundle.load("encoder_state"),
+            bundle.load("encoder_district"),
+            pairs=[tuple(pair) for pair in bundle.load("locations")["pairs"]] if "locations" in bundle else None,
+            metrics=bundle.load("metrics") if "metrics" in bundle else None,
+            predictor=predictor,
+        )
+    version, loaded = _read_artifact_files(LOCATION_FILES, "Location model artifact not found.")
+    pairs = None
+    locations_path = _base_dir() / LOCATIONS_FILE
+    if locations_path.exists():
+        blob = locations_path.read_bytes()
+        version = content_version(version.encode(), blob)
+        pairs = [tuple(pair) for pair in json.loads(blob)["pairs"]]
+    return version, LocationArtifacts(*loaded, pairs=pairs, metrics=_read_metrics(LOCATION_METRICS_FILE))
+
+
+def _warm_up_sensor(artifacts: SensorArtifacts) -> None:
+    row = np.zeros((1, artifacts.scaler_features.n_features_in_))
+    artifacts.predictor.predict(artifacts.scaler_features.transform(row))
+
+
+def _warm_up_location(artifacts: LocationArtifacts) -> None:
+    row = np.zeros((1, artifacts.scaler_features.n_features_in_))
+    artifacts.predictor.predict(artifacts.scaler_features.transform(row))
+
+
+location_forecast_cache = TTLCache(FORECAST_CACHE_SIZE, FORECAST_CACHE_TTL_SECONDS)
+# The day is part of the key; the TTL only frees entries of past days
+forecast_all_cache = TTLCache(FORECAST_ALL_CACHE_SIZE, 86400)
+
+
+def _clear_location_caches() -> None:
+    location_forecast_cache.clear()
+    forecast_all_cache.clear()
+
+# Active version per model; a reload swaps in a new one while in-flight requests keep theirs
+sensor_registry = ModelRegistry(
+    "soil_moisture_sensor",
+    _load_sensor,
+    warmup=_warm_up_sensor,
+    stamp=lambda: file_stamp([*(_base_dir() / name for name in SENSOR_FILES), _bundle_path("sensor") / MANIFEST_NAME]),
+)
+location_registry = ModelRegistry(
+    "soil_moisture_location",
+    _load_location,
+    warmup=_warm_up_location,
+    stamp=lambda: file_stamp(
+        [*(_base_dir() / name for name in (*LOCATION_FILES, LOCATIONS_FILE)), _bundle_path("location") / MANIFEST_NAME]
+    ),
+    # Entries of the old version can no longer be hit (the version is in the key); free them
+    on_swap=lambda _: _clear_location_caches(),
+)
+
+
+def _load_sensor_artifacts() -> None:
+    """Load the first sensor version if none is active (new files: sensor_registry.reload())."""
+    sensor_registry.ensure_loaded()
 
 
 def _load_location_artifacts() -> None:
-    global _model_location, _scaler_location_features, _encoder_state, _encoder_district
-    if _model_location is not None:
-        return
-    base = _base_dir()
-    for name in ["model_location.joblib", "scaler_location_features.joblib", "encoder_state.joblib", "encoder_district.joblib"]:
-        if not (base / name).exists():
-            raise FileNotFoundError(
-                f"Location model artifact not found: {base / name}. Run train.py first."
-            )
-    _model_location = joblib.load(base / "model_location.joblib")
-    _scaler_location_features = joblib.load(base / "scaler_location_features.joblib")
-    _encoder_state = joblib.load(base / "encoder_state.joblib")
-    _encoder_district = joblib.load(base / "encoder_district.joblib")
+    """Load the first location version if none is active (new files: location_registry.reload())."""
+    location_registry.ensure_loaded()
+
+
+def sensor_lags_from_history(station_id: str) -> dict[str, float] | None:
+    """avg_sm_lag1..N from the station's stored daily avg_sm (lag1 = last stored day), or None if incomplete or stale."""
+    found = get_store("sensor").recent(station_id.strip(), SENSOR_LAGS, today=local_today())
+    if found is None:
+        return None
+    values, _ = found
+    return {f"avg_sm_lag{k}": values[-k] for k in range(1, SENSOR_LAGS + 1)}
+
+
+def location_history_name(artifacts: "LocationArtifacts", state: str, district: str) -> str:
+    """History key for any accepted spelling of a location (UnknownLocationError if unknown)."""
+    s, d = artifacts.locations.encode(state, district)
+    return location_history_key(artifacts.locations.states[s], artifacts.locations.districts[d])
+
+
+def _stored_sm_history(artifacts: "LocationArtifacts", state: str, district: str) -> list[float]:
+    key = location_history_name(artifacts, state, district)
+    found = get_store("location").recent(key, NRSC_LAGS, today=local_today())
+    if found is None:
+        raise ValueError(
+            f"No stored soil moisture for the last {NRSC_LAGS} days of {state}, {district}; "
+            "send sm_history or ingest it with POST /history/location"
+        )
+    return found[0]
+
+
+def has_stored_sm_history(state: str, district: str) -> bool:
+    """True if predict_location can run without sm_history: a known location with its last NRSC_LAGS days stored."""
+    try:
+        _stored_sm_history(location_registry.get(), state, district)
+    except (ValueError, FileNotFoundError):
+        return False
+    return True
+
+
+def ingest_location_history(day: Any, rows: list[tuple[str, str, float]]) -> list[tuple[str | None, str | None]]:
+    """
+    Append one day's value for many locations (names resolved once with encode_many).
+    Returns (history key, error) per row.
+    """
+    artifacts: LocationArtifacts = location_registry.get()
+    index = artifacts.locations
+    state_codes, district_codes, errors = index.encode_many([r[0] for r in rows], [r[1] for r in rows])
+    store = get_store("location")
+    out: list[tuple[str | None, str | None]] = []
+    for i, (_, _, value) in enumerate(rows):
+        if i in errors:
+            out.append((None, str(errors[i])))
+            continue
+        key = location_history_key(index.states[state_codes[i]], index.districts[district_codes[i]])
+        try:
+            store.append(key, day, value)
+        except ValueError as e:
+            out.append((key, str(e)))
+            continue
+        out.append((key, None))
+    store.flush()
+    return out
+
+
+def ingest_sensor_history(day: Any, rows: list[tuple[str, float]]) -> list[tuple[str | None, str | None]]:
+    """Append one day's avg_sm for many stations. Returns (station key, error) per row."""
+    store = get_store("sensor")
+    out: list[tuple[str | None, str | None]] = []
+    for station_id, value in rows:
+        key = station_id.strip()
+        try:
+            store.append(key, day, value)
+        except ValueError as e:
+            out.append((key, str(e)))
+            continue
+        out.append((key, None))
+    store.flush()
+    return out
+
+
+def _forecast_key(version: str, state_enc: int, district_enc: int, sm_history: Any, month: int) -> tuple:
+    history = tuple(round(float(v), FORECAST_CACHE_DECIMALS) for v in sm_history)
+    return version, int(state_enc), int(district_enc), history, int(month)
 
 
 def predict_sensor(features_dict: dict[str, float]) -> dict[str, float]:
@@ -69,40 +343,271 @@ def predict_sensor(features_dict: dict[str, float]) -> dict[str, float]:
     features_dict must contain: avg_pm1, avg_pm2, avg_pm3, avg_am, avg_lum, avg_temp, avg_humd, avg_pres,
     and optionally avg_sm_lag1, avg_sm_lag2.
     """
-    _load_sensor_artifacts()
+    artifacts: SensorArtifacts = sensor_registry.get()
     expected = get_sensor_feature_names(use_lags=True, n_lags=SENSOR_LAGS)
     missing = [k for k in expected if k not in features_dict]
     if missing:
         raise ValueError(f"Missing sensor features: {missing}")
 
     row = np.array([[features_dict[k] for k in expected]], dtype=float)
-    row_scaled = _scaler_sensor_features.transform(row)
-    pred = _model_sensor.predict(row_scaled)[0]
+    row_scaled = artifacts.scaler_features.transform(row)
+    pred = artifacts.predictor.predict(row_scaled)[0]
     return {f"day_{d}": float(pred[i]) for i, d in enumerate(FORECAST_DAYS)}
 
 
 def predict_location(
     state: str,
     district: str,
-    sm_history: list[float],
+    sm_history: list[float] | None,
     month: int = 1,
 ) -> dict[str, float]:
     """
     Predict soil moisture (%) for days 3, 4, 5, 6, 7 from location and last 7 observed values.
-    sm_history: length 7, most recent last (e.g. [t-7, t-6, ..., t-1] or [oldest, ..., newest]).
+    sm_history: length 7, most recent last (e.g. [t-7, t-6, ..., t-1] or [oldest, ..., newest]);
+    None reads the last 7 stored days of the location from the history store.
     month: 1-12, optional (default 1).
     """
-    _load_location_artifacts()
+    active = location_registry.get_version()
+    artifacts: LocationArtifacts = active.artifacts
+    if sm_history is None:
+        sm_history = _stored_sm_history(artifacts, state, district)
     if len(sm_history) != NRSC_LAGS:
         raise ValueError(f"sm_history must have length {NRSC_LAGS}, got {len(sm_history)}")
 
-    state_enc = _encoder_state.transform([state])[0]
-    district_enc = _encoder_district.transform([district])[0]
+    # UnknownLocationError (a ValueError) with "did you mean" suggestions for unknown names
+    state_enc, district_enc = artifacts.locations.encode(state, district)
     month_val = max(1, min(12, int(month)))
-    row = np.array([[state_enc, district_enc, *sm_history, month_val]], dtype=float)
-    row_scaled = _scaler_location_features.transform(row)
-    pred = _model_location.predict(row_scaled)[0]
-    return {f"day_{d}": float(pred[i]) for i, d in enumerate(FORECAST_DAYS)}
+    key = _forecast_key(active.version, state_enc, district_enc, sm_history, month_val)
+    pred = location_forecast_cache.get(key)
+    if pred is None:
+        row = np.array([[state_enc, district_enc, *sm_history, month_val]], dtype=float)
+        row_scaled = artifacts.scaler_features.transform(row)
+        pred = tuple(float(v) for v in artifacts.predictor.predict(row_scaled)[0])
+        location_forecast_cache.put(key, pred)
+    return {f"day_{d}": pred[i] for i, d in enumerate(FORECAST_DAYS)}
+
+
+def predict_sensor_batch(rows: list[dict[str, float]]) -> np.ndarray:
+    """
+    Days 3-7 for many sensor rows (same keys as predict_sensor): one feature matrix,
+    one scaler transform and one model call. Returns shape (len(rows), len(FORECAST_DAYS)).
+    """
+    artifacts: SensorArtifacts = sensor_registry.get()
+    expected = get_sensor_feature_names(use_lags=True, n_lags=SENSOR_LAGS)
+    for i, features_dict in enumerate(rows):
+        missing = [k for k in expected if k not in features_dict]
+        if missing:
+            raise ValueError(f"Row {i}: missing sensor features: {missing}")
+    X = np.array([[features_dict[k] for k in expected] for features_dict in rows], dtype=float).reshape(len(rows), -1)
+    return np.asarray(artifacts.predictor.predict(artifacts.scaler_features.transform(X)), dtype=float)
+
+
+def predict_location_batch(
+    states: list[str],
+    districts: list[str],
+    sm_histories: list[list[float] | None],
+    months: list[int],
+) -> tuple[np.ndarray, list[str | None]]:
+    """
+    Days 3-7 for many location rows (same inputs as predict_location) with one scaler
+    transform and one model call; names are encoded with one LocationIndex.encode_many.
+    A None history is read from the history store. Returns (predictions, errors): rows
+    with an unknown state / district, a wrong or missing history get an error message and
+    NaN predictions. Rows found in the forecast cache are not recomputed.
+    """
+    active = location_registry.get_version()
+    artifacts: LocationArtifacts = active.artifacts
+    n = len(states)
+    state_codes, district_codes, location_errors = artifacts.locations.encode_many(states, districts)
+
+    errors: list[str | None] = [None] * n
+    X = np.zeros((n, NRSC_LAGS + 3), dtype=float)
+    for i in range(n):
+        history = sm_histories[i]
+        if i in location_errors:
+            errors[i] = str(location_errors[i])
+            continue
+        if history is None:
+            try:
+                history = _stored_sm_history(artifacts, states[i], districts[i])
+            except ValueError as e:
+                errors[i] = str(e)
+                continue
+        if len(history) != NRSC_LAGS:
+            errors[i] = f"sm_history must have length {NRSC_LAGS}, got {len(history)}"
+        else:
+            X[i, 2:2 + NRSC_LAGS] = history
+    X[:, 0] = state_codes
+    X[:, 1] = district_codes
+    X[:, -1] = np.clip(np.asarray(months, dtype=int), 1, 12)
+
+    predictions = np.full((n, len(FORECAST_DAYS)), np.nan)
+    keys: dict[int, tuple] = {}
+    missing: list[int] = []
+    for i in range(n):
+        if errors[i] is None:
+            keys[i] = _forecast_key(active.version, X[i, 0], X[i, 1], X[i, 2:2 + NRSC_LAGS], X[i, -1])
+            cached = location_forecast_cache.get(keys[i])
+            if cached is None:
+                missing.append(i)
+            else:
+                predictions[i] = cached
+    if missing:
+        X_missing = artifacts.scaler_features.transform(X[missing])
+        predictions[missing] = artifacts.predictor.predict(X_missing)
+        for i in missing:
+            location_forecast_cache.put(keys[i], tuple(predictions[i].tolist()))
+    return predictions, errors
+
+
+def local_today() -> date:
+    """Today at UTC + DAY_OFFSET_MINUTES (the calendar day used for stored history and sensor days)."""
+    return (datetime.now(timezone.utc) + timedelta(minutes=DAY_OFFSET_MINUTES)).date()
+
+
+def _sweep_locations(artifacts: LocationArtifacts) -> list[tuple[int, int]]:
+    """Encoded (state, district) of every trained location; without locations.json, those with stored history."""
+    if artifacts.locations.trained_pairs:
+        return list(artifacts.locations.trained_pairs)
+    index = artifacts.locations
+    found: dict[tuple[int, int], None] = {}
+    for key in get_store("location").keys():
+        state, _, district = key.partition("|")
+        try:
+            found.setdefault(index.encode(state, district))
+        except ValueError:
+            continue
+    return list(found)
+
+
+def forecast_all(
+    month: int | None = None,
+    supplied: list[tuple[str, str, list[float]]] | None = None,
+    day: date | None = None,
+) -> tuple[dict[str, Any], list[str | None]]:
+    """
+    Days 3-7 for every trained location in one scaler transform and one model call.
+    Histories are the last NRSC_LAGS stored days of each location; supplied
+    (state, district, sm_history) rows replace them (or add a location). Locations
+    without a complete history are listed under "missing".
+
+    Returns (payload, errors per supplied row). The payload is columnar: one list per
+    field ("state", "district", "history_end", and "predictions" per horizon), values
+    rounded to FORECAST_ALL_DECIMALS. It is cached per (model version, day, month,
+    digest of the input matrix), so repeated sweeps of a day are served without the model
+    and a history ingestion or new model version is picked up at once.
+    """
+    active = location_registry.get_version()
+    artifacts: LocationArtifacts = active.artifacts
+    index = artifacts.locations
+    day = day or local_today()
+    month_val = max(1, min(12, int(month))) if month is not None else day.month
+
+    codes = _sweep_locations(artifacts)
+    position = {pair: i for i, pair in enumerate(codes)}
+    keys = [location_history_key(index.states[s], index.districts[d]) for s, d in codes]
+    history, last_day = get_store("location").recent_many(keys, NRSC_LAGS, today=day)
+
+    errors: list[str | None] = [None] * len(supplied or ())
+    if supplied:
+        state_codes, district_codes, location_errors = index.encode_many(
+            [row[0] for row in supplied], [row[1] for row in supplied]
+        )
+        extra_codes, extra_history = [], []
+        for i, (_, _, sm_history) in enumerate(supplied):
+            if i in location_errors:
+                errors[i] = str(location_errors[i])
+                continue
+            if len(sm_history) != NRSC_LAGS:
+                errors[i] = f"sm_history must have length {NRSC_LAGS}, got {len(sm_history)}"
+                continue
+            pair = (int(state_codes[i]), int(district_codes[i]))
+            if pair in position:
+                history[position[pair]] = sm_history
+                last_day[position[pair]] = -1
+            else:
+                position[pair] = len(codes) + len(extra_codes)
+                extra_codes.append(pair)
+                extra_history.append(sm_history)
+        if extra_codes:
+            codes = codes + extra_codes
+            history = np.vstack([history, np.asarray(extra_history, dtype=float)])
+            last_day = np.concatenate([last_day, np.full(len(extra_codes), -1, dtype=np.int64)])
+
+    code_array = np.asarray(codes, dtype=np.int64).reshape(-1, 2)
+    complete = ~np.isnan(history).any(axis=1)
+    X = np.column_stack([code_array[complete], history[complete], np.full(int(complete.sum()), month_val)]).astype(float)
+    digest = hashlib.blake2b(X.tobytes() + last_day[complete].tobytes(), digest_size=8).hexdigest()
+    key = (active.version, day.toordinal(), month_val, digest)
+    payload = forecast_all_cache.get(key)
+    if payload is not None:
+        return payload, errors
+
+    predictions = np.empty((0, len(FORECAST_DAYS)))
+    if len(X):
+        predictions = np.round(artifacts.predictor.predict(artifacts.scaler_features.transform(X)), FORECAST_ALL_DECIMALS)
+    rows = np.flatnonzero(complete).tolist()
+    missing = np.flatnonzero(~complete).tolist()
+    payload = {
+        "model_version": active.version,
+        "history_digest": digest,
+        "date": day.isoformat(),
+        "month": month_val,
+        "days_ahead": list(FORECAST_DAYS),
+        "count": len(rows),
+        "state": [index.states[codes[i][0]] for i in rows],
+        "district": [index.districts[codes[i][1]] for i in rows],
+        # Last stored day of the history used; None for a supplied history
+        "history_end": [date.fromordinal(int(last_day[i])).isoformat() if last_day[i] >= 0 else None for i in rows],
+        "predictions": {f"day_{d}": predictions[:, j].tolist() for j, d in enumerate(FORECAST_DAYS)},
+        "missing": {
+            "state": [index.states[codes[i][0]] for i in missing],
+            "district": [index.districts[codes[i][1]] for i in missing],
+        },
+    }
+    forecast_all_cache.put(key, payload)
+    return payload, errors
+
+
+_ensemble_executor: ThreadPoolExecutor | None = None
+_ensemble_executor_lock = threading.Lock()
+
+
+def _get_ensemble_executor() -> ThreadPoolExecutor:
+    global _ensemble_executor
+    if _ensemble_executor is None:
+        with _ensemble_executor_lock:
+            if _ensemble_executor is None:
+                _ensemble_executor = ThreadPoolExecutor(max_workers=ENSEMBLE_THREADS, thread_name_prefix="soil-ensemble")
+    return _ensemble_executor
+
+
+def ensemble_weights(
+    sensor: SensorArtifacts | None = None, location: LocationArtifacts | None = None
+) -> dict[str, tuple[float, float]]:
+    """
+    (sensor, location) weight per horizon: 0.5 / 0.5 unless SOIL_MOISTURE_ENSEMBLE_WEIGHTS=metrics
+    and both metrics files have validation errors. Then inverse validation MSE,
+    w_sensor = (1 / mse_s) / (1 / mse_s + 1 / mse_l), so the more accurate model of each
+    horizon counts more (test errors are never used, so the test split stays unseen).
+    """
+    weights = {f"day_{d}": (0.5, 0.5) for d in FORECAST_DAYS}
+    if ENSEMBLE_WEIGHTS != "metrics":
+        return weights
+    sensor = sensor or sensor_registry.get()
+    location = location or location_registry.get()
+    sensor_val = (sensor.metrics or {}).get("validation")
+    location_val = (location.metrics or {}).get("validation")
+    if not sensor_val or not location_val:
+        return weights
+    for k in weights:
+        try:
+            inv_s = 1.0 / sensor_val[k]["rmse"] ** 2
+            inv_l = 1.0 / location_val[k]["rmse"] ** 2
+        except (KeyError, TypeError, ZeroDivisionError):
+            continue
+        weights[k] = (inv_s / (inv_s + inv_l), inv_l / (inv_s + inv_l))
+    return weights
 
 
 def predict_ensemble(
@@ -110,27 +615,39 @@ def predict_ensemble(
     state: str | None,
     district: str | None,
     sm_history: list[float] | None,
-    weights: tuple[float, float] = (0.5, 0.5),
+    weights: tuple[float, float] | None = None,
+    month: int = 1,
 ) -> dict[str, float]:
     """
-    If both sensor and location inputs are provided, return weighted average of both predictions.
-    Otherwise return the single available prediction.
+    If both sensor and location inputs are provided, return weighted average of both predictions,
+    with the two models evaluated concurrently (ENSEMBLE_THREADS). weights=None uses
+    ensemble_weights() per horizon. Otherwise return the single available prediction.
+    sm_history=None uses the stored history of the location, as in predict_location.
     """
+    use_sensor = sensor_features is not None
+    use_location = state is not None and district is not None
     sensor_pred = None
     location_pred = None
-    if sensor_features is not None:
+    if use_sensor and use_location and ENSEMBLE_THREADS > 0:
+        location_future = _get_ensemble_executor().submit(predict_location, state, district, sm_history, month)
         sensor_pred = predict_sensor(sensor_features)
-    if state is not None and district is not None and sm_history is not None:
-        location_pred = predict_location(state, district, sm_history)
+        location_pred = location_future.result()
+    else:
+        if use_sensor:
+            sensor_pred = predict_sensor(sensor_features)
+        if use_location:
+            location_pred = predict_location(state, district, sm_history, month)
 
     if sensor_pred is not None and location_pred is not None:
+        per_horizon = ensemble_weights() if weights is None else {k: weights for k in sensor_pred}
         out = {}
         for d in FORECAST_DAYS:
             k = f"day_{d}"
-            out[k] = weights[0] * sensor_pred[k] + weights[1] * location_pred[k]
+            w_sensor, w_location = per_horizon[k]
+            out[k] = w_sensor * sensor_pred[k] + w_location * location_pred[k]
         return out
     if sensor_pred is not None:
         return sensor_pred
     if location_pred is not None:
         return location_pred
-    raise ValueError("Provide either sensor_features or (state, district, sm_history).")
+    raise ValueError("Provide either sensor_features or (state, district).")
@@ -0,0 +1,257 @@
+"""
+Online daily aggregation of raw sensor readings into the sensor model's daily features.
+
+Field gateways send one reading per station per minute or so:
+
+    {"station_id": "farm-17", "ts": 1760592000, "pm1": 3.1, "pm2": 5.9, "pm3": 24.9, "am": 0,
+     "lum": 2208.9, "temp": 21.7, "humd": 90.8, "pres": 92940.3, "sm": 7435.4}
+
+`ts` is epoch seconds or an ISO-8601 string; any value field may be missing or null.
+DailySensorAggregator keeps, per station, only the open day and a running sum and count
+per field (O(1) memory per station). When a reading for a later day arrives, the open
+day is closed and emitted as a row of daily means named like soil-moisture.csv
+(avg_pm1 ... avg_pres, avg_sm). Readings for a day that is already closed are dropped
+and counted as late.
+
+Readings are processed in chunks with numpy: one sort by station, a segmented running
+max for late readings and np.add.reduceat for the (station, day) sums, so Python work is
+per chunk and per day rollover, not per reading (millions of readings per second). JSON
+decoding dominates the endpoint's cost; orjson is used when installed. Per station, readings are expected in
+time order within the stream (as a gateway sends them).
+
+publish_days() stores each closed day's avg_sm in the sensor history store (history.py), so
+/predict/sensor?station_id=... has its lags, and can forecast the closed day right away.
+
+Days are calendar days at UTC + SOIL_MOISTURE_DAY_OFFSET_MINUTES (default 330, IST).
+"""
+import json
+import os
+from datetime import date, timedelta
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+try:
+    # Optional: parses NDJSON chunks 2-3x faster than the json module
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from features import FORECAST_DAYS, SENSOR_FEATURE_COLS, SENSOR_LAGS
+from history import get_store
+
+# Raw reading field -> daily feature column
+RAW_FIELDS = [col.removeprefix("avg_") for col in SENSOR_FEATURE_COLS] + ["sm"]
+DAILY_COLUMNS = [f"avg_{name}" for name in RAW_FIELDS]
+
+DAY_OFFSET_MINUTES = int(os.environ.get("SOIL_MOISTURE_DAY_OFFSET_MINUTES", "330"))
+SECONDS_PER_DAY = 86400
+# Readings parsed and aggregated per numpy pass
+CHUNK_LINES = 65536
+
+
+def _column(records: list[dict[str, Any]], name: str) -> np.ndarray:
+    values = [r.get(name) for r in records]
+    try:
+        # None -> NaN
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+
+
+def _timestamps(values: list[Any]) -> np.ndarray:
+    """Epoch seconds (float, NaN if unparseable) from numbers or ISO-8601 strings."""
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+    numeric = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+    text = np.isnan(numeric) & np.array([isinstance(v, str) for v in values], dtype=bool)
+    if text.any():
+        parsed = pd.to_datetime(pd.Series(values, dtype=object)[text], utc=True, errors="coerce", format="ISO8601")
+        seconds = parsed.astype("int64").to_numpy() / 1e9
+        numeric[text] = np.where(parsed.isna().to_numpy(), np.nan, seconds)
+    return numeric
+
+
+def parse_ndjson(lines: Iterable[bytes | str]) -> tuple[list[Any], np.ndarray, np.ndarray, int]:
+    """
+    (station ids, timestamps in epoch seconds, values (n, len(RAW_FIELDS)), invalid count) for
+    NDJSON readings. Blank lines are ignored; lines that are not JSON objects or lack a
+    station_id / valid ts are counted as invalid and left out.
+    """
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return [], np.empty(0), np.empty((0, len(RAW_FIELDS))), 0
+    joined = b",".join(line if isinstance(line, bytes) else line.encode() for line in lines)
+    try:
+        records = _loads(b"[" + joined + b"]")
+    except json.JSONDecodeError:
+        # Locate the bad lines one by one only when the fast path fails
+        records = []
+        for line in lines:
+            try:
+                records.append(_loads(line))
+            except json.JSONDecodeError:
+                records.append(None)
+    n_lines = len(records)
+    records = [r for r in records if isinstance(r, dict) and r.get("station_id") not in (None, "")]
+    ts = _timestamps([r.get("ts") for r in records])
+    values = np.column_stack([_column(records, name) for name in RAW_FIELDS]) if records else np.empty((0, len(RAW_FIELDS)))
+    ok = ~np.isnan(ts)
+    stations = [str(r["station_id"]) for r in records]
+    if not ok.all():
+        stations = [s for s, keep in zip(stations, ok.tolist()) if keep]
+        ts, values = ts[ok], values[ok]
+    return stations, ts, values, n_lines - len(stations)
+
+
+class DailySensorAggregator:
+    """Open day and running per-field sums / counts per station (see module docstring)."""
+
+    def __init__(self, day_offset_minutes: int = DAY_OFFSET_MINUTES, initial_capacity: int = 1024):
+        self.day_offset_seconds = day_offset_minutes * 60
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+        self._day = np.full(initial_capacity, -1, dtype=np.int64)
+        self._sums = np.zeros((initial_capacity, len(RAW_FIELDS)))
+        self._counts = np.zeros((initial_capacity, len(RAW_FIELDS)), dtype=np.int64)
+        self.readings = 0
+        self.late = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _codes(self, stations: list[Any]) -> np.ndarray:
+        local, uniques = pd.factorize(np.asarray(stations, dtype=object))
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for j, name in enumerate(uniques.tolist()):
+            code = self._ids.get(name)
+            if code is None:
+                code = self._ids[name] = len(self._names)
+                self._names.append(name)
+            mapping[j] = code
+        if len(self._names) > len(self._day):
+            grow = max(len(self._names), 2 * len(self._day)) - len(self._day)
+            self._day = np.concatenate([self._day, np.full(grow, -1, dtype=np.int64)])
+            self._sums = np.vstack([self._sums, np.zeros((grow, len(RAW_FIELDS)))])
+            self._counts = np.vstack([self._counts, np.zeros((grow, len(RAW_FIELDS)), dtype=np.int64)])
+        return mapping[local]
+
+    def _emit(self, code: int) -> dict[str, Any]:
+        counts = self._counts[code]
+        means = np.divide(self._sums[code], counts, out=np.full(len(RAW_FIELDS), np.nan), where=counts > 0)
+        row: dict[str, Any] = {
+            "station_id": self._names[code],
+            "date": date.fromordinal(int(self._day[code])),
+            "readings": int(counts.max()),
+        }
+        for col, value in zip(DAILY_COLUMNS, means.tolist()):
+            row[col] = None if value != value else value
+        return row
+
+    def add(self, stations: list[Any], ts: np.ndarray, values: np.ndarray) -> list[dict[str, Any]]:
+        """Aggregate one chunk of readings; returns the station-days closed by it (in station order)."""
+        n = len(stations)
+        if n == 0:
+            return []
+        self.readings += n
+        codes = self._codes(stations)
+        # Day ordinals (date.toordinal) of the local calendar day
+        days = np.floor_divide(ts + self.day_offset_seconds, SECONDS_PER_DAY).astype(np.int64) + 719163
+
+        order = np.argsort(codes, kind="stable")
+        codes, days, values = codes[order], days[order], values[order]
+        # Late: older than the station's open day or than an earlier reading of this chunk.
+        # codes are sorted, so a running max of (code, day) packed in one int stays per station.
+        packed = (codes << 32) | np.maximum(days, self._day[codes]).clip(min=0)
+        running_day = np.maximum.accumulate(packed) & 0xFFFFFFFF
+        on_time = days >= running_day
+        if not on_time.all():
+            self.late += int((~on_time).sum())
+            codes, days, values = codes[on_time], days[on_time], values[on_time]
+            if len(codes) == 0:
+                return []
+
+        # Contiguous (station, day) groups
+        starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])])
+        present = ~np.isnan(values)
+        group_sums = np.add.reduceat(np.where(present, values, 0.0), starts, axis=0)
+        group_counts = np.add.reduceat(present.astype(np.int64), starts, axis=0)
+        group_codes, group_days = codes[starts], days[starts]
+
+        # Groups continuing the open day: plain vectorized adds (at most one per station)
+        same = group_days == self._day[group_codes]
+        self._sums[group_codes[same]] += group_sums[same]
+        self._counts[group_codes[same]] += group_counts[same]
+
+        # Groups starting a new day: close the open one, then open this one
+        closed: list[dict[str, Any]] = []
+        for j in np.flatnonzero(~same).tolist():
+            code = int(group_codes[j])
+            if self._day[code] >= 0:
+                closed.append(self._emit(code))
+            self._day[code] = group_days[j]
+            self._sums[code] = group_sums[j]
+            self._counts[code] = group_counts[j]
+        return closed
+
+    def close_days_before(self, day: date) -> list[dict[str, Any]]:
+        """Close and emit every open day before `day` (for stations that went quiet)."""
+        codes = np.flatnonzero((self._day[:len(self._names)] >= 0) & (self._day[:len(self._names)] < day.toordinal()))
+        closed = [self._emit(int(code)) for code in codes]
+        self._day[codes] = -1
+        self._sums[codes] = 0.0
+        self._counts[codes] = 0
+        return closed
+
+    def open_days(self) -> dict[str, date]:
+        return {name: date.fromordinal(int(self._day[code])) for code, name in enumerate(self._names) if self._day[code] >= 0}
+
+    def stats(self) -> dict[str, Any]:
+        return {"stations": len(self._names), "open_days": int((self._day[:len(self._names)] >= 0).sum()),
+                "readings": self.readings, "late": self.late}
+
+
+def publish_days(rows: list[dict[str, Any]], forecast: bool, store_history: bool) -> None:
+    """
+    For closed days in stream order: store avg_sm in the sensor history store and, with
+    forecast, add "predictions" (days 3-7) from predict_sensor_batch, in place. Lags come
+    from the station's stored days just before the closed day (0 when missing, as in
+    /predict/sensor); "lags_from_history" tells which.
+    """
+    import predict
+
+    store = get_store("sensor")
+    features: list[dict[str, float]] = []
+    forecast_rows: list[dict[str, Any]] = []
+    for row in rows:
+        if forecast and all(row[col] is not None for col in SENSOR_FEATURE_COLS):
+            found = store.recent(row["station_id"], SENSOR_LAGS)
+            from_history = found is not None and found[1] == row["date"] - timedelta(days=1)
+            lags = found[0] if from_history else [0.0] * SENSOR_LAGS
+            features.append({
+                **{col: row[col] for col in SENSOR_FEATURE_COLS},
+                **{f"avg_sm_lag{k}": lags[-k] for k in range(1, SENSOR_LAGS + 1)},
+            })
+            row["lags_from_history"] = from_history
+            forecast_rows.append(row)
+        if store_history and row["avg_sm"] is not None:
+            try:
+                store.append(row["station_id"], row["date"], row["avg_sm"])
+            except ValueError:
+                pass
+    if store_history and rows:
+        store.flush()
+    if forecast_rows:
+        try:
+            predictions = predict.predict_sensor_batch(features).tolist()
+        except (FileNotFoundError, ValueError) as e:
+            for row in forecast_rows:
+                row["error"] = str(e)
+            return
+        for row, pred in zip(forecast_rows, predictions):
+            row["predictions"] = pred
+            row["days_ahead"] = list(FORECAST_DAYS)
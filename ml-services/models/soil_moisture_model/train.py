@@ -1,8 +1,21 @@
 """
 Train sensor-based and location-based soil moisture models with time-based train/val/test splits.
-Saves models, scalers, encoders, and metrics under soil_moisture_model/.
+Saves models, scalers, encoders, and metrics under soil_moisture_model/, and one versioned
+bundle per model (bundles/sensor, bundles/location; see ml_common/bundle.py) that the API loads.
+
+  python train.py                          # one 100-tree forest per horizon (MultiOutputRegressor)
+  python train.py --forest native          # one 100-tree multi-output forest for all 5 horizons
+  python train.py --forest native --compare  # also fit the other mode; metrics_*.json list both
+  python train.py --bundle-existing        # no training: bundle the model files already here
+
+Each bundle also holds the forest compacted to float32 (ml_common.forest_engine.CompactForest,
+served with SOIL_MOISTURE_*_ENGINE=compact); metrics_*.json record its drift from the
+original forest on the test split under "compact".
 """
+import argparse
+import io
 import json
+import time
 from pathlib import Path
 
 import numpy as np
@@ -18,11 +31,21 @@ from features import (
     time_based_split,
     FORECAST_DAYS,
 )
+from predict import BUNDLE_DIR, BUNDLE_FAMILY
+from ml_common.bundle import write_bundle  # noqa: E402 (path set up by features)
+from ml_common.forest_engine import CompactForest, FlatForest, compaction_drift  # noqa: E402
 
 RANDOM_STATE = 42
 TRAIN_RATIO = 0.7
 VAL_RATIO = 0.15
 TEST_RATIO = 0.15
+N_ESTIMATORS = 100
+MAX_DEPTH = 12
+
+# "per-horizon": MultiOutputRegressor fits an independent forest for each of days 3-7.
+# "native": one RandomForestRegressor fitted on the 5-column target; every tree splits on the
+# summed error over all horizons, so the forest is 5x smaller and 5x faster to fit and predict.
+FOREST_MODES = ("per-horizon", "native")
 
 
 def _base_dir() -> Path:
@@ -44,7 +67,166 @@ def _metrics_per_horizon(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
     return out
 
 
-def main() -> None:
+def build_forest(mode: str) -> RandomForestRegressor | MultiOutputRegressor:
+    forest = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=RANDOM_STATE, max_depth=MAX_DEPTH)
+    return forest if mode == "native" else MultiOutputRegressor(forest)
+
+
+def _model_size_bytes(model) -> int:
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    return buf.getbuffer().nbytes
+
+
+def _predict_latency_ms(model, X: np.ndarray, repeats: int = 20) -> dict:
+    """Median wall time of one single-row predict and of one predict over all of X."""
+    single, batch = [], []
+    for i in range(repeats):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        model.predict(row)
+        single.append(time.perf_counter() - start)
+    for _ in range(max(3, repeats // 5)):
+        start = time.perf_counter()
+        model.predict(X)
+        batch.append(time.perf_counter() - start)
+    return {
+        "single_row": float(np.median(single) * 1000),
+        f"batch_{len(X)}_rows": float(np.median(batch) * 1000),
+    }
+
+
+def fit_and_evaluate(mode: str, X_train: np.ndarray, Y_train: np.ndarray, X_test: np.ndarray, Y_test: np.ndarray):
+    """Fit one forest mode; returns (model, test metrics per horizon, fit / latency / size report)."""
+    model = build_forest(mode)
+    start = time.perf_counter()
+    model.fit(X_train, Y_train)
+    fit_seconds = time.perf_counter() - start
+    metrics = _metrics_per_horizon(Y_test, model.predict(X_test))
+    report = {
+        "overall": metrics["overall"],
+        "fit_seconds": fit_seconds,
+        "predict_latency_ms": _predict_latency_ms(model, X_test),
+        "model_size_bytes": _model_size_bytes(model),
+        "n_trees": N_ESTIMATORS * (1 if mode == "native" else len(FORECAST_DAYS)),
+    }
+    return model, metrics, report
+
+
+def train_forest(name: str, args: argparse.Namespace, X_train, Y_train, X_test, Y_test):
+    """
+    Fit the selected forest mode (and with --compare the other one as well). Returns the
+    model to save and its metrics, with every fitted mode's report under "forest_modes".
+    """
+    modes = [args.forest] + ([m for m in FOREST_MODES if m != args.forest] if args.compare else [])
+    reports = {}
+    for mode in modes:
+        fitted, mode_metrics, reports[mode] = fit_and_evaluate(mode, X_train, Y_train, X_test, Y_test)
+        r = reports[mode]
+        print(f"{name} [{mode}]: test MAE {r['overall']['mae']:.4f}, fit {r['fit_seconds']:.2f} s, "
+              f"1-row predict {r['predict_latency_ms']['single_row']:.1f} ms, size {r['model_size_bytes'] / 1e6:.1f} MB")
+        if mode == args.forest:
+            model, metrics = fitted, mode_metrics
+    metrics["forest_mode"] = args.forest
+    metrics["forest_modes"] = reports
+    return model, metrics
+
+
+def held_out_test(X: np.ndarray, Y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The time-ordered test split the metrics are computed on."""
+    _, val_end = time_based_split(len(X), TRAIN_RATIO, VAL_RATIO, TEST_RATIO)
+    return X[val_end:], Y[val_end:]
+
+
+def held_out_validation(X: np.ndarray, Y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The time-ordered validation split between train and test (ensemble weights are set on it)."""
+    train_end, val_end = time_based_split(len(X), TRAIN_RATIO, VAL_RATIO, TEST_RATIO)
+    return X[train_end:val_end], Y[train_end:val_end]
+
+
+def compact_report(name: str, model, X_test: np.ndarray, Y_test: np.ndarray) -> dict:
+    """Size of the float32 CompactForest and its drift from the fitted forest on the test split."""
+    report = compaction_drift(model, CompactForest.from_sklearn(model), X_test, Y_test)
+    report["model_size_bytes"] = _model_size_bytes(model)
+    print(f"{name} [compact]: {report['compact_bytes'] / 1e6:.1f} MB vs {report['model_size_bytes'] / 1e6:.1f} MB "
+          f"pickled, max |diff| {report['max_abs_diff']:.2e}, "
+          f"test MAE {report['mae_compact']:.6f} vs {report['mae_original']:.6f}")
+    return report
+
+
+def write_model_bundle(kind: str, objects: dict, documents: dict, metadata: dict) -> str:
+    """
+    bundles/<kind>: objects, documents and the forest's node arrays, as FlatForest (forest.*,
+    flat engine) and CompactForest (compact.*, compact engine).
+    """
+    arrays = {}
+    try:
+        flat = FlatForest.from_sklearn(objects["model"])
+    except TypeError:
+        flat = None
+    if flat is not None:
+        arrays.update({f"forest.{name}": values for name, values in flat.to_arrays().items()})
+        arrays.update({f"compact.{name}": values for name, values in CompactForest.from_flat(flat).to_arrays().items()})
+    return write_bundle(
+        _base_dir() / BUNDLE_DIR / kind,
+        BUNDLE_FAMILY.format(kind),
+        objects=objects,
+        arrays=arrays,
+        documents=documents,
+        metadata=metadata,
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--forest", choices=FOREST_MODES, default="per-horizon", help="forest layout of the saved models")
+    parser.add_argument("--compare", action="store_true", help="also fit the other layout and record both in metrics_*.json")
+    parser.add_argument("--bundle-existing", action="store_true",
+                        help="write bundles from the existing model_*.joblib / scaler / encoder files and exit")
+    return parser.parse_args(argv)
+
+
+def bundle_existing_files() -> None:
+    """
+    Bundle artifacts saved by an earlier train.py (separate files) without retraining. The
+    features are rebuilt only to add the compact drift report to metrics_*.json.
+    """
+    base = _base_dir()
+
+    def load_metrics(kind: str, model, scaler_features, X: np.ndarray, Y: np.ndarray) -> dict:
+        path = base / f"metrics_{kind}.json"
+        metrics = json.loads(path.read_text()) if path.exists() else {}
+        X_test, Y_test = held_out_test(X, Y)
+        metrics["compact"] = compact_report(f"{kind.capitalize()} model", model, scaler_features.transform(X_test), Y_test)
+        X_val, Y_val = held_out_validation(X, Y)
+        metrics["validation"] = _metrics_per_horizon(Y_val, model.predict(scaler_features.transform(X_val)))
+        path.write_text(json.dumps(metrics, indent=2))
+        return metrics
+
+    sensor = {name: joblib.load(base / f"{file}.joblib") for name, file in (
+        ("model", "model_sensor"), ("scaler_features", "scaler_sensor_features"), ("scaler_target", "scaler_sensor_target"),
+    )}
+    X_s, Y_s, _ = build_sensor_features_and_targets(use_lags=True)
+    documents = {"metrics": load_metrics("sensor", sensor["model"], sensor["scaler_features"], X_s, Y_s)}
+    print("bundles/sensor", write_model_bundle("sensor", sensor, documents, {}))
+    location = {name: joblib.load(base / f"{file}.joblib") for name, file in (
+        ("model", "model_location"), ("scaler_features", "scaler_location_features"),
+        ("encoder_state", "encoder_state"), ("encoder_district", "encoder_district"),
+    )}
+    locations_path = base / "locations.json"
+    X_loc, Y_loc, _ = build_nrsc_features_and_targets()
+    documents = {
+        "metrics": load_metrics("location", location["model"], location["scaler_features"], X_loc, Y_loc),
+        "locations": json.loads(locations_path.read_text()) if locations_path.exists() else None,
+    }
+    print("bundles/location", write_model_bundle("location", location, {k: v for k, v in documents.items() if v}, {}))
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.bundle_existing:
+        bundle_existing_files()
+        return
     base = _base_dir()
 
     # ---- Sensor model ----
@@ -61,13 +243,10 @@ def main() -> None:
     X_s_val_scaled = scaler_s_features.transform(X_s_val)
     X_s_test_scaled = scaler_s_features.transform(X_s_test)
 
-    model_sensor = MultiOutputRegressor(
-        RandomForestRegressor(n_estimators=100, random_state=RANDOM_STATE, max_depth=12)
-    )
-    model_sensor.fit(X_s_train_scaled, Y_s_train)
-
-    Y_s_test_pred = model_sensor.predict(X_s_test_scaled)
-    metrics_sensor = _metrics_per_horizon(Y_s_test, Y_s_test_pred)
+    model_sensor, metrics_sensor = train_forest("Sensor model", args, X_s_train_scaled, Y_s_train, X_s_test_scaled, Y_s_test)
+    metrics_sensor["compact"] = compact_report("Sensor model", model_sensor, X_s_test_scaled, Y_s_test)
+    # Per-horizon errors on the validation split, for SOIL_MOISTURE_ENSEMBLE_WEIGHTS=metrics
+    metrics_sensor["validation"] = _metrics_per_horizon(Y_s_val, model_sensor.predict(X_s_val_scaled))
 
     joblib.dump(model_sensor, base / "model_sensor.joblib")
     joblib.dump(scaler_s_features, base / "scaler_sensor_features.joblib")
@@ -75,7 +254,13 @@ def main() -> None:
     with open(base / "metrics_sensor.json", "w") as f:
         json.dump(metrics_sensor, f, indent=2)
 
-    print("Sensor model: test MAE (overall) =", metrics_sensor["overall"]["mae"])
+    version = write_model_bundle(
+        "sensor",
+        {"model": model_sensor, "scaler_features": scaler_s_features, "scaler_target": scaler_s_target},
+        {"metrics": metrics_sensor},
+        {"forest_mode": args.forest},
+    )
+    print("Sensor model: test MAE (overall) =", metrics_sensor["overall"]["mae"], f"(bundle {version})")
 
     # ---- Location model ----
     X_loc, Y_loc, aux_loc = build_nrsc_features_and_targets()
@@ -97,22 +282,33 @@ def main() -> None:
     X_loc_val_scaled = scaler_loc_features.transform(X_loc_val)
     X_loc_test_scaled = scaler_loc_features.transform(X_loc_test)
 
-    model_location = MultiOutputRegressor(
-        RandomForestRegressor(n_estimators=100, random_state=RANDOM_STATE, max_depth=12)
+    model_location, metrics_location = train_forest(
+        "Location model", args, X_loc_train_scaled, Y_loc_train, X_loc_test_scaled, Y_loc_test
     )
-    model_location.fit(X_loc_train_scaled, Y_loc_train)
-
-    Y_loc_test_pred = model_location.predict(X_loc_test_scaled)
-    metrics_location = _metrics_per_horizon(Y_loc_test, Y_loc_test_pred)
+    metrics_location["compact"] = compact_report("Location model", model_location, X_loc_test_scaled, Y_loc_test)
+    metrics_location["validation"] = _metrics_per_horizon(Y_loc_val, model_location.predict(X_loc_val_scaled))
 
     joblib.dump(model_location, base / "model_location.joblib")
     joblib.dump(scaler_loc_features, base / "scaler_location_features.joblib")
     joblib.dump(encoder_state, base / "encoder_state.joblib")
     joblib.dump(encoder_district, base / "encoder_district.joblib")
+    with open(base / "locations.json", "w") as f:
+        json.dump({"pairs": [list(pair) for pair in aux_loc["locations"]]}, f, indent=2)
     with open(base / "metrics_location.json", "w") as f:
         json.dump(metrics_location, f, indent=2)
 
-    print("Location model: test MAE (overall) =", metrics_location["overall"]["mae"])
+    version = write_model_bundle(
+        "location",
+        {
+            "model": model_location,
+            "scaler_features": scaler_loc_features,
+            "encoder_state": encoder_state,
+            "encoder_district": encoder_district,
+        },
+        {"metrics": metrics_location, "locations": {"pairs": [list(pair) for pair in aux_loc["locations"]]}},
+        {"forest_mode": args.forest},
+    )
+    print("Location model: test MAE (overall) =", metrics_location["overall"]["mae"], f"(bundle {version})")
 
     # ---- Optional metadata ----
     import datetime
@@ -120,6 +316,7 @@ def main() -> None:
         "version": "1.0",
         "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z"),
         "split_ratios": {"train": TRAIN_RATIO, "val": VAL_RATIO, "test": TEST_RATIO},
+        "forest_mode": args.forest,
         "test_metrics": {
             "sensor": metrics_sensor["overall"],
             "location": metrics_location["overall"],
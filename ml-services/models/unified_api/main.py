@@ -6,18 +6,23 @@ Unified FastAPI serving all ML models on one server.
 
 Run from repo root or from "ML models":
   cd "ML models" && uvicorn unified_api.main:app --host 0.0.0.0 --port 8000
+Several workers sharing one copy of the models (see unified_api/prefork.py):
+  cd "ML models" && UNIFIED_API_WORKERS=4 python -m unified_api.main
 
-Works with ngrok: forward to the same host:port; internal calls use 127.0.0.1.
+Works with ngrok: forward to the same host:port. Village and Chatbot calls to Crop Water and
+Soil Moisture predictions run in process (see ml_common.transport); other internal calls use
+127.0.0.1. UNIFIED_API_IN_PROCESS_CALLS=0 sends them all over loopback HTTP instead.
 """
 import logging
 import os
 import sys
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, ValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +37,12 @@ for path in (str(ML_MODELS_DIR / "soil_moisture_model"), str(ML_MODELS_DIR), str
 # Import sub-apps after path is set (their Path(__file__) and imports stay correct)
 import Crop_Water_Model.main as crop_water_main
 import soil_moisture_model.api as soil_moisture_api
-import soil_moisture_model.predict as soil_predict
+# The module the mounted soil app actually uses (it imports "predict" from its own dir);
+# importing soil_moisture_model.predict separately would load a second copy of the models
+soil_predict = soil_moisture_api.predict
 import village_water_allocation.api as village_api
+from ml_common.registry import ADMIN_DENIED, admin_token_ok, reload_registries, start_watcher_from_env
+from ml_common.transport import LocalHandler, ServiceError, register_local
 try:
     import api as chatbot_api
     import ml_tools as chatbot_tools
@@ -42,9 +51,51 @@ except ImportError as e:
     logger.warning("Chatbot service disabled: %s. Run 'pip install -r techathon2k26/Chatbot/requirement.txt' with --break-system-packages if needed.", e)
     HAS_CHATBOT = False
 
+# Set once _load_all_artifacts() has run; pre-fork workers inherit it from the master
+_artifacts_loaded = False
+
+# "0": services call each other's predictions over loopback HTTP even though they share this process
+IN_PROCESS_CALLS = os.environ.get("UNIFIED_API_IN_PROCESS_CALLS", "1") != "0"
+
+
+def _in_process(endpoint: Callable[[Any], Any], request_model: type[BaseModel]) -> LocalHandler:
+    """
+    Transport handler calling a mounted endpoint function directly, answering errors as its
+    route would: 422 with FastAPI's detail list for an invalid body, the HTTPException otherwise.
+    """
+    def handler(payload: dict[str, Any]) -> dict[str, Any]:
+        try:
+            body = request_model.model_validate(payload)
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False)
+            raise ServiceError(422, [{**err, "loc": ["body", *err["loc"]]} for err in errors]) from None
+        try:
+            result = endpoint(body)
+        except HTTPException as e:
+            raise ServiceError(e.status_code, e.detail) from None
+        return result.model_dump() if isinstance(result, BaseModel) else result
+
+    return handler
+
+
+def _register_in_process_calls(base: str) -> None:
+    """Serve the prediction endpoints other services call from this process (same URLs as over HTTP)."""
+    register_local(f"{base}/crop-water/predict", _in_process(crop_water_main.predict, crop_water_main.PredictRequest))
+    register_local(
+        f"{base}/soil-moisture/predict/sensor",
+        _in_process(soil_moisture_api.predict_sensor_endpoint, soil_moisture_api.SensorPredictRequest),
+    )
+    register_local(
+        f"{base}/soil-moisture/predict/location",
+        _in_process(soil_moisture_api.predict_location_endpoint, soil_moisture_api.LocationPredictRequest),
+    )
+
 
 def _load_all_artifacts() -> None:
-    """Load all model artifacts so mounted sub-apps can serve requests."""
+    """Load all model artifacts so mounted sub-apps can serve requests. Runs once per process tree."""
+    global _artifacts_loaded
+    if _artifacts_loaded:
+        return
     # Crop Water (Model 1)
     try:
         crop_water_main.load_artifacts()
@@ -77,12 +128,29 @@ def _load_all_artifacts() -> None:
     os.environ["SOIL_MOISTURE_API_URL"] = f"{base}/soil-moisture"
     os.environ["VILLAGE_WATER_API_URL"] = f"{base}/village"
     logger.info("Chatbot tools configured to use internal endpoints at %s", base)
+    if IN_PROCESS_CALLS:
+        _register_in_process_calls(base)
+        logger.info("Crop Water and Soil Moisture predictions are called in process")
+    _artifacts_loaded = True
+
+
+# Every hot-reloadable model served here
+REGISTRIES = {
+    "crop_water": crop_water_main.registry,
+    "soil_moisture_sensor": soil_predict.sensor_registry,
+    "soil_moisture_location": soil_predict.location_registry,
+}
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     _load_all_artifacts()
+    # Started per worker: threads do not survive the pre-fork
+    watcher = start_watcher_from_env(REGISTRIES.values(), os.environ.get("MODEL_RELOAD_POLL_SECONDS"))
     yield
+    if watcher is not None:
+        watcher.stop()
+    await village_api.close_crop_water_client()
 
 
 app = FastAPI(
@@ -110,8 +178,8 @@ def root() -> dict[str, Any]:
         "health": "/health",
         "endpoints": {
             "crop_water": "/crop-water (health, config, predict)",
-            "soil_moisture": "/soil-moisture (health, predict, predict/sensor, predict/location)",
-            "village": "/village (health, optimize, UI at /village/)",
+            "soil_moisture": "/soil-moisture (health, predict, predict/sensor, predict/location, forecast/all)",
+            "village": "/village (health, optimize, optimize/columns, UI at /village/)",
         },
     }
 
@@ -119,19 +187,31 @@ def root() -> dict[str, Any]:
 @app.get("/health")
 def health() -> dict[str, Any]:
     """Aggregated health for load balancers and ngrok."""
-    crop_ok = crop_water_main.model_pipeline is not None
-    soil_sensor = soil_predict._model_sensor is not None
-    soil_location = soil_predict._model_location is not None
     return {
         "status": "ok",
-        "models": {
-            "crop_water": crop_ok,
-            "soil_moisture_sensor": soil_sensor,
-            "soil_moisture_location": soil_location,
-        },
+        "models": {name: registry.active is not None for name, registry in REGISTRIES.items()},
+        "versions": {name: registry.status() for name, registry in REGISTRIES.items()},
     }
 
 
+@app.post("/admin/reload")
+def admin_reload(
+    request: Request, model: str = "all", wait: bool = False, x_admin_token: str | None = Header(None)
+) -> dict[str, Any]:
+    """
+    Reload one model (crop_water, soil_moisture_sensor, soil_moisture_location) or all of them.
+    Only the worker that receives the request reloads; with several workers use
+    MODEL_RELOAD_POLL_SECONDS so each worker picks up new files itself.
+    """
+    client_host = request.client.host if request.client else None
+    if not admin_token_ok(x_admin_token, os.environ.get("MODEL_ADMIN_TOKEN"), client_host):
+        raise HTTPException(status_code=403, detail=ADMIN_DENIED)
+    if model != "all" and model not in REGISTRIES:
+        raise HTTPException(status_code=422, detail=f"Unknown model {model!r}. Allowed: {[*REGISTRIES, 'all']}")
+    selected = list(REGISTRIES.values()) if model == "all" else [REGISTRIES[model]]
+    return {"models": reload_registries(selected, wait)}
+
+
 # Mount sub-apps so their routes and static files work under a prefix.
 # No code changes in the three model packages; they keep their own routes and behavior.
 app.mount("/crop-water", crop_water_main.app)
@@ -142,6 +222,12 @@ if HAS_CHATBOT:
 
 
 if __name__ == "__main__":
-    import uvicorn
     port = int(os.environ.get("PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.environ.get("UNIFIED_API_WORKERS", "1"))
+    if workers > 1:
+        from unified_api import prefork
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s: %(message)s")
+        prefork.serve(port=port, workers=workers)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,122 @@
+"""
+Pre-fork serving for the unified API: load every model once in a master process, then
+fork workers that share the loaded artifacts copy-on-write.
+
+`uvicorn --workers N` starts each worker with multiprocessing spawn, so every worker
+unpickles its own copy of the crop-water and soil-moisture forests. Here the master
+loads them, moves all objects to the permanent GC generation (gc.freeze, so collections
+in the workers do not write to their headers and un-share the pages), binds the listening
+socket and forks. Every worker runs its own uvicorn server on the inherited socket; the
+master only restarts workers that die and forwards SIGINT / SIGTERM.
+
+Run from ml-services/models (Linux / macOS; elsewhere falls back to one process):
+  python -m unified_api.prefork --workers 4 --port 8000
+  UNIFIED_API_WORKERS=4 python -m unified_api.main
+Check sharing with:
+  python -m ml_common.memory_report --children <master pid>
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from unified_api import main as unified_main
+
+logger = logging.getLogger(__name__)
+
+# Wait before replacing a worker that died, so a crash loop does not spin the CPU
+RESTART_DELAY_SECONDS = 1.0
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, log_level: str) -> None:
+    # The master's handlers must not run in the worker; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(unified_main.app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def _spawn_worker(sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, log_level)
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info("Started worker %d", pid)
+    return pid
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 2, log_level: str = "info") -> None:
+    """Load artifacts, fork `workers` servers on one socket, and supervise them until signalled."""
+    # Village optimizer and chatbot tools call back into this server on PORT
+    os.environ["PORT"] = str(port)
+    if not hasattr(os, "fork") or workers <= 1:
+        uvicorn.run(unified_main.app, host=host, port=port, log_level=log_level)
+        return
+
+    unified_main._load_all_artifacts()
+    gc.collect()
+    gc.freeze()
+    sock = _bind(host, port)
+    logger.info("Master %d serving on %s:%d with %d workers", os.getpid(), host, port, workers)
+
+    pids = {_spawn_worker(sock, log_level) for _ in range(workers)}
+    stopping = False
+
+    def _stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        pids.discard(pid)
+        if not stopping:
+            logger.warning("Worker %d exited (status %d); restarting", pid, status)
+            time.sleep(RESTART_DELAY_SECONDS)
+            if not stopping:
+                pids.add(_spawn_worker(sock, log_level))
+    sock.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("UNIFIED_API_WORKERS", "2")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(name)s: %(message)s")
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Allocation engine: demand, priority weighting, proportional split, deficit / excess and shares
+for all farms of a village at once, on numpy arrays with one entry per farm.
+
+    areas = areas_ha(area_ha, area_acre)                   # NaN where neither is given
+    demand = demand_liters(areas, mm_per_day, soil_moisture_pct)
+    result = allocate(total_available_liters, demand, priority_score)
+    result.allocated_liters, result.share_percent, result.total_allocated, ...
+
+Missing optional inputs are NaN. The arithmetic is the per-farm formula /optimize always
+used, in the same order: totals are summed left to right (like sum(), not numpy's pairwise
+sum) and round2() rounds like round(x, 2), so answers match the per-farm loop to the bit.
+"""
+import numpy as np
+
+# 1 mm over 1 ha = 10,000 L
+LITERS_PER_MM_HA = 10_000
+HECTARES_PER_ACRE = 0.4047
+# Assumed for farms without predicted_soil_moisture_pct
+DEFAULT_SOIL_MOISTURE_PCT = 30.0
+
+
+def _sum(values: np.ndarray) -> float:
+    """Left-to-right sum, as sum() over the values."""
+    return float(np.cumsum(values)[-1]) if len(values) else 0.0
+
+
+def round2(values: np.ndarray) -> np.ndarray:
+    """
+    round(x, 2) of every value. np.round(x, 2) is rint(x * 100) / 100, which only disagrees
+    where x * 100 rounds onto a half; those few values are rounded one by one.
+    """
+    scaled = values * 100
+    out = np.rint(scaled) / 100
+    for i in np.flatnonzero(scaled - np.floor(scaled) == 0.5).tolist():
+        out[i] = round(float(values[i]), 2)
+    return out
+
+
+def priority_weights(priority_score: np.ndarray) -> np.ndarray:
+    """Map priority_score to weight: 1 -> 1, 2 -> 1.2, 3 -> 1.5."""
+    return np.where(priority_score <= 1, 1.0, np.where(priority_score <= 2, 1.2, 1.5))
+
+
+def areas_ha(area_ha: np.ndarray, area_acre: np.ndarray) -> np.ndarray:
+    """area_ha where > 0, else area_acre (> 0) in hectares; NaN for a farm with neither."""
+    return np.where(area_ha > 0, area_ha, np.where(area_acre > 0, area_acre * HECTARES_PER_ACRE, np.nan))
+
+
+def demand_liters(area_ha: np.ndarray, mm_per_day: np.ndarray, soil_moisture_pct: np.ndarray) -> np.ndarray:
+    """Demand in L/day; wetter soil lowers it (scale by 1 - moisture/100, min 0.1)."""
+    moisture = np.where(np.isnan(soil_moisture_pct), DEFAULT_SOIL_MOISTURE_PCT, soil_moisture_pct)
+    return area_ha * LITERS_PER_MM_HA * mm_per_day * np.maximum(0.1, 1.0 - moisture / 100.0)
+
+
+class Allocation:
+    """Per-farm arrays and village totals of one allocate() run."""
+
+    def __init__(self, demand_liters: np.ndarray, allocated_liters: np.ndarray, total_available_liters: float):
+        self.demand_liters = demand_liters
+        self.allocated_liters = allocated_liters
+        self.total_demand = _sum(demand_liters)
+        self.total_allocated = _sum(allocated_liters)
+        # Efficiency: fraction of available water that was allocated (usage of reservoir)
+        self.efficiency_score = (
+            self.total_allocated / total_available_liters * 100 if total_available_liters > 0 else 0.0
+        )
+
+    @property
+    def share_percent(self) -> np.ndarray:
+        if self.total_allocated <= 0:
+            return np.zeros_like(self.allocated_liters)
+        return self.allocated_liters / self.total_allocated * 100
+
+    @property
+    def deficit_liters(self) -> np.ndarray:
+        return np.maximum(0.0, self.demand_liters - self.allocated_liters)
+
+    @property
+    def excess_liters(self) -> np.ndarray:
+        return np.maximum(0.0, self.allocated_liters - self.demand_liters)
+
+    @property
+    def met(self) -> np.ndarray:
+        """True where the farm got its whole demand (status "met", else "deficit")."""
+        return self.allocated_liters >= self.demand_liters
+
+
+def allocate(total_available_liters: float, demand: np.ndarray, priority_score: np.ndarray) -> Allocation:
+    """
+    Split min(total available, total demand) in proportion to priority-weighted demand, each farm
+    capped at its own demand. ValueError if the total weighted need is zero.
+    """
+    needs = demand * priority_weights(priority_score)
+    sum_needs = _sum(needs)
+    if not sum_needs > 0:
+        raise ValueError("Total need is zero")
+    to_allocate = min(total_available_liters, _sum(demand))
+    allocated = np.minimum(needs / sum_needs * to_allocate, demand)
+    return Allocation(demand, allocated, total_available_liters)
@@ -3,27 +3,68 @@ Village-Level Water Allocation Optimization API.
 Distributes limited reservoir water across farms using crop water requirement (Model 1),
 optional soil moisture (Model 2), and priority-weighted proportional allocation.
 """
+import asyncio
 import json
 import logging
+import os
+import sys
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
 import httpx
-from fastapi import FastAPI, HTTPException
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+
+try:
+    # Optional: writes the columns of a columnar /optimize answer straight from the numpy arrays
+    import orjson
+except ImportError:
+    orjson = None
+
+# ml_common lives next to this folder; make it importable when run from village_water_allocation/
+_MODELS_DIR = str(Path(__file__).resolve().parent.parent)
+if _MODELS_DIR not in sys.path:
+    sys.path.append(_MODELS_DIR)
+
+from ml_common.transport import ServiceError, apost_json  # noqa: E402
+from ml_common.ttl_cache import TTLCache  # noqa: E402
+from ml_common.vocabulary import load_vocabulary  # noqa: E402
+from village_water_allocation.allocation import allocate, areas_ha, demand_liters, round2  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
 CONFIG_PATH = Path(__file__).resolve().parent / "config.json"
-# 1 mm over 1 ha = 10,000 L
-LITERS_PER_MM_HA = 10_000
-HECTARES_PER_ACRE = 0.4047
+
+# Crop Water lookups of one /optimize run concurrently, at most this many at a time, over one
+# pooled keep-alive client (one connection per concurrent lookup)
+CROP_WATER_CONCURRENCY = int(os.environ.get("VILLAGE_CROP_WATER_CONCURRENCY", "32"))
+# Deadline in seconds for one lookup, connection wait included
+CROP_WATER_TIMEOUT_SECONDS = float(os.environ.get("VILLAGE_CROP_WATER_TIMEOUT_SECONDS", "10"))
+# Crop Water answers are cached per (Crop Water model version, normalized request): the farms of
+# a village, and the next /optimize runs, mostly repeat a few crop/soil/region/weather
+# combinations. Size 0 disables it.
+CROP_WATER_CACHE_SIZE = int(os.environ.get("VILLAGE_CROP_WATER_CACHE_SIZE", "4096"))
+CROP_WATER_CACHE_TTL_SECONDS = float(os.environ.get("VILLAGE_CROP_WATER_CACHE_TTL", "900"))
+# Allocations of at least this many farms run on the threadpool, keeping the event loop free
+THREADPOOL_MIN_FARMS = 10_000
 
 config: dict[str, str] = {}
 
+_crop_water_client: httpx.AsyncClient | None = None
+_crop_water_client_loop: asyncio.AbstractEventLoop | None = None
+
+crop_water_cache = TTLCache(CROP_WATER_CACHE_SIZE, CROP_WATER_CACHE_TTL_SECONDS)
+# Model version of Crop Water's latest answer, part of every cache key: once an answer shows a
+# reloaded model, entries of the previous one are dropped (the TTL bounds how long they are
+# served before that)
+_crop_water_model_version: str | None = None
+
 
 def load_config() -> None:
     global config
@@ -37,32 +78,14 @@ def load_config() -> None:
         }
 
 
-def priority_weight(score: float) -> float:
-    """Map priority_score to weight: 1 -> 1, 2 -> 1.2, 3 -> 1.5."""
-    if score <= 1:
-        return 1.0
-    if score <= 2:
-        return 1.2
-    return 1.5
-
-
-# Map UI region names (DESERT, SEMI ARID, etc.) to Crop Water API's 15 agro-climatic zones
-REGION_TO_CROP_WATER_ZONE: dict[str, str] = {
-    "DESERT": "Western Dry Region",
-    "SEMI ARID": "Central Plateau & Hills Region",
-    "SEMI HUMID": "Western Himalayan Region",
-    "HUMID": "Eastern Himalayan Region",
-}
+# Fallbacks for values the Crop Water API would reject (village UI sends free-form input)
+DEFAULT_CROP_WATER_REGION = "Western Himalayan Region"
+DEFAULT_CROP_WATER_TEMPERATURE = "20-30"
 
 
 def _crop_water_region(region: str) -> str:
-    """Return Crop Water API region string (15 India agro-climatic zones)."""
-    key = region.strip().upper()
-    return REGION_TO_CROP_WATER_ZONE.get(key, "Western Himalayan Region")
-
-
-# Crop Water API allows only these exact values (from its config.json)
-CROP_WATER_TEMPERATURES = ("10-20", "20-30", "30-40", "40-50")
+    """Return Crop Water API region string (15 India agro-climatic zones; UI climate names via aliases)."""
+    return load_vocabulary()["region"].canonical(region) or DEFAULT_CROP_WATER_REGION
 
 
 def _normalize_crop_water_request(
@@ -73,20 +96,44 @@ def _normalize_crop_water_request(
     weather_condition: str,
 ) -> dict[str, str]:
     """Build request payload with values Crop Water API accepts."""
-    crop_water_region = _crop_water_region(region)
-    # Temperature must match exactly; default to 20-30 if unknown
-    temp = temperature.strip() if temperature else "20-30"
-    if temp not in CROP_WATER_TEMPERATURES:
-        temp = "20-30"
+    vocabulary = load_vocabulary()
+    temp = vocabulary["temperature"].canonical(temperature or "") or DEFAULT_CROP_WATER_TEMPERATURE
     return {
-        "crop_type": crop_type.strip().upper(),
-        "soil_type": soil_type.strip().upper(),
-        "region": crop_water_region,
+        # Unknown crop / soil / weather go through upper-cased; the API's 422 names the allowed values
+        "crop_type": vocabulary["crop_type"].canonical(crop_type) or crop_type.strip().upper(),
+        "soil_type": vocabulary["soil_type"].canonical(soil_type) or soil_type.strip().upper(),
+        "region": _crop_water_region(region),
         "temperature": temp,
-        "weather_condition": weather_condition.strip().upper(),
+        "weather_condition": vocabulary["weather_condition"].canonical(weather_condition)
+        or weather_condition.strip().upper(),
     }
 
 
+def get_crop_water_client() -> httpx.AsyncClient:
+    """
+    The process-wide pooled client for Crop Water calls, created on first use (or at startup)
+    in the running event loop, and again if that loop is no longer the current one.
+    """
+    global _crop_water_client, _crop_water_client_loop
+    loop = asyncio.get_running_loop()
+    if _crop_water_client is None or _crop_water_client.is_closed or _crop_water_client_loop is not loop:
+        _crop_water_client = httpx.AsyncClient(
+            timeout=CROP_WATER_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=CROP_WATER_CONCURRENCY, max_keepalive_connections=CROP_WATER_CONCURRENCY
+            ),
+        )
+        _crop_water_client_loop = loop
+    return _crop_water_client
+
+
+async def close_crop_water_client() -> None:
+    global _crop_water_client
+    if _crop_water_client is not None:
+        await _crop_water_client.aclose()
+        _crop_water_client = None
+
+
 async def fetch_crop_water_mm_per_day(
     base_url: str,
     crop_type: str,
@@ -94,43 +141,137 @@ async def fetch_crop_water_mm_per_day(
     region: str,
     temperature: str,
     weather_condition: str,
+    client: httpx.AsyncClient | None = None,
 ) -> float:
-    """Call Crop Water API (Model 1) to get water requirement in mm/day."""
+    """
+    Call Crop Water API (Model 1) to get water requirement in mm/day (pooled client unless one
+    is given; called in process when the unified API serves Crop Water too).
+    """
     payload = _normalize_crop_water_request(
         crop_type, soil_type, region, temperature, weather_condition
     )
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.post(
+    mm_per_day, _ = await _fetch_crop_water(base_url, payload, client or get_crop_water_client())
+    return mm_per_day
+
+
+async def _fetch_crop_water(
+    base_url: str, payload: dict[str, str], client: httpx.AsyncClient
+) -> tuple[float, str | None]:
+    """(mm/day, model version) for one normalized request; ValueError with a readable message on failure."""
+    try:
+        data = await apost_json(
+            client,
             f"{base_url.rstrip('/')}/predict",
-            json=payload,
+            payload,
+            timeout=CROP_WATER_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        raise ValueError(f"Crop Water API did not answer within {CROP_WATER_TIMEOUT_SECONDS:g} s") from None
+    except ServiceError as e:
+        d = e.detail
+        if isinstance(d, str):
+            err_detail = d
+        elif isinstance(d, list):
+            parts = []
+            for x in d:
+                if isinstance(x, dict):
+                    loc = x.get("loc", [])
+                    msg = x.get("msg", str(x))
+                    parts.append(f"{'.'.join(str(l) for l in loc)}: {msg}")
+                else:
+                    parts.append(str(x))
+            err_detail = "; ".join(parts)
+        else:
+            err_detail = str(d) or "unknown error"
+        msg = f"Crop Water API {e.status_code}: {err_detail}"
+        if e.status_code == 422 and (
+            "sensor" in err_detail.lower() or "sm_history" in err_detail
+        ):
+            msg += " (Is the Crop Water API on this port? Port 8001 must run Crop_Water_Model, not Soil Moisture.)"
+        raise ValueError(msg) from None
+    return float(data["water_requirement"]), data.get("model_version")
+
+
+async def fetch_crop_water_for_farms(
+    base_url: str, farms: "FarmColumns"
+) -> tuple[np.ndarray, dict[str, str], "CropWaterLookupStats"]:
+    """
+    mm/day per farm: crop_water_requirement_mm_per_day when given, else looked up once per
+    distinct normalized request (_normalize_crop_water_request), from crop_water_cache or
+    concurrently (at most CROP_WATER_CONCURRENCY at a time) on the pooled client. Returns the
+    values (in farm order; NaN for a failed lookup), {farm_id: error} for every farm whose
+    lookup failed, and the lookup counts.
+    """
+    global _crop_water_model_version
+    values = farms.crop_water_mm_per_day.copy()
+    pending = np.flatnonzero(np.isnan(values))
+    if not len(pending):
+        return values, {}, CropWaterLookupStats(
+            farms_looked_up=0, unique_requests=0, cache_hits=0, api_calls=0, model_version=_crop_water_model_version
         )
-        if r.status_code != 200:
-            err_detail = "unknown error"
-            try:
-                body = r.json()
-                d = body.get("detail")
-                if isinstance(d, str):
-                    err_detail = d
-                elif isinstance(d, list):
-                    parts = []
-                    for x in d:
-                        if isinstance(x, dict):
-                            loc = x.get("loc", [])
-                            msg = x.get("msg", str(x))
-                            parts.append(f"{'.'.join(str(l) for l in loc)}: {msg}")
-                        else:
-                            parts.append(str(x))
-                    err_detail = "; ".join(parts)
-            except Exception:
-                err_detail = r.text or str(r.status_code)
-            msg = f"Crop Water API {r.status_code}: {err_detail}"
-            if r.status_code == 422 and (
-                "sensor" in err_detail.lower() or "sm_history" in err_detail
-            ):
-                msg += " (Is the Crop Water API on this port? Port 8001 must run Crop_Water_Model, not Soil Moisture.)"
-            raise ValueError(msg)
-        data = r.json()
-        return float(data["water_requirement"])
+    # Farms spelling a request the same way share one normalization (most of a village does)
+    raw_codes: dict[tuple[str, ...], int] = {}
+    columns = (farms.crop_type, farms.soil_type, farms.region, farms.temperature, farms.weather_condition)
+    rows = zip(*columns) if len(pending) == len(farms) else (tuple(c[i] for c in columns) for i in pending.tolist())
+    raw_of_farm = np.array([raw_codes.setdefault(raw, len(raw_codes)) for raw in rows], dtype=np.intp)
+    # Normalized request (as a tuple) -> its index; spellings of one request map to the same one
+    key_codes: dict[tuple[str, ...], int] = {}
+    payloads: list[dict[str, str]] = []
+    key_of_raw = np.empty(len(raw_codes), dtype=np.intp)
+    for raw, code in raw_codes.items():
+        payload = _normalize_crop_water_request(*raw)
+        key = tuple(payload.values())
+        if key not in key_codes:
+            key_codes[key] = len(key_codes)
+            payloads.append(payload)
+        key_of_raw[code] = key_codes[key]
+    keys = list(key_codes)
+
+    mm_by_key = np.full(len(keys), np.nan)
+    for k, key in enumerate(keys):
+        cached = crop_water_cache.get((_crop_water_model_version, key))
+        if cached is not None:
+            mm_by_key[k] = cached
+    missing = np.flatnonzero(np.isnan(mm_by_key)).tolist()
+    cache_hits = len(keys) - len(missing)
+
+    client = get_crop_water_client()
+    semaphore = asyncio.Semaphore(CROP_WATER_CONCURRENCY)
+
+    async def lookup(k: int) -> tuple[float, str | None]:
+        async with semaphore:
+            return await _fetch_crop_water(base_url, payloads[k], client)
+
+    results = await asyncio.gather(*(lookup(k) for k in missing), return_exceptions=True)
+    errors_by_key: dict[int, str] = {}
+    for k, result in zip(missing, results):
+        if isinstance(result, Exception):
+            logger.warning("Crop Water API call failed for %s: %s", "/".join(keys[k]), result)
+            errors_by_key[k] = str(result) or type(result).__name__
+            continue
+        mm_per_day, model_version = result
+        if model_version != _crop_water_model_version:
+            if _crop_water_model_version is not None:
+                logger.info("Crop Water model %s -> %s: dropping cached answers", _crop_water_model_version, model_version)
+            crop_water_cache.clear()
+            _crop_water_model_version = model_version
+        crop_water_cache.put((model_version, keys[k]), mm_per_day)
+        mm_by_key[k] = mm_per_day
+
+    key_of_farm = key_of_raw[raw_of_farm]
+    values[pending] = mm_by_key[key_of_farm]
+    failures: dict[str, str] = {}
+    if errors_by_key:
+        for j in np.flatnonzero(np.isin(key_of_farm, list(errors_by_key))).tolist():
+            failures[farms.farm_id[pending[j]]] = errors_by_key[key_of_farm[j]]
+    stats = CropWaterLookupStats(
+        farms_looked_up=len(pending),
+        unique_requests=len(keys),
+        cache_hits=cache_hits,
+        api_calls=len(missing),
+        model_version=_crop_water_model_version,
+    )
+    return values, failures, stats
 
 
 class FarmInput(BaseModel):
@@ -156,6 +297,116 @@ class OptimizeRequest(BaseModel):
     farms: list[FarmInput] = Field(..., min_length=1)
 
 
+class OptimizeColumnsRequest(BaseModel):
+    """
+    The farms of an OptimizeRequest as one list per FarmInput field (all of the same length;
+    null = not given). crop_type ... weather_condition may be left out when every farm has
+    crop_water_requirement_mm_per_day.
+    """
+    total_available_water_liters: float = Field(..., gt=0)
+    farm_id: list[str] = Field(..., min_length=1)
+    area_ha: list[float | None] | None = None
+    area_acre: list[float | None] | None = None
+    crop_type: list[str] | None = None
+    soil_type: list[str] | None = None
+    region: list[str] | None = None
+    temperature: list[str] | None = None
+    weather_condition: list[str] | None = None
+    priority_score: list[float] | None = Field(None, description="1-3 per farm; default 1")
+    crop_water_requirement_mm_per_day: list[float | None] | None = None
+    predicted_soil_moisture_pct: list[float | None] | None = None
+
+
+class FarmColumns:
+    """
+    The farms of one request as columns: lists of strings and float arrays in farm order
+    (NaN where an optional value is not given), the input of the allocation engine. The
+    Crop Water request columns are None when no farm needs a lookup.
+    """
+
+    def __init__(self, farm_id: list[str], crop_type: list[str] | None, soil_type: list[str] | None,
+                 region: list[str] | None, temperature: list[str] | None, weather_condition: list[str] | None,
+                 area_ha: np.ndarray, area_acre: np.ndarray,
+                 priority_score: np.ndarray, crop_water_mm_per_day: np.ndarray, soil_moisture_pct: np.ndarray):
+        self.farm_id = farm_id
+        self.crop_type = crop_type
+        self.soil_type = soil_type
+        self.region = region
+        self.temperature = temperature
+        self.weather_condition = weather_condition
+        self.area_ha = area_ha
+        self.area_acre = area_acre
+        self.priority_score = priority_score
+        self.crop_water_mm_per_day = crop_water_mm_per_day
+        self.soil_moisture_pct = soil_moisture_pct
+
+    def __len__(self) -> int:
+        return len(self.farm_id)
+
+    @classmethod
+    def from_farms(cls, farms: list[FarmInput]) -> "FarmColumns":
+        def floats(name: str) -> np.ndarray:
+            # None -> NaN
+            return np.array([getattr(farm, name) for farm in farms], dtype=float)
+
+        return cls(
+            farm_id=[farm.farm_id for farm in farms],
+            crop_type=[farm.crop_type for farm in farms],
+            soil_type=[farm.soil_type for farm in farms],
+            region=[farm.region for farm in farms],
+            temperature=[farm.temperature for farm in farms],
+            weather_condition=[farm.weather_condition for farm in farms],
+            area_ha=floats("area_ha"),
+            area_acre=floats("area_acre"),
+            priority_score=floats("priority_score"),
+            crop_water_mm_per_day=floats("crop_water_requirement_mm_per_day"),
+            soil_moisture_pct=floats("predicted_soil_moisture_pct"),
+        )
+
+    @classmethod
+    def from_request(cls, req: OptimizeColumnsRequest) -> "FarmColumns":
+        """Columns of req; ValueError naming the first column that is too short / long or missing."""
+        n = len(req.farm_id)
+
+        def floats(name: str, default: float = float("nan")) -> np.ndarray:
+            values = getattr(req, name)
+            if values is None:
+                return np.full(n, default)
+            if len(values) != n:
+                raise ValueError(f"{name} has {len(values)} values for {n} farms")
+            return np.array(values, dtype=float)
+
+        crop_water_mm_per_day = floats("crop_water_requirement_mm_per_day")
+        needs_lookup = bool(np.isnan(crop_water_mm_per_day).any())
+
+        def strings(name: str) -> list[str] | None:
+            values = getattr(req, name)
+            if values is None:
+                if needs_lookup:
+                    raise ValueError(f"{name} is required for farms without crop_water_requirement_mm_per_day")
+                return None
+            if len(values) != n:
+                raise ValueError(f"{name} has {len(values)} values for {n} farms")
+            return values
+
+        priority_score = floats("priority_score", 1.0)
+        if ((priority_score < 1) | (priority_score > 3)).any():
+            raise ValueError("priority_score values must be between 1 and 3")
+        return cls(
+            farm_id=req.farm_id,
+            crop_type=strings("crop_type"),
+            soil_type=strings("soil_type"),
+            region=strings("region"),
+            temperature=strings("temperature"),
+            weather_condition=strings("weather_condition"),
+            area_ha=floats("area_ha"),
+            area_acre=floats("area_acre"),
+            priority_score=priority_score,
+            crop_water_mm_per_day=crop_water_mm_per_day,
+            soil_moisture_pct=floats("predicted_soil_moisture_pct"),
+        )
+
+
 class AllocationItem(BaseModel):
     farm_id: str
     allocated_liters: float
@@ -171,30 +422,21 @@ class PerFarmReportItem(BaseModel):
     status: str
 
 
+class CropWaterLookupStats(BaseModel):
+    farms_looked_up: int = Field(..., description="Farms without crop_water_requirement_mm_per_day")
+    unique_requests: int = Field(..., description="Distinct normalized Crop Water requests among them")
+    cache_hits: int = Field(..., description="Distinct requests answered from the cache")
+    api_calls: int = Field(..., description="Distinct requests sent to the Crop Water API")
+    model_version: str | None = Field(None, description="Crop Water model version of the cached answers")
+
+
 class OptimizeResponse(BaseModel):
     allocations: list[AllocationItem]
     per_farm_report: list[PerFarmReportItem]
     village_efficiency_score: float
     total_demand_liters: float
     total_allocated_liters: float
-
-
-def _area_ha(farm: FarmInput) -> float:
-    if farm.area_ha is not None and farm.area_ha > 0:
-        return farm.area_ha
-    if farm.area_acre is not None and farm.area_acre > 0:
-        return farm.area_acre * HECTARES_PER_ACRE
-    raise ValueError(f"Farm {farm.farm_id}: provide area_ha or area_acre")
-
-
-def _demand_liters(area_ha: float, mm_per_day: float, soil_moisture_pct: float | None) -> float:
-    """Demand in L/day. 1 mm over 1 ha = 10,000 L."""
-    demand = area_ha * LITERS_PER_MM_HA * mm_per_day
-    if soil_moisture_pct is not None:
-        # Wetter soil -> lower effective demand (scale by 1 - moisture/100, min 0.1)
-        factor = max(0.1, 1.0 - soil_moisture_pct / 100.0)
-        demand *= factor
-    return demand
+    crop_water_lookup: CropWaterLookupStats
 
 
 app = FastAPI(
@@ -226,94 +468,166 @@ def root() -> FileResponse:
 
 
 @app.on_event("startup")
-def startup() -> None:
+async def startup() -> None:
     load_config()
+    get_crop_water_client()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await close_crop_water_client()
 
 
 @app.get("/health")
 def health() -> dict[str, Any]:
-    return {"status": "ok", "service": "village_water_allocation"}
+    return {
+        "status": "ok",
+        "service": "village_water_allocation",
+        "crop_water_model_version": _crop_water_model_version,
+        "crop_water_cache": crop_water_cache.stats(),
+    }
 
 
-@app.post("/optimize", response_model=OptimizeResponse)
-async def optimize(req: OptimizeRequest) -> OptimizeResponse:
-    """Compute fair water allocation per farm and village efficiency score."""
+async def _optimize(farms: FarmColumns, total_available: float, layout: str) -> OptimizeResponse | Response:
+    """Allocation for farms: an OptimizeResponse, or for layout "columns" the columnar JSON answer."""
     crop_water_url = config.get("crop_water_api_url", "http://localhost:8001")
-    total_available = req.total_available_water_liters
-    farms = req.farms
-
-    demands: list[tuple[str, float, float]] = []  # (farm_id, demand_liters, priority_weight)
-
-    for farm in farms:
-        area_ha = _area_ha(farm)
-        mm_per_day = farm.crop_water_requirement_mm_per_day
-        if mm_per_day is None:
-            try:
-                mm_per_day = await fetch_crop_water_mm_per_day(
-                    crop_water_url,
-                    farm.crop_type,
-                    farm.soil_type,
-                    farm.region,
-                    farm.temperature,
-                    farm.weather_condition,
-                )
-            except Exception as e:
-                logger.exception("Crop Water API call failed for farm %s", farm.farm_id)
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"Crop Water API failed for farm {farm.farm_id}: {e!s}",
-                ) from e
-        moisture = farm.predicted_soil_moisture_pct if farm.predicted_soil_moisture_pct is not None else 30.0
-        demand_liters = _demand_liters(area_ha, mm_per_day, moisture)
-        weight = priority_weight(farm.priority_score)
-        demands.append((farm.farm_id, demand_liters, weight))
-
-    total_demand = sum(d for _, d, _ in demands)
-    needs = [(fid, d * w, d) for fid, d, w in demands]
-    sum_needs = sum(n[1] for n in needs)
-    if sum_needs <= 0:
-        raise HTTPException(status_code=422, detail="Total need is zero")
-
-    to_allocate = min(total_available, total_demand)
-    allocations_raw: list[tuple[str, float, float]] = []  # (farm_id, alloc, demand)
-    for farm_id, need, demand in needs:
-        alloc = (need / sum_needs) * to_allocate
-        alloc = min(alloc, demand)
-        allocations_raw.append((farm_id, alloc, demand))
-
-    total_allocated = sum(a[1] for a in allocations_raw)
-    # Efficiency: fraction of available water that was allocated (usage of reservoir)
-    village_efficiency_score = (total_allocated / total_available * 100) if total_available > 0 else 0.0
 
+    areas = areas_ha(farms.area_ha, farms.area_acre)
+    no_area = np.flatnonzero(np.isnan(areas))
+    if len(no_area):
+        raise HTTPException(status_code=422, detail=f"Farm {farms.farm_id[no_area[0]]}: provide area_ha or area_acre")
+    mm_per_day, failures, lookup_stats = await fetch_crop_water_for_farms(crop_water_url, farms)
+    if failures:
+        if len(failures) == 1:
+            farm_id, error = next(iter(failures.items()))
+            detail = f"Crop Water API failed for farm {farm_id}: {error}"
+        else:
+            detail = f"Crop Water API failed for {len(failures)} farms: " + "; ".join(
+                f"{farm_id}: {error}" for farm_id, error in failures.items()
+            )
+        raise HTTPException(status_code=502, detail=detail)
+
+    args = (farms, areas, mm_per_day, total_available, layout, lookup_stats)
+    if len(farms) >= THREADPOOL_MIN_FARMS:
+        return await run_in_threadpool(_allocation_response, *args)
+    return _allocation_response(*args)
+
+
+def _allocation_response(
+    farms: FarmColumns,
+    areas: np.ndarray,
+    mm_per_day: np.ndarray,
+    total_available: float,
+    layout: str,
+    lookup_stats: CropWaterLookupStats,
+) -> OptimizeResponse | Response:
+    demand = demand_liters(areas, mm_per_day, farms.soil_moisture_pct)
+    try:
+        result = allocate(total_available, demand, farms.priority_score)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    allocated = round2(result.allocated_liters)
+    share = round2(result.share_percent)
+    demand = round2(result.demand_liters)
+    deficit = round2(result.deficit_liters)
+    excess = round2(result.excess_liters)
+    status = np.where(result.met, "met", "deficit").tolist()
+    totals = {
+        "village_efficiency_score": round(result.efficiency_score, 2),
+        "total_demand_liters": round(result.total_demand, 2),
+        "total_allocated_liters": round(result.total_allocated, 2),
+    }
+    if layout == "columns":
+        return _columns_response({
+            "farm_id": farms.farm_id,
+            "allocated_liters": allocated,
+            "share_percent": share,
+            "demand_liters": demand,
+            "deficit_liters": deficit,
+            "excess_liters": excess,
+            "status": status,
+            **totals,
+            "crop_water_lookup": lookup_stats.model_dump(),
+        })
+
+    allocated, share, demand, deficit, excess = (a.tolist() for a in (allocated, share, demand, deficit, excess))
     allocations_out = [
-        AllocationItem(
-            farm_id=farm_id,
-            allocated_liters=round(alloc, 2),
-            share_percent=round((alloc / total_allocated * 100) if total_allocated > 0 else 0, 2),
-        )
-        for farm_id, alloc, _ in allocations_raw
+        AllocationItem(farm_id=farm_id, allocated_liters=allocated[i], share_percent=share[i])
+        for i, farm_id in enumerate(farms.farm_id)
     ]
     per_farm_report = [
         PerFarmReportItem(
             farm_id=farm_id,
-            allocated_liters=round(alloc, 2),
-            demand_liters=round(demand, 2),
-            deficit_liters=round(max(0, demand - alloc), 2),
-            excess_liters=round(max(0, alloc - demand), 2),
-            status="deficit" if alloc < demand else "met",
+            allocated_liters=allocated[i],
+            demand_liters=demand[i],
+            deficit_liters=deficit[i],
+            excess_liters=excess[i],
+            status=status[i],
         )
-        for farm_id, alloc, demand in allocations_raw
+        for i, farm_id in enumerate(farms.farm_id)
     ]
-
     return OptimizeResponse(
         allocations=allocations_out,
         per_farm_report=per_farm_report,
-        village_efficiency_score=round(village_efficiency_score, 2),
-        total_demand_liters=round(total_demand, 2),
-        total_allocated_liters=round(total_allocated, 2),
+        **totals,
+        crop_water_lookup=lookup_stats,
     )
 
 
+def _columns_response(payload: dict[str, Any]) -> Response:
+    if orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps(
+            {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in payload.items()}, separators=(",", ":")
+        ).encode()
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/optimize", response_model=OptimizeResponse)
+async def optimize(req: OptimizeRequest, layout: Literal["rows", "columns"] = "rows") -> OptimizeResponse | Response:
+    """
+    Compute fair water allocation per farm and village efficiency score. layout=columns answers
+    with one list per field instead of per-farm objects (see /optimize/columns).
+    """
+    return await _optimize(FarmColumns.from_farms(req.farms), req.total_available_water_liters, layout)
+
+
+def _parse_columns_request(body: bytes) -> tuple[float, FarmColumns]:
+    req = OptimizeColumnsRequest.model_validate_json(body)
+    return req.total_available_water_liters, FarmColumns.from_request(req)
+
+
+@app.post(
+    "/optimize/columns",
+    response_model=None,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": OptimizeColumnsRequest.model_json_schema()}},
+        }
+    },
+)
+async def optimize_columns(request: Request) -> Response:
+    """
+    /optimize for large villages and districts, columns in and out: an OptimizeColumnsRequest
+    (the farms as one list per field), answered with parallel lists "farm_id",
+    "allocated_liters", "share_percent", "demand_liters", "deficit_liters", "excess_liters"
+    and "status", plus the village totals and "crop_water_lookup". The body is parsed
+    straight from the bytes, on the threadpool.
+    """
+    body = await request.body()
+    try:
+        total_available, farms = await run_in_threadpool(_parse_columns_request, body)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False, include_input=False)
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in errors])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await _optimize(farms, total_available, "columns")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
@@ -0,0 +1,142 @@
+"""
+Allocation math of /optimize: the previous per-farm loop (Python tuples, sum() passes, two
+Pydantic models per farm) vs the numpy engine (allocation.py) answering in rows and in
+columns, and a whole POST /optimize/columns (JSON body in, JSON out, through the app
+without a socket). Farms carry crop_water_requirement_mm_per_day, so no Crop Water lookups
+are timed.
+
+  python benchmark_allocation.py
+  python benchmark_allocation.py --farms 1000 100000 1000000 --loop-max 100000
+
+Exits non-zero if the engine's rounded allocation differs from the previous loop's.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+import numpy as np
+
+import api
+from allocation import HECTARES_PER_ACRE, LITERS_PER_MM_HA
+
+
+def previous_allocation(total_available: float, farms: list[api.FarmInput]) -> dict:
+    """The per-farm /optimize math before the numpy engine, for comparison."""
+    def weight(score: float) -> float:
+        return 1.0 if score <= 1 else 1.2 if score <= 2 else 1.5
+
+    demands = []
+    for farm in farms:
+        area = farm.area_ha if farm.area_ha is not None and farm.area_ha > 0 else farm.area_acre * HECTARES_PER_ACRE
+        moisture = farm.predicted_soil_moisture_pct if farm.predicted_soil_moisture_pct is not None else 30.0
+        demand = area * LITERS_PER_MM_HA * farm.crop_water_requirement_mm_per_day
+        demand *= max(0.1, 1.0 - moisture / 100.0)
+        demands.append((farm.farm_id, demand, weight(farm.priority_score)))
+    total_demand = sum(d for _, d, _ in demands)
+    needs = [(fid, d * w, d) for fid, d, w in demands]
+    sum_needs = sum(n[1] for n in needs)
+    to_allocate = min(total_available, total_demand)
+    allocations_raw = [(fid, min((need / sum_needs) * to_allocate, d), d) for fid, need, d in needs]
+    total_allocated = sum(a[1] for a in allocations_raw)
+    return {
+        "allocations": [
+            api.AllocationItem(farm_id=fid, allocated_liters=round(a, 2),
+                               share_percent=round(a / total_allocated * 100 if total_allocated > 0 else 0, 2))
+            for fid, a, _ in allocations_raw
+        ],
+        "per_farm_report": [
+            api.PerFarmReportItem(farm_id=fid, allocated_liters=round(a, 2), demand_liters=round(d, 2),
+                                  deficit_liters=round(max(0, d - a), 2), excess_liters=round(max(0, a - d), 2),
+                                  status="deficit" if a < d else "met")
+            for fid, a, d in allocations_raw
+        ],
+        "total_allocated_liters": round(total_allocated, 2),
+    }
+
+
+def columns_body(n: int, rng: np.random.Generator) -> dict:
+    """An /optimize/columns body: ha or acres, optional soil moisture, mm/day given, scarce water."""
+    in_acres = rng.random(n) < 0.3
+    area = np.round(rng.uniform(0.2, 8.0, n), 2)
+    moisture = np.round(rng.uniform(5, 60, n), 1)
+    mm = np.round(rng.uniform(2, 9, n), 3)
+    body = {
+        "farm_id": [f"farm-{i}" for i in range(n)],
+        "area_ha": np.where(in_acres, np.nan, area).tolist(),
+        "area_acre": np.where(in_acres, area, np.nan).tolist(),
+        "priority_score": rng.integers(1, 4, n).astype(float).tolist(),
+        "crop_water_requirement_mm_per_day": mm.tolist(),
+        "predicted_soil_moisture_pct": np.where(rng.random(n) < 0.5, np.nan, moisture).tolist(),
+    }
+    demand = float((area * LITERS_PER_MM_HA * mm).sum())
+    body["total_available_water_liters"] = 0.6 * demand
+    for name in ("area_ha", "area_acre", "predicted_soil_moisture_pct"):
+        body[name] = [None if v != v else v for v in body[name]]
+    return body
+
+
+def farm_inputs(body: dict) -> list[api.FarmInput]:
+    fields = [k for k in body if k != "total_available_water_liters"]
+    request = dict(crop_type="MAIZE", soil_type="DRY", region="SEMI ARID", temperature="20-30", weather_condition="NORMAL")
+    return [api.FarmInput(**request, **dict(zip(fields, row))) for row in zip(*(body[k] for k in fields))]
+
+
+def _seconds(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farms", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--loop-max", type=int, default=100_000, help="largest village to run the previous loop on")
+    args = parser.parse_args(argv)
+    api.load_config()
+    rng = np.random.default_rng(0)
+    run = asyncio.new_event_loop().run_until_complete
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://village", timeout=None)
+
+    def post_columns(raw: bytes) -> None:
+        r = run(client.post("/optimize/columns", content=raw, headers={"content-type": "application/json"}))
+        r.raise_for_status()
+
+    post_columns(json.dumps(columns_body(10, rng)).encode())  # warm up
+    same = True
+    print(f"{'farms':>9} {'previous loop':>14} {'engine, rows':>13} {'engine, columns':>16} "
+          f"{'POST /optimize/columns':>23} {'body MB':>8}")
+    for n in args.farms:
+        body = columns_body(n, rng)
+        raw = json.dumps(body).encode()
+        post = _seconds(lambda: post_columns(raw))
+        req = api.OptimizeColumnsRequest.model_validate_json(raw)
+        farms = api.FarmColumns.from_request(req)
+        total = req.total_available_water_liters
+        columns = _seconds(lambda: run(api._optimize(farms, total, "columns")))
+        rows_result = {}
+        rows = _seconds(lambda: rows_result.update(r=run(api._optimize(farms, total, "rows"))))
+        loop = "-"
+        if n <= args.loop_max:
+            inputs = farm_inputs(body)
+            expected = {}
+            loop = f"{_seconds(lambda: expected.update(previous_allocation(total, inputs))) * 1e3:11.1f} ms"
+            got = rows_result["r"]
+            ok = (got.allocations == expected["allocations"] and got.per_farm_report == expected["per_farm_report"]
+                  and got.total_allocated_liters == expected["total_allocated_liters"])
+            if not ok:
+                diff = max(abs(a.allocated_liters - b.allocated_liters)
+                           for a, b in zip(got.allocations, expected["allocations"]))
+                print(f"  {n} farms: engine differs from the previous loop (max {diff:.2f} L)")
+            same = same and ok
+        print(f"{n:>9} {loop:>14} {rows * 1e3:10.1f} ms {columns * 1e3:13.1f} ms {post * 1e3:20.1f} ms "
+              f"{len(raw) / 1e6:8.1f}")
+    print("orjson:", api.orjson is not None)
+    print("same allocation as the previous loop:", same)
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Latency of /optimize against a local stub Crop Water API (uvicorn on a free port, fixed
+answer after --latency-ms per request): the previous lookup loop (one farm after the
+other, a new httpx.AsyncClient per farm) vs fetch_crop_water_for_farms (one concurrent
+lookup per distinct request on the pooled client, then the same request again with the
+answers cached). The farms cycle through --distinct crop/soil/temperature/weather
+combinations. All runs must give the same allocation.
+
+  python benchmark_optimize.py
+  python benchmark_optimize.py --farms 500 --distinct 500 --latency-ms 20 --concurrency 64
+
+Exits non-zero if the allocations differ.
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+import api
+
+stub = FastAPI()
+STUB_LATENCY_SECONDS = 0.005
+
+
+@stub.post("/predict")
+async def stub_predict(body: dict) -> dict:
+    await asyncio.sleep(STUB_LATENCY_SECONDS)
+    # Deterministic per crop so both runs see the same values
+    return {"water_requirement": 3.0 + len(body["crop_type"]) / 10}
+
+
+def start_stub() -> tuple[str, uvicorn.Server]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+def farms(n: int, distinct: int) -> list[api.FarmInput]:
+    crops = ["MAIZE", "RICE", "WHEAT", "COTTON", "SUGARCANE"]
+    soils = ["DRY", "WET", "HUMID"]
+    temperatures = ["10-20", "20-30", "30-40", "40-50"]
+    weathers = ["NORMAL", "SUNNY", "WINDY", "RAINY"]
+    out = []
+    for i in range(n):
+        k = i % distinct
+        out.append(api.FarmInput(
+            farm_id=f"farm-{i}",
+            area_ha=1.0 + i % 7,
+            crop_type=crops[k % 5],
+            soil_type=soils[k // 5 % 3],
+            region="SEMI ARID",
+            temperature=temperatures[k // 15 % 4],
+            weather_condition=weathers[k // 60 % 4],
+            priority_score=1 + i % 3,
+        ))
+    return out
+
+
+async def sequential_lookups(base_url: str, farm_list: list[api.FarmInput]) -> list[float]:
+    """The previous /optimize loop: one farm at a time, a new client (and connection) per farm."""
+    values = []
+    for farm in farm_list:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            values.append(await api.fetch_crop_water_mm_per_day(
+                base_url, farm.crop_type, farm.soil_type, farm.region, farm.temperature, farm.weather_condition,
+                client=client,
+            ))
+    return values
+
+
+async def run(args: argparse.Namespace) -> int:
+    base_url, server = start_stub()
+    api.config["crop_water_api_url"] = base_url
+    farm_list = farms(args.farms, args.distinct)
+    request = api.OptimizeRequest(total_available_water_liters=1e6 * args.farms, farms=farm_list)
+
+    start = time.perf_counter()
+    values = await sequential_lookups(base_url, farm_list)
+    sequential = time.perf_counter() - start
+    given = [farm.model_copy(update={"crop_water_requirement_mm_per_day": v}) for farm, v in zip(farm_list, values)]
+    expected = await api.optimize(api.OptimizeRequest(total_available_water_liters=request.total_available_water_liters,
+                                                      farms=given))
+
+    await api.optimize(api.OptimizeRequest(total_available_water_liters=1.0, farms=farm_list[:1]))  # warm the pool
+    api.crop_water_cache.clear()
+    start = time.perf_counter()
+    got = await api.optimize(request)
+    concurrent = time.perf_counter() - start
+    start = time.perf_counter()
+    cached = await api.optimize(request)
+    warm = time.perf_counter() - start
+
+    print(f"{args.farms} farms, {got.crop_water_lookup.unique_requests} distinct requests, "
+          f"stub latency {args.latency_ms:g} ms, concurrency {api.CROP_WATER_CONCURRENCY}")
+    print(f"sequential, new client per farm:   {sequential * 1000:9.1f} ms")
+    print(f"deduplicated, pooled client:       {concurrent * 1000:9.1f} ms  ({sequential / concurrent:.1f}x)"
+          f"  {got.crop_water_lookup.api_calls} API calls")
+    print(f"deduplicated, cached answers:      {warm * 1000:9.1f} ms  ({sequential / warm:.1f}x)"
+          f"  {cached.crop_water_lookup.cache_hits} cache hits")
+    fields = ("allocations", "per_farm_report", "total_demand_liters", "total_allocated_liters")
+    same = all(getattr(r, f) == getattr(expected, f) for r in (got, cached) for f in fields)
+    print("same allocation:", same)
+    await api.close_crop_water_client()
+    server.should_exit = True
+    return 0 if same else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    global STUB_LATENCY_SECONDS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farms", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=60, help="distinct Crop Water requests among the farms (max 240)")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="stub Crop Water response time")
+    parser.add_argument("--concurrency", type=int, default=api.CROP_WATER_CONCURRENCY)
+    args = parser.parse_args(argv)
+    STUB_LATENCY_SECONDS = args.latency_ms / 1000
+    api.CROP_WATER_CONCURRENCY = args.concurrency
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())